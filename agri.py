@@ -3,17 +3,143 @@ import streamlit as st
 import pandas as pd
 import shared_state
 import parameters
+import agri_engine
+import agri_import
+import agri_scenarios
+import ledger
+import plotly.graph_objects as go
+import profiling
+import jobs
 
+# --- BULK IMPORT ---
+def render_import(key_prefix, key_df, crop_list):
+    with st.expander("Import from Excel / CSV"):
+        upload = st.file_uploader("Project registry (.xlsx or .csv)", type=["xlsx", "csv"], key=f"upload_{key_prefix}")
+        append = st.checkbox("Append to existing rows", key=f"upload_append_{key_prefix}")
+        if st.button("Import", key=f"upload_btn_{key_prefix}", disabled=upload is None):
+            bar = st.progress(0.0, text="Importing...")
+
+            def progress(rows, fraction):
+                bar.progress(fraction or 0.0, text=f"Imported {rows:,} rows...")
+
+            try:
+                df, issues, unmapped = agri_import.import_table(
+                    upload, filename=upload.name, crop_list=crop_list,
+                    sheet=key_prefix.replace("_", "."), progress=progress
+                )
+            except ValueError as exc:
+                bar.empty()
+                st.error(str(exc))
+                return
+            bar.progress(1.0, text=f"Imported {len(df):,} rows")
+
+            if append and not st.session_state[key_df].empty:
+                df = pd.concat([st.session_state[key_df], df], ignore_index=True)
+            st.session_state[key_df] = agri_engine.coerce_section_frame(df, crop_list)
+            st.session_state[f"import_report_{key_prefix}"] = (issues, unmapped)
+
+        report = st.session_state.get(f"import_report_{key_prefix}")
+        if report:
+            issues, unmapped = report
+            if unmapped:
+                st.caption("Ignored columns: " + ", ".join(str(h) for h in unmapped))
+            if len(issues):
+                st.warning(f"{issues['Row'].nunique():,} row(s) were not imported (spreadsheet row numbers below).")
+                st.dataframe(issues, hide_index=True, use_container_width=True)
+
+# --- RENDERER ---
+# Each section runs as a fragment: editing a table only reruns that section.
+@shared_state.fragment
+def render_section(key_prefix, crop_data):
+    key_df = f"df_{key_prefix}"
+    crop_list = list(crop_data.keys())
+    
+    # Typed section table (categorical selectboxes, float columns; see agri_engine).
+    # The stored table is only replaced when it changes: autosave compares by identity.
+    if key_df not in st.session_state:
+        st.session_state[key_df] = agri_engine.empty_section_frame(crop_list)
+    typed = agri_engine.coerce_section_frame(st.session_state[key_df], crop_list)
+    if not typed.dtypes.equals(st.session_state[key_df].dtypes):
+        st.session_state[key_df] = typed
+
+    render_import(key_prefix, key_df, crop_list)
+
+    st.markdown("**Enter Project Data** (Scroll right for Local Data)")
+    
+    edited_df = st.data_editor(
+        st.session_state[key_df],
+        key=f"editor_{key_prefix}",
+        num_rows="dynamic",
+        column_config={
+            # --- INPUTS ---
+            "Perennial cropping system deployed": st.column_config.SelectboxColumn("Perennial cropping system deployed", options=crop_list, width="medium", required=True),
+            "Area (ha)": st.column_config.NumberColumn("Area (ha)", min_value=0.0, format="%.2f", width="small"),
+            "Management options - Tillage management": st.column_config.SelectboxColumn("Management options - Tillage management", options=agri_engine.TILLAGE_OPTIONS, width="medium", required=True),
+            "Management options - Input of organic materials": st.column_config.SelectboxColumn("Management options - Input of organic materials", options=agri_engine.INPUT_OPTIONS, width="medium", required=True),
+            "Residue management": st.column_config.SelectboxColumn("Residue management", options=agri_engine.RESIDUE_OPTIONS, width="small", required=True),
+            
+            # --- DEFAULTS (Read-Only) ---
+            # Fully spelled out headers
+            "Emission factors (tC/ha/year) default - Above-ground": st.column_config.NumberColumn("Emission factors (tC/ha/year) default - Above-ground", disabled=True, width="medium"),
+            "Emission factors (tC/ha/year) default - Below-ground": st.column_config.NumberColumn("Emission factors (tC/ha/year) default - Below-ground", disabled=True, width="medium"),
+            "Emission factors (tC/ha/year) default - Soil carbon": st.column_config.NumberColumn("Emission factors (tC/ha/year) default - Soil carbon", disabled=True, width="medium"),
+            "Removal factors default - Tillage": st.column_config.NumberColumn("Removal factors default - Tillage", disabled=True, width="medium"),
+            "Removal factors default - Input": st.column_config.NumberColumn("Removal factors default - Input", disabled=True, width="medium"),
+            "Removal factors default - Residue": st.column_config.NumberColumn("Removal factors default - Residue", disabled=True, width="medium"),
+            
+            # --- LOCAL DATA (Editable) ---
+            # Fully spelled out headers
+            "Emission factors (tC/ha/year) Local - Above-ground": st.column_config.NumberColumn("Emission factors (tC/ha/year) Local - Above-ground", min_value=0.0, width="medium"),
+            "Emission factors (tC/ha/year) Local - Below-ground": st.column_config.NumberColumn("Emission factors (tC/ha/year) Local - Below-ground", min_value=0.0, width="medium"),
+            "Emission factors (tC/ha/year) Local - Soil carbon": st.column_config.NumberColumn("Emission factors (tC/ha/year) Local - Soil carbon", min_value=0.0, width="medium"),
+            "Removal factors Local - Tillage": st.column_config.NumberColumn("Removal factors Local - Tillage", min_value=0.0, width="medium"),
+            "Removal factors Local - Input": st.column_config.NumberColumn("Removal factors Local - Input", min_value=0.0, width="medium"),
+            "Removal factors Local - Residue": st.column_config.NumberColumn("Removal factors Local - Residue", min_value=0.0, width="medium"),
+            
+            # --- RESULT ---
+            "Total GHG emission reduced (tCO2e)": st.column_config.NumberColumn("Total GHG emission reduced (tCO2e)", format="%.2f", disabled=True, width="medium")
+        },
+        use_container_width=True
+    )
+
+    # --- LIVE RECALCULATION (only inserted/edited rows) ---
+    if update_totals(key_prefix, edited_df, crop_data):
+        shared_state.rerun_fragment()
+
+    section_total = shared_state.get(f"agri_total_{key_prefix[-1]}", 0.0)
+    st.caption(f"Section total: **{section_total:,.2f} tCO2e** · Agriculture total: {shared_state.get('agri_grand_total', 0.0):,.2f} tCO2e")
+    return edited_df
+
+def update_totals(key_prefix, df, crop_data, full=False):
+    # Diff df against the last snapshot, recompute changed rows, keep running sums
+    key_total = f"agri_total_{key_prefix[-1]}"
+    key_snap = f"agri_rows_{key_prefix}"
+    key_params = f"agri_params_{key_prefix}"
+    params_key = tuple(sorted(crop_data.items()))
+    snapshot = st.session_state.get(key_snap)
+    if full or st.session_state.get(key_params) != params_key:
+        snapshot = None
+
+    with profiling.span("agri.update_section", rows=len(df)) as timing:
+        df, total, snapshot, n_changed = agri_engine.update_section(
+            df, snapshot, shared_state.get(key_total, 0.0), crop_data
+        )
+        timing.note(changed=n_changed)
+    if n_changed or f"df_{key_prefix}" not in st.session_state:
+        st.session_state[f"df_{key_prefix}"] = df
+    st.session_state[key_snap] = snapshot
+    shared_state.set(key_total, total)
+    if n_changed or ledger.key(key_total) not in st.session_state:
+        shared_state.set_ledger(key_total, agri_engine.section_ledger(snapshot))
+    shared_state.set("agri_grand_total", sum(shared_state.get(f"agri_total_{i}", 0.0) for i in (1, 2, 3)))
+    st.session_state[key_params] = params_key
+    return n_changed > 0
+
+@profiling.timed("agri.render_agri_module")
 def render_agri_module():
     st.header("3. Agriculture")
-    params = parameters.get_agri_params(shared_state.get("gi_country"))
-    crop_list = list(params["agb_bgb_soil"].keys())
+    params = parameters.site_params(st.session_state)
     
-    # Dropdowns
-    tillage_opts = ["Full tillage", "Reduced tillage", "No tillage"]
-    input_opts = ["Low C input", "Medium C input", "High C input, no manure", "High C input, with manure"]
-    residue_opts = ["Burned", "Exported", "Retained"]
-
     # Tabs
     tab1, tab2, tab3 = st.tabs([
         "3.1 Deforestation-free outgrower", 
@@ -21,126 +147,121 @@ def render_agri_module():
         "3.3 Sustainable intensification"
     ])
 
-    # --- RENDERER ---
-    def render_section(key_prefix):
-        key_df = f"df_{key_prefix}"
-        
-        # Internal Column Names (Already full length, but we ensure display matching)
-        cols = [
-            "Perennial cropping system deployed", "Area (ha)", 
-            "Management options - Tillage management", "Management options - Input of organic materials", "Residue management",
-            "Emission factors (tC/ha/year) default - Above-ground", "Emission factors (tC/ha/year) default - Below-ground", "Emission factors (tC/ha/year) default - Soil carbon",
-            "Removal factors default - Tillage", "Removal factors default - Input", "Removal factors default - Residue",
-            "Emission factors (tC/ha/year) Local - Above-ground", "Emission factors (tC/ha/year) Local - Below-ground", "Emission factors (tC/ha/year) Local - Soil carbon",
-            "Removal factors Local - Tillage", "Removal factors Local - Input", "Removal factors Local - Residue",
-            "Total GHG emission reduced (tCO2e)"
-        ]
-        
-        if key_df not in st.session_state:
-            st.session_state[key_df] = pd.DataFrame(columns=cols)
-
-        st.markdown("**Enter Project Data** (Scroll right for Local Data)")
-        
-        edited_df = st.data_editor(
-            st.session_state[key_df],
-            key=f"editor_{key_prefix}",
-            num_rows="dynamic",
-            column_config={
-                # --- INPUTS ---
-                "Perennial cropping system deployed": st.column_config.SelectboxColumn("Perennial cropping system deployed", options=crop_list, width="medium", required=True),
-                "Area (ha)": st.column_config.NumberColumn("Area (ha)", min_value=0.0, format="%.2f", width="small"),
-                "Management options - Tillage management": st.column_config.SelectboxColumn("Management options - Tillage management", options=tillage_opts, width="medium", required=True),
-                "Management options - Input of organic materials": st.column_config.SelectboxColumn("Management options - Input of organic materials", options=input_opts, width="medium", required=True),
-                "Residue management": st.column_config.SelectboxColumn("Residue management", options=residue_opts, width="small", required=True),
-                
-                # --- DEFAULTS (Read-Only) ---
-                # Fully spelled out headers
-                "Emission factors (tC/ha/year) default - Above-ground": st.column_config.NumberColumn("Emission factors (tC/ha/year) default - Above-ground", disabled=True, width="medium"),
-                "Emission factors (tC/ha/year) default - Below-ground": st.column_config.NumberColumn("Emission factors (tC/ha/year) default - Below-ground", disabled=True, width="medium"),
-                "Emission factors (tC/ha/year) default - Soil carbon": st.column_config.NumberColumn("Emission factors (tC/ha/year) default - Soil carbon", disabled=True, width="medium"),
-                "Removal factors default - Tillage": st.column_config.NumberColumn("Removal factors default - Tillage", disabled=True, width="medium"),
-                "Removal factors default - Input": st.column_config.NumberColumn("Removal factors default - Input", disabled=True, width="medium"),
-                "Removal factors default - Residue": st.column_config.NumberColumn("Removal factors default - Residue", disabled=True, width="medium"),
-                
-                # --- LOCAL DATA (Editable) ---
-                # Fully spelled out headers
-                "Emission factors (tC/ha/year) Local - Above-ground": st.column_config.NumberColumn("Emission factors (tC/ha/year) Local - Above-ground", min_value=0.0, width="medium"),
-                "Emission factors (tC/ha/year) Local - Below-ground": st.column_config.NumberColumn("Emission factors (tC/ha/year) Local - Below-ground", min_value=0.0, width="medium"),
-                "Emission factors (tC/ha/year) Local - Soil carbon": st.column_config.NumberColumn("Emission factors (tC/ha/year) Local - Soil carbon", min_value=0.0, width="medium"),
-                "Removal factors Local - Tillage": st.column_config.NumberColumn("Removal factors Local - Tillage", min_value=0.0, width="medium"),
-                "Removal factors Local - Input": st.column_config.NumberColumn("Removal factors Local - Input", min_value=0.0, width="medium"),
-                "Removal factors Local - Residue": st.column_config.NumberColumn("Removal factors Local - Residue", min_value=0.0, width="medium"),
-                
-                # --- RESULT ---
-                "Total GHG emission reduced (tCO2e)": st.column_config.NumberColumn("Total GHG emission reduced (tCO2e)", format="%.2f", disabled=True, width="medium")
-            },
-            use_container_width=True
-        )
-        st.session_state[key_df] = edited_df
-        return edited_df
-
     # Render Sections
-    with tab1: df_1 = render_section("3_1")
-    with tab2: df_2 = render_section("3_2")
-    with tab3: df_3 = render_section("3_3")
+    with tab1: render_section("3_1", params["agb_bgb_soil"])
+    with tab2: render_section("3_2", params["agb_bgb_soil"])
+    with tab3: render_section("3_3", params["agb_bgb_soil"])
 
     st.divider()
     
     # --- CALCULATION ---
-    if st.button("Calculate Agriculture", type="primary"):
-        # Maps
-        rf_tillage = {"Full tillage": 1.0, "Reduced tillage": 1.04, "No tillage": 1.10}
-        rf_input = {"Low C input": 0.92, "Medium C input": 1.0, "High C input, no manure": 1.11, "High C input, with manure": 1.44}
-        rf_residue = {"Burned": 0.9, "Exported": 0.9, "Retained": 1.1} 
-
-        def calc(df):
-            total = 0.0
-            for idx, row in df.iterrows():
-                crop = row.get("Perennial cropping system deployed")
-                area = float(row.get("Area (ha)") or 0)
-                if crop and area > 0:
-                    defaults = params["agb_bgb_soil"].get(crop, (0.0, 0.0, 0.0))
-                    
-                    # Update Default Display
-                    df.at[idx, "Emission factors (tC/ha/year) default - Above-ground"] = defaults[0]
-                    df.at[idx, "Emission factors (tC/ha/year) default - Below-ground"] = defaults[1]
-                    df.at[idx, "Emission factors (tC/ha/year) default - Soil carbon"] = defaults[2]
-                    
-                    t_val = rf_tillage.get(row.get("Management options - Tillage management"), 1.0)
-                    i_val = rf_input.get(row.get("Management options - Input of organic materials"), 1.0)
-                    r_val = rf_residue.get(row.get("Residue management"), 1.0)
-                    
-                    df.at[idx, "Removal factors default - Tillage"] = t_val
-                    df.at[idx, "Removal factors default - Input"] = i_val
-                    df.at[idx, "Removal factors default - Residue"] = r_val
-
-                    # Use Local if entered, else Default
-                    ef_agb = float(row.get("Emission factors (tC/ha/year) Local - Above-ground") or 0) or defaults[0]
-                    ef_bgb = float(row.get("Emission factors (tC/ha/year) Local - Below-ground") or 0) or defaults[1]
-                    ef_soil = float(row.get("Emission factors (tC/ha/year) Local - Soil carbon") or 0) or defaults[2]
-                    
-                    rf_t = float(row.get("Removal factors Local - Tillage") or 0) or t_val
-                    rf_i = float(row.get("Removal factors Local - Input") or 0) or i_val
-                    rf_r = float(row.get("Removal factors Local - Residue") or 0) or r_val
-
-                    # Math
-                    soil_imp = ef_soil * rf_t * rf_i * rf_r
-                    total_c = area * (ef_agb + ef_bgb + soil_imp)
-                    res = total_c * 3.664
-                    df.at[idx, "Total GHG emission reduced (tCO2e)"] = res
-                    total += res
-            return total
-
-        # Calculate & Save
-        total_1 = calc(df_1)
-        total_2 = calc(df_2)
-        total_3 = calc(df_3)
-        grand_total = total_1 + total_2 + total_3
-        
-        shared_state.set("agri_grand_total", grand_total)
-        shared_state.set("agri_total_1", total_1)
-        shared_state.set("agri_total_2", total_2)
-        shared_state.set("agri_total_3", total_3)
-        
-        st.success(f"Calculated! Total: {grand_total:,.2f} tCO2e")
-        st.rerun()
\ No newline at end of file
+    # Totals update live as rows are edited; this recomputes every row from scratch
+    # on the shared job pool (see jobs.py), so the page stays responsive.
+    if "agri_job" in st.session_state:
+        render_calculation_job()
+    elif st.button("Calculate Agriculture", type="primary"):
+        start_calculation(params["agb_bgb_soil"])
+        st.rerun()
+    notice = st.session_state.pop("agri_job_notice", None)
+    if notice:
+        getattr(st, notice[0])(notice[1])
+
+    render_scenarios(params["agb_bgb_soil"])
+
+# --- BACKGROUND CALCULATION ---
+def _calculate_job(job, frames, crop_data):
+    def progress(done, total):
+        job.report(done / total if total else 1.0, f"Calculated {done:,} of {total:,} rows")
+    return agri_engine.recalculate_sections(frames, crop_data, progress=progress)
+
+def start_calculation(crop_data):
+    frames = {key: st.session_state[f"df_{key}"] for key in agri_engine.SECTIONS if f"df_{key}" in st.session_state}
+    try:
+        job = jobs.get_pool().submit(shared_state.session_owner(), "agri.calculate", _calculate_job, frames, crop_data)
+    except jobs.JobLimitError as exc:
+        st.session_state["agri_job_notice"] = ("warning", str(exc))
+        return
+    # Snapshots are only replaced when rows change, so they tell whether a table was edited meanwhile
+    snapshots = {key: st.session_state.get(f"agri_rows_{key}") for key in frames}
+    st.session_state["agri_job"] = (job, snapshots, crop_data)
+
+@st.fragment(run_every=0.5)
+def render_calculation_job():
+    job, snapshots, crop_data = st.session_state["agri_job"]
+    if job.active:
+        st.progress(job.progress, text=job.message)
+        if st.button("Cancel", disabled=job.cancel_requested, key="agri_job_cancel"):
+            job.cancel()
+        return
+
+    del st.session_state["agri_job"]
+    if job.status == jobs.DONE:
+        apply_calculation(job.result, snapshots, crop_data)
+    elif job.status == jobs.FAILED:
+        st.session_state["agri_job_notice"] = ("error", f"Calculation failed: {job.error}")
+    else:
+        st.session_state["agri_job_notice"] = ("info", "Calculation cancelled.")
+    st.rerun()
+
+def apply_calculation(result, snapshots, crop_data):
+    # Tables edited while the job ran keep their live (incremental) results
+    skipped = []
+    for key, (df, total, snapshot) in result.items():
+        if st.session_state.get(f"agri_rows_{key}") is not snapshots[key]:
+            skipped.append(key.replace("_", "."))
+            continue
+        st.session_state[f"df_{key}"] = df
+        st.session_state[f"agri_rows_{key}"] = snapshot
+        st.session_state[f"agri_params_{key}"] = tuple(sorted(crop_data.items()))
+        shared_state.set(f"agri_total_{key[-1]}", total)
+        shared_state.set_ledger(f"agri_total_{key[-1]}", agri_engine.section_ledger(snapshot))
+    grand_total = sum(shared_state.get(f"agri_total_{i}", 0.0) for i in (1, 2, 3))
+    shared_state.set("agri_grand_total", grand_total)
+
+    message = f"Calculated! Total: {grand_total:,.2f} tCO2e"
+    if skipped:
+        message += f" (section(s) {', '.join(skipped)} were edited meanwhile and kept their live totals)"
+    st.session_state["agri_job_notice"] = ("success", message)
+
+# --- SCENARIO SWEEP ---
+@st.fragment
+def render_scenarios(crop_data):
+    with st.expander("Compare management scenarios"):
+        st.caption("Totals if one tillage / input / residue combination were applied to the selected rows. Local removal factors still apply.")
+        c1, c2 = st.columns(2)
+        sections = c1.multiselect(
+            "Sections", list(agri_engine.SECTIONS), default=list(agri_engine.SECTIONS),
+            format_func=lambda k: f"{k.replace('_', '.')} {agri_engine.SECTIONS[k]}", key="sweep_sections"
+        )
+        crops = c2.multiselect("Crops (empty = all)", list(crop_data), key="sweep_crops")
+        options = {}
+        for col, (dim, (_, mapping, _)) in zip(st.columns(3), agri_scenarios.DIMENSIONS.items()):
+            options[dim] = col.multiselect(dim, list(mapping), default=list(mapping), key=f"sweep_{dim.lower()}")
+
+        frames = {k: st.session_state[f"df_{k}"] for k in sections if f"df_{k}" in st.session_state}
+        if not st.button("Run comparison", disabled=not frames or not all(options.values())):
+            return
+        with profiling.span("agri.scenario_sweep", rows=sum(len(df) for df in frames.values())):
+            table, current = agri_scenarios.sweep(frames, crop_data, options, crops or None)
+        st.dataframe(table, hide_index=True, use_container_width=True, column_config={
+            "Total (tCO2e)": st.column_config.NumberColumn(format="%.2f"),
+            "Change vs current (tCO2e)": st.column_config.NumberColumn(format="%+.2f")
+        })
+
+        # Tornado: each dimension varied with the others at the most common current choice
+        reference = agri_scenarios.most_common_options(frames)
+        tornado = agri_scenarios.sensitivity(table, reference)
+        base = table.loc[(table[list(reference)] == pd.Series(reference)).all(axis=1), "Total (tCO2e)"]
+        base = float(base.iloc[0]) if len(base) else current
+        fig = go.Figure([
+            go.Bar(y=tornado["Dimension"], x=tornado["Low (tCO2e)"] - base, base=base, orientation="h",
+                   name="Low", marker_color="#E76F51", text=tornado["Low option"]),
+            go.Bar(y=tornado["Dimension"], x=tornado["High (tCO2e)"] - base, base=base, orientation="h",
+                   name="High", marker_color="#2A9D8F", text=tornado["High option"])
+        ])
+        fig.update_layout(
+            barmode="overlay", height=300, margin=dict(t=30, b=40),
+            title="Sensitivity around: " + ", ".join(reference.values()),
+            xaxis_title="Total (tCO2e)", paper_bgcolor='white', plot_bgcolor='white'
+        )
+        st.plotly_chart(fig, use_container_width=True)
@@ -0,0 +1,481 @@
+# agri_engine.py
+# Columnar agriculture calculator (no Streamlit import, usable headless)
+import numpy as np
+import pandas as pd
+import parameters
+import calc_cache
+import ledger
+
+# --- COLUMN NAMES (shared with the data editors in agri.py) ---
+COL_CROP = "Perennial cropping system deployed"
+COL_AREA = "Area (ha)"
+COL_TILLAGE = "Management options - Tillage management"
+COL_INPUT = "Management options - Input of organic materials"
+COL_RESIDUE = "Residue management"
+
+COL_DEF_AGB = "Emission factors (tC/ha/year) default - Above-ground"
+COL_DEF_BGB = "Emission factors (tC/ha/year) default - Below-ground"
+COL_DEF_SOIL = "Emission factors (tC/ha/year) default - Soil carbon"
+COL_DEF_TILLAGE = "Removal factors default - Tillage"
+COL_DEF_INPUT = "Removal factors default - Input"
+COL_DEF_RESIDUE = "Removal factors default - Residue"
+
+COL_LOC_AGB = "Emission factors (tC/ha/year) Local - Above-ground"
+COL_LOC_BGB = "Emission factors (tC/ha/year) Local - Below-ground"
+COL_LOC_SOIL = "Emission factors (tC/ha/year) Local - Soil carbon"
+COL_LOC_TILLAGE = "Removal factors Local - Tillage"
+COL_LOC_INPUT = "Removal factors Local - Input"
+COL_LOC_RESIDUE = "Removal factors Local - Residue"
+
+COL_RESULT = "Total GHG emission reduced (tCO2e)"
+
+# Editable inputs; everything else in the table is derived from these
+INPUT_COLUMNS = [
+    COL_CROP, COL_AREA,
+    COL_TILLAGE, COL_INPUT, COL_RESIDUE,
+    COL_LOC_AGB, COL_LOC_BGB, COL_LOC_SOIL,
+    COL_LOC_TILLAGE, COL_LOC_INPUT, COL_LOC_RESIDUE
+]
+COMPUTED_COLUMNS = [
+    COL_DEF_AGB, COL_DEF_BGB, COL_DEF_SOIL,
+    COL_DEF_TILLAGE, COL_DEF_INPUT, COL_DEF_RESIDUE,
+    COL_RESULT
+]
+
+AGRI_COLUMNS = [
+    COL_CROP, COL_AREA,
+    COL_TILLAGE, COL_INPUT, COL_RESIDUE,
+    COL_DEF_AGB, COL_DEF_BGB, COL_DEF_SOIL,
+    COL_DEF_TILLAGE, COL_DEF_INPUT, COL_DEF_RESIDUE,
+    COL_LOC_AGB, COL_LOC_BGB, COL_LOC_SOIL,
+    COL_LOC_TILLAGE, COL_LOC_INPUT, COL_LOC_RESIDUE,
+    COL_RESULT
+]
+
+SECTIONS = {
+    "3_1": "Deforestation-free outgrower",
+    "3_2": "Agro-industrial expansion",
+    "3_3": "Sustainable intensification"
+}
+
+# --- MANAGEMENT OPTIONS & REMOVAL FACTORS ---
+RF_TILLAGE = {"Full tillage": 1.0, "Reduced tillage": 1.04, "No tillage": 1.10}
+RF_INPUT = {"Low C input": 0.92, "Medium C input": 1.0, "High C input, no manure": 1.11, "High C input, with manure": 1.44}
+RF_RESIDUE = {"Burned": 0.9, "Exported": 0.9, "Retained": 1.1}
+
+TILLAGE_OPTIONS = list(RF_TILLAGE)
+INPUT_OPTIONS = list(RF_INPUT)
+RESIDUE_OPTIONS = list(RF_RESIDUE)
+
+C_TO_CO2 = 3.664
+
+# --- SCHEMA ---
+# Selectbox columns are categorical. Inputs and results are float64 (NaN = "not
+# entered"). The display-only default columns are float32.
+DEFAULT_FACTOR_COLUMNS = COMPUTED_COLUMNS[:-1]
+
+
+def section_dtypes(crop_list=None):
+    crops = list(parameters.AGRI_CROP_DATA) if crop_list is None else list(crop_list)
+    dtypes = {col: np.dtype("float64") for col in AGRI_COLUMNS}
+    dtypes.update({col: np.dtype("float32") for col in DEFAULT_FACTOR_COLUMNS})
+    dtypes[COL_CROP] = pd.CategoricalDtype(crops)
+    dtypes[COL_TILLAGE] = pd.CategoricalDtype(TILLAGE_OPTIONS)
+    dtypes[COL_INPUT] = pd.CategoricalDtype(INPUT_OPTIONS)
+    dtypes[COL_RESIDUE] = pd.CategoricalDtype(RESIDUE_OPTIONS)
+    return dtypes
+
+
+def empty_section_frame(crop_list=None):
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in section_dtypes(crop_list).items()})
+
+
+def _categorical(series, dtype):
+    if isinstance(series.dtype, pd.CategoricalDtype) and set(dtype.categories) <= set(series.cat.categories):
+        return series
+    values = series.astype(object)
+    values = values.where(values.notna() & (values.astype(str).str.strip() != ""), None)
+    # Unknown values are kept as extra categories rather than silently becoming NaN
+    extra = sorted(set(values.dropna().unique()) - set(dtype.categories), key=str)
+    if extra:
+        dtype = pd.CategoricalDtype(list(dtype.categories) + extra)
+    return pd.Series(pd.Categorical(values, dtype=dtype), index=series.index)
+
+
+def coerce_section_frame(df, crop_list=None):
+    """Return df with the 18 agriculture columns in the typed section schema."""
+    out = df.reindex(columns=AGRI_COLUMNS)
+    for col, dtype in section_dtypes(crop_list).items():
+        series = out[col]
+        if isinstance(dtype, pd.CategoricalDtype):
+            typed = _categorical(series, dtype)
+            if typed is not series:
+                out[col] = typed
+        elif series.dtype != dtype:
+            out[col] = pd.to_numeric(series, errors="coerce").astype(dtype)
+    return out
+
+
+def _numbers(df, col):
+    # Same as float(x or 0) per cell: missing, empty and NaN all become 0
+    if col not in df.columns:
+        return np.zeros(len(df))
+    return pd.to_numeric(df[col], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+
+
+def _lookup(df, col, mapping, fallback):
+    if col not in df.columns:
+        return np.full(len(df), fallback)
+    series = df[col]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Map the few categories once, then gather by code
+        per_category = pd.Series(series.cat.categories).map(mapping).astype(float).fillna(fallback).to_numpy()
+        codes = series.cat.codes.to_numpy()
+        return np.where(codes >= 0, per_category[np.maximum(codes, 0)], fallback)
+    return series.map(mapping).astype(float).fillna(fallback).to_numpy()
+
+
+def _has_value(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        filled = (pd.Series(series.cat.categories).astype(str).str.len() > 0).to_numpy()
+        codes = series.cat.codes.to_numpy()
+        return (codes >= 0) & filled[np.maximum(codes, 0)]
+    return (series.notna() & (series.astype(str).str.len() > 0)).to_numpy()
+
+
+def row_factors(df, crop_data):
+    """Per-row area, default and effective (local if entered) factors as arrays.
+
+    Keys: active, area, the six defaults (agb, bgb, soil, tillage, input,
+    residue), their effective values ef_* and local_* masks (True where a
+    local value replaced the default).
+    """
+    crop = df[COL_CROP] if COL_CROP in df.columns else pd.Series(None, index=df.index, dtype=object)
+    area = _numbers(df, COL_AREA)
+
+    # Rows are computed only when a crop is chosen and the area is positive
+    factors = {"active": _has_value(crop) & (area > 0), "area": area}
+    if not factors["active"].any():
+        return factors
+
+    # Defaults (unknown crops fall back to zeros, unknown options to 1.0)
+    defaults = {
+        "agb": (COL_CROP, {k: v[0] for k, v in crop_data.items()}, 0.0, COL_LOC_AGB),
+        "bgb": (COL_CROP, {k: v[1] for k, v in crop_data.items()}, 0.0, COL_LOC_BGB),
+        "soil": (COL_CROP, {k: v[2] for k, v in crop_data.items()}, 0.0, COL_LOC_SOIL),
+        "tillage": (COL_TILLAGE, RF_TILLAGE, 1.0, COL_LOC_TILLAGE),
+        "input": (COL_INPUT, RF_INPUT, 1.0, COL_LOC_INPUT),
+        "residue": (COL_RESIDUE, RF_RESIDUE, 1.0, COL_LOC_RESIDUE)
+    }
+    for name, (col, mapping, fallback, local_col) in defaults.items():
+        default = _lookup(df, col, mapping, fallback)
+        # Use Local if entered, else Default
+        local = _numbers(df, local_col)
+        factors[name] = default
+        factors[f"local_{name}"] = local != 0
+        factors[f"ef_{name}"] = np.where(local != 0, local, default)
+    return factors
+
+
+def _compute(df, crop_data):
+    """Return (active mask, {computed column: values}) for a section table."""
+    f = row_factors(df, crop_data)
+    active = f["active"]
+    if not active.any():
+        return active, {}
+    return active, _computed_values(f)
+
+
+def _computed_values(f):
+    # Math (same operation order as the original per-row loop)
+    soil_imp = f["ef_soil"] * f["ef_tillage"] * f["ef_input"] * f["ef_residue"]
+    total_c = f["area"] * (f["ef_agb"] + f["ef_bgb"] + soil_imp)
+    res = total_c * C_TO_CO2
+
+    return {
+        COL_DEF_AGB: f["agb"], COL_DEF_BGB: f["bgb"], COL_DEF_SOIL: f["soil"],
+        COL_DEF_TILLAGE: f["tillage"], COL_DEF_INPUT: f["input"], COL_DEF_RESIDUE: f["residue"],
+        COL_RESULT: res
+    }
+
+
+# --- RESULT CACHE ---
+# Full-table results are memoized in calc_cache under the per-row input hashes
+# plus a token of every parameter the formula reads, so a parameter change
+# never returns an old result. Bump CACHE_VERSION when the formula changes.
+CACHE_VERSION = 1
+
+
+def parameter_token(crop_data):
+    return calc_cache.token(
+        "agri", CACHE_VERSION, sorted((str(k), list(v)) for k, v in crop_data.items()),
+        RF_TILLAGE, RF_INPUT, RF_RESIDUE, C_TO_CO2, parameters.GWP_DEFAULTS
+    )
+
+
+def _cached_compute(df, crop_data, hashes=None):
+    cache = calc_cache.get_cache() if len(df) >= calc_cache.MIN_ROWS else None
+    if cache is None:
+        return _compute(df, crop_data)
+    hashes = row_hashes(df).to_numpy() if hashes is None else hashes
+    entry_key = calc_cache.key("agri_section", parameter_token(crop_data), hashes)
+    stored = cache.get(entry_key)
+    if stored is not None and stored.shape == (len(df), len(COMPUTED_COLUMNS) + 1):
+        return stored[:, 0] > 0, dict(zip(COMPUTED_COLUMNS, stored[:, 1:].T))
+
+    active, values = _compute(df, crop_data)
+    zeros = np.zeros(len(df))
+    cache.put(entry_key, np.column_stack([active] + [values.get(col, zeros) for col in COMPUTED_COLUMNS]))
+    return active, values
+
+
+def _number(value):
+    # float(x or 0) as in _numbers: missing, invalid and NaN count as 0
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if value != value else value
+
+
+def score_records(records, crop_data=None):
+    """Score plain {input column: value} dicts without building a DataFrame.
+
+    Same rules as calculate_section, for many small batches (e.g. api.py) where
+    pandas overhead would dominate. Returns (active mask, {computed column: array}).
+    """
+    crop_data = parameters.AGRI_CROP_DATA if crop_data is None else crop_data
+    n = len(records)
+    crops = [r.get(COL_CROP) for r in records]
+    has_crop = np.array([
+        c is not None and c == c and str(c).strip() != "" for c in crops
+    ], dtype=bool)
+    area = np.array([_number(r.get(COL_AREA)) for r in records], dtype=float).reshape(n)
+    f = {"active": has_crop & (area > 0), "area": area}
+
+    crop_factors = np.array([crop_data.get(c, (0.0, 0.0, 0.0))[:3] if isinstance(c, str) else (0.0, 0.0, 0.0) for c in crops], dtype=float).reshape(n, 3)
+    defaults = {
+        "agb": (crop_factors[:, 0], COL_LOC_AGB),
+        "bgb": (crop_factors[:, 1], COL_LOC_BGB),
+        "soil": (crop_factors[:, 2], COL_LOC_SOIL),
+        "tillage": (np.array([RF_TILLAGE.get(r.get(COL_TILLAGE), 1.0) for r in records], dtype=float).reshape(n), COL_LOC_TILLAGE),
+        "input": (np.array([RF_INPUT.get(r.get(COL_INPUT), 1.0) for r in records], dtype=float).reshape(n), COL_LOC_INPUT),
+        "residue": (np.array([RF_RESIDUE.get(r.get(COL_RESIDUE), 1.0) for r in records], dtype=float).reshape(n), COL_LOC_RESIDUE)
+    }
+    for name, (default, local_col) in defaults.items():
+        local = np.array([_number(r.get(local_col)) for r in records], dtype=float).reshape(n)
+        f[name] = default
+        f[f"local_{name}"] = local != 0
+        f[f"ef_{name}"] = np.where(local != 0, local, default)
+    return f["active"], _computed_values(f)
+
+
+def _write(out, rows, values):
+    # rows: boolean mask or row positions. Whole columns are replaced (one
+    # positional assignment each) rather than written through .loc labels.
+    for col, col_values in values.items():
+        if col not in out.columns:
+            column = np.full(len(out), np.nan)
+        elif pd.api.types.is_float_dtype(out[col].dtype):
+            column = out[col].to_numpy(copy=True)
+        else:
+            column = pd.to_numeric(out[col], errors="coerce").to_numpy(dtype=float, copy=True)
+        column[rows] = col_values
+        out[col] = column
+
+
+def calculate_section(df, crop_data=None):
+    """Compute defaults and tCO2e for one section table; returns (df, total)."""
+    crop_data = parameters.AGRI_CROP_DATA if crop_data is None else crop_data
+    out = coerce_section_frame(df, list(crop_data))
+    if out.empty:
+        return out, 0.0
+
+    active, values = _cached_compute(out, crop_data)
+    if not active.any():
+        return out, 0.0
+
+    # Write back only the computed rows; other rows keep whatever they had
+    _write(out, active, {col: v[active] for col, v in values.items()})
+    return out, float(values[COL_RESULT][active].sum())
+
+
+def calculate_sections(frames, crop_data=None):
+    """Run calculate_section over {section_key: df}; returns (frames, totals)."""
+    out_frames, totals = {}, {}
+    for key, df in frames.items():
+        out_frames[key], totals[key] = calculate_section(df, crop_data)
+    return out_frames, totals
+
+
+# --- INCREMENTAL UPDATES ---
+# A snapshot keeps one input hash and one result per row (16 bytes/row), so an
+# edited table can be diffed against it and only changed rows recomputed.
+def row_hashes(df):
+    inputs = df.reindex(columns=INPUT_COLUMNS)
+    return pd.util.hash_pandas_object(inputs, index=False)
+
+
+def _recompute_rows(out, rows, crop_data, hashes=None):
+    # Recompute the given row positions in place; rows that are no longer valid
+    # lose their stale computed values. Returns the new per-row results. With
+    # the rows' input hashes the result goes through the cache (full runs).
+    sub = out.iloc[rows]
+    results = np.full(len(sub), np.nan)
+    if not len(sub):
+        return results
+    active, values = _compute(sub, crop_data) if hashes is None else _cached_compute(sub, crop_data, hashes)
+    if (~active).any():
+        _write(out, rows[~active], {col: np.nan for col in COMPUTED_COLUMNS})
+    if active.any():
+        _write(out, rows[active], {col: v[active] for col, v in values.items()})
+        results[active] = values[COL_RESULT][active]
+    return results
+
+
+def update_section(df, snapshot=None, total=0.0, crop_data=None):
+    """Recompute only inserted/edited rows of df against a previous snapshot.
+
+    Returns (df, total, snapshot, n_changed). total is kept as a running sum:
+    the old contribution of changed and deleted rows is subtracted and the
+    new contribution of changed rows added. Pass snapshot=None for a full run.
+    """
+    crop_data = parameters.AGRI_CROP_DATA if crop_data is None else crop_data
+    df = coerce_section_frame(df, list(crop_data))
+    hashes = row_hashes(df).to_numpy()
+
+    if snapshot is None:
+        snapshot = pd.DataFrame({"hash": np.zeros(0, dtype=np.uint64), "result": np.zeros(0)})
+        total = 0.0
+
+    # Map current rows onto the snapshot by index label (-1 = inserted row)
+    pos = snapshot.index.get_indexer(df.index)
+    old_hash = snapshot["hash"].to_numpy()
+    old_result = snapshot["result"].to_numpy()
+    known = pos >= 0
+    kept = np.zeros(len(snapshot), dtype=bool)
+    kept[pos[known]] = True
+
+    changed = ~known
+    changed[known] = old_hash[pos[known]] != hashes[known]
+    rows = np.flatnonzero(changed)
+    n_changed = len(rows) + int((~kept).sum())
+    if not n_changed:
+        return df, total, snapshot, 0
+
+    out = df.copy(deep=False)  # _write replaces whole columns, df is untouched
+    new_results = _recompute_rows(out, rows, crop_data, hashes if len(rows) == len(df) else None)
+
+    results = np.full(len(df), np.nan)
+    results[known] = old_result[pos[known]]
+    removed = np.nansum(results[rows]) + np.nansum(old_result[~kept])
+    results[rows] = new_results
+
+    total = total - removed + float(np.nansum(new_results))
+    snapshot = pd.DataFrame({"hash": hashes, "result": results}, index=df.index)
+    return out, total, snapshot, n_changed
+
+
+def section_ledger(snapshot):
+    """Per-gas ledger of a section from its update_section snapshot (CO2 only, no copy)."""
+    return ledger.Ledger.co2(snapshot["result"].to_numpy())
+
+
+def recalculate_sections(frames, crop_data=None, chunk_rows=50_000, progress=None):
+    """Full update_section run over {section_key: df}, chunk_rows rows at a time.
+
+    Returns {section_key: (df, total, snapshot)}. progress(rows_done, rows_total)
+    is called after each chunk and may raise to stop the run.
+    """
+    rows_total, rows_done = sum(len(df) for df in frames.values()), 0
+    out = {}
+    for key, df in frames.items():
+        parts, snapshots, total = [], [], 0.0
+        for start in range(0, max(len(df), 1), chunk_rows):
+            part, part_total, snapshot, _ = update_section(df.iloc[start:start + chunk_rows], None, 0.0, crop_data)
+            parts.append(part)
+            snapshots.append(snapshot)
+            total += part_total
+            rows_done += len(part)
+            if progress:
+                progress(rows_done, rows_total)
+        out[key] = (pd.concat(parts) if len(parts) > 1 else parts[0], total, pd.concat(snapshots) if len(snapshots) > 1 else snapshots[0])
+    return out
+
+
+# --- ANNUAL PROJECTION ---
+# Area is adopted linearly over the implementation years and kept through the
+# capitalization years. Adopted area accrues biomass (AGB + BGB) every year; the
+# soil-carbon change of each adopted hectare is spread evenly over soil_divisor
+# years from its adoption. Everything is returned in tCO2e per project year.
+SOIL_DIVISOR = 20
+
+
+def adoption_profile(impl_years, cap_years):
+    """Share of the area in place in each project year (length impl + cap)."""
+    horizon = int(impl_years or 0) + int(cap_years or 0)
+    years = np.arange(1, horizon + 1)
+    if not impl_years:
+        return np.ones(horizon)
+    return np.minimum(years / int(impl_years), 1.0)
+
+
+def year_profiles(impl_years, cap_years, soil_divisor=SOIL_DIVISOR):
+    """Per-year weights (p_bio, p_soil) applied to the row totals."""
+    p_bio = adoption_profile(impl_years, cap_years)
+    # Soil: area adopted in year k contributes 1/divisor in years k .. k+divisor-1,
+    # i.e. (adopted[y] - adopted[y - divisor]) / divisor
+    divisor = max(int(soil_divisor or SOIL_DIVISOR), 1)
+    lagged = np.concatenate([np.zeros(divisor), p_bio])[:len(p_bio)]
+    return p_bio, (p_bio - lagged) / divisor
+
+
+def row_components(df, crop_data=None):
+    """Per-row (biomass, soil) in tCO2e; zero for rows that are not computed.
+    Large tables go through the result cache like calculate_section."""
+    crop_data = parameters.AGRI_CROP_DATA if crop_data is None else crop_data
+    df = coerce_section_frame(df, list(crop_data))
+    cache = calc_cache.get_cache() if len(df) >= calc_cache.MIN_ROWS else None
+    if cache is None:
+        return _components(df, crop_data)
+    entry_key = calc_cache.key("agri_components", parameter_token(crop_data), row_hashes(df).to_numpy())
+    stored = cache.get(entry_key)
+    if stored is not None and stored.shape == (len(df), 2):
+        return stored[:, 0], stored[:, 1]
+    bio, soil = _components(df, crop_data)
+    cache.put(entry_key, np.column_stack([bio, soil]))
+    return bio, soil
+
+
+def _components(df, crop_data):
+    f = row_factors(df, crop_data)
+    if not f["active"].any():
+        return np.zeros(len(df)), np.zeros(len(df))
+    active = f["active"]
+    bio = np.where(active, f["area"] * (f["ef_agb"] + f["ef_bgb"]) * C_TO_CO2, 0.0)
+    soil_imp = f["ef_soil"] * f["ef_tillage"] * f["ef_input"] * f["ef_residue"]
+    soil = np.where(active, f["area"] * soil_imp * C_TO_CO2, 0.0)
+    return bio, soil
+
+
+def project_rows(df, impl_years, cap_years, crop_data=None, soil_divisor=SOIL_DIVISOR, dtype=np.float64):
+    """Rows x project years matrix of annual tCO2e (one broadcast, no per-year loop)."""
+    bio, soil = row_components(df, crop_data)
+    p_bio, p_soil = year_profiles(impl_years, cap_years, soil_divisor)
+    out = np.multiply(bio[:, None], p_bio, dtype=dtype)
+    out += (soil[:, None] * p_soil).astype(dtype, copy=False)
+    return out
+
+
+def project_sections(frames, impl_years, cap_years, crop_data=None, soil_divisor=SOIL_DIVISOR):
+    """Annual tCO2e per section: {section_key: array(years)}.
+
+    Summing the rows first gives the same totals as project_rows().sum(axis=0)
+    without building the rows x years matrix.
+    """
+    p_bio, p_soil = year_profiles(impl_years, cap_years, soil_divisor)
+    annual = {}
+    for key, df in frames.items():
+        bio, soil = row_components(df, crop_data)
+        annual[key] = bio.sum() * p_bio + soil.sum() * p_soil
+    return annual
@@ -0,0 +1,248 @@
+# agri_import.py
+# Chunked Excel/CSV import for the agriculture section tables (no Streamlit)
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+import agri_engine as E
+import parameters
+
+CHUNK_ROWS = 10_000
+
+# Only inputs are imported; defaults and results are recomputed by the engine
+INPUT_COLUMNS = E.INPUT_COLUMNS
+NUMERIC_COLUMNS = INPUT_COLUMNS[5:] + [E.COL_AREA]
+
+# Short headers people use in their own registries
+HEADER_ALIASES = {
+    "crop": E.COL_CROP,
+    "cropping system": E.COL_CROP,
+    "perennial cropping system": E.COL_CROP,
+    "system": E.COL_CROP,
+    "area": E.COL_AREA,
+    "area ha": E.COL_AREA,
+    "hectares": E.COL_AREA,
+    "tillage": E.COL_TILLAGE,
+    "tillage management": E.COL_TILLAGE,
+    "input": E.COL_INPUT,
+    "organic input": E.COL_INPUT,
+    "input of organic materials": E.COL_INPUT,
+    "residue": E.COL_RESIDUE,
+    "residues": E.COL_RESIDUE,
+    "local agb": E.COL_LOC_AGB,
+    "local above ground": E.COL_LOC_AGB,
+    "local bgb": E.COL_LOC_BGB,
+    "local below ground": E.COL_LOC_BGB,
+    "local soil": E.COL_LOC_SOIL,
+    "local soil carbon": E.COL_LOC_SOIL,
+    "local tillage": E.COL_LOC_TILLAGE,
+    "local input": E.COL_LOC_INPUT,
+    "local residue": E.COL_LOC_RESIDUE
+}
+
+
+def normalize_header(header):
+    return re.sub(r"[^a-z0-9]+", " ", str(header or "").lower()).strip()
+
+
+_KNOWN_HEADERS = {normalize_header(c): c for c in E.AGRI_COLUMNS}
+_KNOWN_HEADERS.update(HEADER_ALIASES)
+
+
+def map_headers(headers):
+    """Return {source position: agriculture column} for recognised headers."""
+    mapping = {}
+    for pos, header in enumerate(headers):
+        col = _KNOWN_HEADERS.get(normalize_header(header))
+        if col in INPUT_COLUMNS and col not in mapping.values():
+            mapping[pos] = col
+    return mapping
+
+
+# --- READERS (yield raw chunks of at most chunk_rows rows) ---
+# Raised after the header, so a file without the needed columns is reported as such
+NO_DATA_ROWS = "The file has no data rows."
+
+
+def _iter_xlsx(source, sheet=None, chunk_rows=CHUNK_ROWS):
+    book = load_workbook(source, read_only=True, data_only=True)
+    try:
+        ws = book[sheet] if sheet in book.sheetnames else book.active
+        rows = ws.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if headers is None:
+            raise ValueError(NO_DATA_ROWS)
+        total = max((ws.max_row or 0) - 1, 0) or None
+        yield "header", list(headers), total
+        chunk, n_rows = [], 0
+        for values in rows:
+            chunk.append(values)
+            n_rows += 1
+            if len(chunk) >= chunk_rows:
+                yield "rows", chunk, None
+                chunk = []
+        if chunk:
+            yield "rows", chunk, None
+        if not n_rows:
+            raise ValueError(NO_DATA_ROWS)
+    finally:
+        book.close()
+
+
+def _iter_csv(source, chunk_rows=CHUNK_ROWS, dtype=str):
+    size = _source_size(source)
+    try:
+        reader = pd.read_csv(source, dtype=dtype, chunksize=chunk_rows, skip_blank_lines=False)
+    except pd.errors.EmptyDataError:
+        raise ValueError(NO_DATA_ROWS)
+    first, n_rows = True, 0
+    for chunk in reader:
+        if first:
+            # A header-only file gives one empty chunk that still has the columns
+            yield "header", list(chunk.columns), None
+            first = False
+        n_rows += len(chunk)
+        if len(chunk):
+            yield "rows", chunk, _fraction_read(source, size)
+    if not n_rows:
+        raise ValueError(NO_DATA_ROWS)
+
+
+def _source_size(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    try:
+        pos = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(pos)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+
+def _fraction_read(source, size):
+    try:
+        return min(source.tell() / size, 1.0) if size else None
+    except (AttributeError, OSError):
+        return None
+
+
+def iter_chunks(source, filename=None, sheet=None, chunk_rows=CHUNK_ROWS, csv_dtype=str):
+    """Yield ("header", headers, total_rows) then ("rows", chunk, fraction_read) items.
+
+    Chunks are lists of tuples (.xlsx) or DataFrames (.csv; all strings unless
+    csv_dtype=None lets pandas parse the numbers). Raises ValueError(NO_DATA_ROWS)
+    for an empty file, or after the header if no row follows it.
+    """
+    name = (filename or getattr(source, "name", None) or str(source)).lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        return _iter_xlsx(source, sheet, chunk_rows)
+    return _iter_csv(source, chunk_rows, csv_dtype)
+
+
+def chunk_frame(payload, mapping):
+    """Columns `mapping` ({source position: column}) of one chunk as a DataFrame."""
+    if isinstance(payload, pd.DataFrame):
+        chunk = payload.iloc[:, list(mapping)]
+    else:
+        chunk = pd.DataFrame.from_records(
+            [tuple(r[p] if p < len(r) else None for p in mapping) for r in payload]
+        )
+    chunk.columns = list(mapping.values())
+    return chunk
+
+
+# --- VALIDATION ---
+# One row per rejected cell; Row is the spreadsheet row number (header = row 1)
+ISSUE_COLUMNS = ["Row", "Column", "Value", "Problem"]
+
+
+def _option_map(options):
+    return {str(o).strip().lower(): o for o in options}
+
+
+def _canonical(series, lookup):
+    # Case/whitespace-insensitive match onto the editor options; None if unknown
+    text = series.astype("string").str.strip()
+    blank = text.isna() | (text == "")
+    mapped = text.str.lower().map(lookup)
+    return mapped.where(~blank, None), blank
+
+
+def _validate_chunk(chunk, first_row, option_maps):
+    """Return (valid rows, issues) for a chunk whose columns are INPUT_COLUMNS."""
+    rows = np.arange(first_row, first_row + len(chunk))
+    bad = np.zeros(len(chunk), dtype=bool)
+    issues = []
+    out = pd.DataFrame(index=chunk.index)
+    # Lines whose cells are all blank (empty or whitespace) are skipped without a report
+    empty = np.ones(len(chunk), dtype=bool)
+
+    for col, lookup in option_maps.items():
+        mapped, blank = _canonical(chunk[col], lookup)
+        empty &= blank.to_numpy()
+        unknown = (mapped.isna() & ~blank).to_numpy()
+        for r, v in zip(rows[unknown], chunk[col].to_numpy()[unknown]):
+            issues.append({"Row": int(r), "Column": col, "Value": v, "Problem": "Unknown value"})
+        bad |= unknown
+        out[col] = mapped.astype(object)
+
+    for col in NUMERIC_COLUMNS:
+        raw = chunk[col]
+        values = pd.to_numeric(raw, errors="coerce")
+        blank = raw.isna() | (raw.astype("string").str.strip() == "")
+        empty &= blank.to_numpy()
+        invalid = (values.isna() & ~blank).to_numpy()
+        for r, v in zip(rows[invalid], raw.to_numpy()[invalid]):
+            issues.append({"Row": int(r), "Column": col, "Value": v, "Problem": "Not a number"})
+        bad |= invalid
+        out[col] = values.astype(float)
+
+    keep = ~bad & ~empty
+    return out.loc[keep], issues
+
+
+def import_table(source, filename=None, crop_list=None, sheet=None, chunk_rows=CHUNK_ROWS, progress=None):
+    """Stream an .xlsx/.csv file into a section table.
+
+    Returns (df, issues, unmapped_headers). Row numbers in issues are the
+    spreadsheet row numbers (header = row 1).
+    """
+    chunks = iter_chunks(source, filename, sheet, chunk_rows)
+
+    crops = list(crop_list if crop_list is not None else parameters.AGRI_CROP_DATA)
+    option_maps = {
+        E.COL_CROP: _option_map(crops),
+        E.COL_TILLAGE: _option_map(E.TILLAGE_OPTIONS),
+        E.COL_INPUT: _option_map(E.INPUT_OPTIONS),
+        E.COL_RESIDUE: _option_map(E.RESIDUE_OPTIONS)
+    }
+
+    parts, issues = [], []
+    mapping, unmapped, total = {}, [], None
+    next_row, done = 2, 0
+    for kind, payload, extra in chunks:
+        if kind == "header":
+            mapping = map_headers(payload)
+            unmapped = [h for pos, h in enumerate(payload) if pos not in mapping and h not in (None, "")]
+            if E.COL_CROP not in mapping.values():
+                raise ValueError("No crop column found (expected 'Perennial cropping system deployed' or 'Crop').")
+            total = extra
+            continue
+
+        chunk = chunk_frame(payload, mapping).reindex(columns=INPUT_COLUMNS)
+
+        valid, chunk_issues = _validate_chunk(chunk, next_row, option_maps)
+        parts.append(E.coerce_section_frame(valid, crops))
+        issues.extend(chunk_issues)
+        next_row += len(chunk)
+        done += len(chunk)
+        if progress:
+            fraction = extra if extra is not None else (min(done / total, 1.0) if total else None)
+            progress(done, fraction)
+
+    df = pd.concat(parts, ignore_index=True) if parts else E.empty_section_frame(crops)
+    return df, pd.DataFrame(issues, columns=ISSUE_COLUMNS), unmapped
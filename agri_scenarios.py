@@ -0,0 +1,109 @@
+# agri_scenarios.py
+# Management-practice sweep: the section totals for every tillage x input x
+# residue combination, as if that combination were chosen on the selected rows.
+# No Streamlit import.
+import numpy as np
+import pandas as pd
+import parameters
+import agri_engine
+
+E = agri_engine
+DIMENSIONS = {
+    "Tillage": (E.COL_TILLAGE, E.RF_TILLAGE, "tillage"),
+    "Input": (E.COL_INPUT, E.RF_INPUT, "input"),
+    "Residue": (E.COL_RESIDUE, E.RF_RESIDUE, "residue")
+}
+
+
+def _removal_matrix(f, name, options, mapping):
+    # (rows, options): the option's default factor, or the row's local value if entered
+    local = f[f"local_{name}"]
+    values = np.array([mapping[o] for o in options], dtype=float)
+    return np.where(local[:, None], f[f"ef_{name}"][:, None], values)
+
+
+def sweep(frames, crop_data=None, options=None, crops=None):
+    """Total tCO2e of every management combination.
+
+    frames: {section_key: df}. options: {"Tillage": [...], "Input": [...],
+    "Residue": [...]} to sweep a subset (default: all options). crops: only
+    rows with these crops get the scenario; other rows keep their own choices.
+    Locally entered removal factors still override the option defaults.
+    Returns (table sorted by total, current total).
+    """
+    crop_data = parameters.AGRI_CROP_DATA if crop_data is None else crop_data
+    options = {dim: list((options or {}).get(dim) or mapping) for dim, (_, mapping, _) in DIMENSIONS.items()}
+    shape = tuple(len(v) for v in options.values())
+
+    swept = np.zeros(shape)
+    fixed = current = 0.0
+    for df in frames.values():
+        df = E.coerce_section_frame(df, list(crop_data))
+        f = E.row_factors(df, crop_data)
+        if not f["active"].any():
+            continue
+        soil_imp = f["ef_soil"] * f["ef_tillage"] * f["ef_input"] * f["ef_residue"]
+        results = f["area"] * (f["ef_agb"] + f["ef_bgb"] + soil_imp)
+        current += results[f["active"]].sum()
+
+        selected = f["active"]
+        if crops is not None:
+            selected = selected & df[E.COL_CROP].isin(list(crops)).to_numpy()
+        fixed += results[f["active"] & ~selected].sum()
+        if not selected.any():
+            continue
+
+        sub = {k: v[selected] for k, v in f.items()}
+        fixed += (sub["area"] * (sub["ef_agb"] + sub["ef_bgb"])).sum()
+        w = sub["area"] * sub["ef_soil"]
+        defaults = [np.array([mapping[o] for o in options[dim]]) for dim, (_, mapping, _) in DIMENSIONS.items()]
+        # Rows without local removal factors share one outer product of the option factors
+        local = sub["local_tillage"] | sub["local_input"] | sub["local_residue"]
+        swept += w[~local].sum() * np.einsum("t,i,r->tir", *defaults)
+        if local.any():
+            # The rest: sum over rows of w * T[t] * I[i] * R[r], all combinations at once
+            rows = {k: v[local] for k, v in sub.items()}
+            matrices = [
+                _removal_matrix(rows, name, options[dim], mapping)
+                for dim, (_, mapping, name) in DIMENSIONS.items()
+            ]
+            swept += np.einsum("n,nt,ni,nr->tir", w[local], *matrices, optimize=True)
+
+    totals = (fixed + swept) * E.C_TO_CO2
+    grid = np.meshgrid(*options.values(), indexing="ij")
+    table = pd.DataFrame({dim: g.ravel() for dim, g in zip(options, grid)})
+    table["Total (tCO2e)"] = totals.ravel()
+    current = current * E.C_TO_CO2
+    table["Change vs current (tCO2e)"] = table["Total (tCO2e)"] - current
+    table = table.sort_values("Total (tCO2e)", ascending=False, kind="stable").reset_index(drop=True)
+    table.insert(0, "Rank", np.arange(1, len(table) + 1))
+    return table, current
+
+
+def most_common_options(frames):
+    """Most frequent option per dimension across the tables (the tornado reference)."""
+    reference = {}
+    for dim, (col, mapping, _) in DIMENSIONS.items():
+        counts = pd.concat([df[col].astype(object) for df in frames.values() if col in df.columns] or [pd.Series(dtype=object)])
+        counts = counts[counts.isin(list(mapping))].value_counts()
+        reference[dim] = counts.index[0] if len(counts) else next(iter(mapping))
+    return reference
+
+
+def sensitivity(table, reference):
+    """Tornado data: range of the total when one dimension varies and the others stay at `reference`."""
+    rows = []
+    for dim in DIMENSIONS:
+        others = [d for d in DIMENSIONS if d != dim]
+        mask = np.logical_and.reduce([table[d] == reference[d] for d in others])
+        sub = table[mask]
+        if sub.empty:
+            continue
+        low, high = sub.loc[sub["Total (tCO2e)"].idxmin()], sub.loc[sub["Total (tCO2e)"].idxmax()]
+        rows.append({
+            "Dimension": dim, "Low option": low[dim], "Low (tCO2e)": low["Total (tCO2e)"],
+            "High option": high[dim], "High (tCO2e)": high["Total (tCO2e)"]
+        })
+    out = pd.DataFrame(rows, columns=["Dimension", "Low option", "Low (tCO2e)", "High option", "High (tCO2e)"])
+    out["Range (tCO2e)"] = out["High (tCO2e)"] - out["Low (tCO2e)"]
+    return out.sort_values("Range (tCO2e)").reset_index(drop=True)
@@ -0,0 +1,146 @@
+# agri_uncertainty.py
+# Monte Carlo uncertainty for the agriculture sections (no Streamlit import).
+#
+# Each draw scales the default factors by multipliers sampled from the
+# distributions in parameters.AGRI_UNCERTAINTY: one multiplier per crop (or
+# management option) and draw, shared by every row and section using it.
+# Rows are first summed into weighted terms per category combination, then
+# terms x draws are evaluated as array operations in chunks of bounded size.
+import numpy as np
+import pandas as pd
+import parameters
+import agri_engine
+
+E = agri_engine
+DEFAULT_DRAWS = 10_000
+DEFAULT_SEED = 42
+PERCENTILES = (2.5, 5, 50, 95, 97.5)
+CHUNK_BYTES = 32 * 1024 * 1024  # size of one terms x draws float64 block
+
+# Sampled factor -> the column whose categories it varies by
+FACTOR_COLUMNS = {
+    "agb": E.COL_CROP, "bgb": E.COL_CROP, "soil": E.COL_CROP,
+    "tillage": E.COL_TILLAGE, "input": E.COL_INPUT, "residue": E.COL_RESIDUE
+}
+
+
+def sample_multipliers(kind, spread, size, rng):
+    """Multipliers with mean 1 (normal is truncated at 0)."""
+    if kind in (None, "fixed") or not spread:
+        return np.ones(size)
+    if kind == "normal":
+        return np.maximum(rng.normal(1.0, spread, size), 0.0)
+    if kind == "lognormal":
+        sigma = np.sqrt(np.log1p(spread ** 2))
+        return rng.lognormal(-sigma ** 2 / 2, sigma, size)
+    if kind == "uniform":
+        return rng.uniform(1.0 - spread, 1.0 + spread, size)
+    if kind == "triangular":
+        return rng.triangular(max(1.0 - spread, 0.0), 1.0, 1.0 + spread, size)
+    raise ValueError(f"Unknown distribution '{kind}'")
+
+
+def _section_terms(df, crop_data, categories):
+    """Reduce a section to weighted terms over the sampled categories.
+
+    The result is area * (agb + bgb + soil * t * i * r) with one multiplier per
+    category on each factor, so rows sharing the same categories can be summed
+    first: agb and bgb become one weight per crop, and the soil product one
+    weight per (crop, tillage, input, residue) combination. Locally entered
+    values are not sampled and map to index -1 (multiplier 1).
+    """
+    f = E.row_factors(df, crop_data)
+    active = f["active"]
+    if not active.any():
+        return None
+
+    cats = {}
+    for name, col in FACTOR_COLUMNS.items():
+        series = df[col]
+        # Position of each row's category in the shared category list (-1 = none)
+        lookup = np.append(pd.Index(categories[col]).get_indexer(series.cat.categories), -1)
+        cat = lookup[series.cat.codes.to_numpy()][active]
+        cats[name] = np.where(f[f"local_{name}"][active], -1, cat)
+
+    area = f["area"][active]
+    ef = {name: f[f"ef_{name}"][active] for name in FACTOR_COLUMNS}
+    soil_product = pd.DataFrame({
+        "soil": cats["soil"], "tillage": cats["tillage"], "input": cats["input"], "residue": cats["residue"],
+        "weight": area * (ef["soil"] * ef["tillage"] * ef["input"] * ef["residue"])
+    }).groupby(["soil", "tillage", "input", "residue"], sort=False)["weight"].sum().reset_index()
+
+    terms = {
+        name: pd.Series(area * ef[name]).groupby(cats[name]).sum()
+        for name in ("agb", "bgb")
+    }
+    return {
+        "agb": (terms["agb"].index.to_numpy(), terms["agb"].to_numpy()),
+        "bgb": (terms["bgb"].index.to_numpy(), terms["bgb"].to_numpy()),
+        "product": {col: soil_product[col].to_numpy() for col in soil_product.columns}
+    }
+
+
+def _section_draws(terms, multipliers, draws, chunk_bytes):
+    """Per-draw section total (tC, before the CO2 conversion)."""
+    totals = np.zeros(draws)
+    for name in ("agb", "bgb"):
+        cat, weight = terms[name]
+        totals += weight @ multipliers[name][cat]
+
+    # Soil term: (combinations, draws) blocks of bounded size
+    product = terms["product"]
+    chunk = max(1, chunk_bytes // (8 * draws))
+    for start in range(0, len(product["weight"]), chunk):
+        sl = slice(start, start + chunk)
+        value = multipliers["soil"][product["soil"][sl]]
+        for name in ("tillage", "input", "residue"):
+            value *= multipliers[name][product[name][sl]]
+        totals += product["weight"][sl] @ value
+    return totals
+
+
+def simulate(frames, crop_data=None, draws=DEFAULT_DRAWS, seed=DEFAULT_SEED,
+             distributions=None, chunk_bytes=CHUNK_BYTES):
+    """Sample the agriculture totals.
+
+    frames: {section_key: df}. Returns {section_key: totals, "total": totals},
+    each an array of `draws` values in tCO2e. The same seed gives the same draws.
+    """
+    crop_data = parameters.AGRI_CROP_DATA if crop_data is None else crop_data
+    distributions = parameters.AGRI_UNCERTAINTY if distributions is None else distributions
+    frames = {key: E.coerce_section_frame(df, list(crop_data)) for key, df in frames.items()}
+
+    # Shared category lists, so a crop gets the same multiplier in every section
+    categories = {}
+    for col in set(FACTOR_COLUMNS.values()):
+        seen = {}
+        for df in frames.values():
+            seen.update(dict.fromkeys(df[col].cat.categories))
+        categories[col] = list(seen)
+
+    # One extra row of ones at the end for rows without a category (index -1)
+    rng = np.random.default_rng(seed)
+    multipliers = {}
+    for name, col in FACTOR_COLUMNS.items():
+        kind, spread = distributions.get(name, (None, 0.0))
+        sampled = sample_multipliers(kind, spread, (len(categories[col]), draws), rng)
+        multipliers[name] = np.vstack([sampled, np.ones((1, draws))])
+
+    samples = {}
+    for key, df in frames.items():
+        terms = _section_terms(df, crop_data, categories)
+        total_c = np.zeros(draws) if terms is None else _section_draws(terms, multipliers, draws, chunk_bytes)
+        samples[key] = total_c * E.C_TO_CO2
+    samples["total"] = np.sum([samples[key] for key in frames], axis=0) if frames else np.zeros(draws)
+    return samples
+
+
+def percentile_table(samples, percentiles=PERCENTILES, labels=None):
+    """Mean, standard deviation and percentiles per section and for the total."""
+    labels = {**E.SECTIONS, "total": "Agriculture total", **(labels or {})}
+    rows = []
+    for key, values in samples.items():
+        row = {"Section": labels.get(key, key), "Mean": values.mean(), "Std": values.std()}
+        row.update({f"P{p:g}": v for p, v in zip(percentiles, np.percentile(values, percentiles))})
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,322 @@
+# api.py
+# Local JSON calculation service (no Streamlit import)
+#
+#   python api.py --port 8502
+#
+#   GET  /health                 liveness
+#   GET  /params?country=&climate=&moisture=&soil_type=&region=   parameters.get_agri_params(...)
+#   GET  /crops                  crop defaults, management options and removal factors
+#   GET  /gwp                    default GWP values
+#   GET  /metrics                request counts, latency percentiles, throughput, batch sizes
+#   POST /score                  {"country": ..., "rows": [{column: value, ...}], "detail": false}
+#                                (optional "climate", "moisture", "soil_type", "region" as for /params)
+#
+# Rows use the agriculture column names of the app or the short import headers
+# ("crop", "area", "tillage", "input", "residue", "local agb", ...). Concurrent
+# /score requests are queued and evaluated together: the batcher thread takes
+# everything waiting (up to --max-batch rows) and scores them in one vectorized
+# agri_engine.score_records call per parameter set.
+import argparse
+import functools
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import parameters
+import agri_engine
+import agri_import
+
+E = agri_engine
+DEFAULT_PORT = 8502
+BATCH_WINDOW = 0.001  # seconds the batcher waits for more requests after the first
+MAX_BATCH_ROWS = 50_000
+MAX_ROWS_PER_REQUEST = 100_000
+SITE_FIELDS = ("country", "climate", "moisture", "soil_type", "region")  # get_agri_params arguments
+METRICS_WINDOW = 10_000  # latencies kept for the percentiles
+TEXT_COLUMNS = {E.COL_CROP, E.COL_TILLAGE, E.COL_INPUT, E.COL_RESIDUE}  # other input columns are numbers
+
+
+@functools.lru_cache(maxsize=1024)
+def _column(key):
+    # Request key -> agriculture input column (app names or import aliases)
+    return agri_import.map_headers([key]).get(0)
+
+
+def parse_rows(rows):
+    """JSON row objects -> list of {input column: value}; unknown keys are ignored.
+    Raises ValueError if an option is not a string or another column is not a number."""
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        raise ValueError("'rows' must be a list of objects")
+    if len(rows) > MAX_ROWS_PER_REQUEST:
+        raise ValueError(f"At most {MAX_ROWS_PER_REQUEST:,} rows per request")
+    parsed = [{_column(k): v for k, v in row.items() if _column(k)} for row in rows]
+    # Check types here so one bad row is a 400 for its request, not an error in a shared batch
+    for i, row in enumerate(parsed):
+        for col, value in row.items():
+            if value is None:
+                continue
+            if col in TEXT_COLUMNS:
+                ok = isinstance(value, str)
+            else:
+                ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+            if not ok:
+                kind = "a string" if col in TEXT_COLUMNS else "a number"
+                raise ValueError(f"Row {i}: '{col}' must be {kind} or null")
+    return parsed
+
+
+# --- MICRO-BATCHING ---
+class _Request:
+    __slots__ = ("site", "rows", "detail", "future")
+
+    def __init__(self, site, rows, detail):
+        self.site, self.rows, self.detail = site, rows, detail
+        self.future = Future()
+
+
+class MicroBatcher:
+    def __init__(self, window=BATCH_WINDOW, max_rows=MAX_BATCH_ROWS, metrics=None):
+        self.window = window
+        self.max_rows = max_rows
+        self.metrics = metrics
+        self._queue = queue.Queue()
+        threading.Thread(target=self._loop, name="cafi-api-batcher", daemon=True).start()
+
+    def score(self, site, rows, detail=False):
+        """site: get_agri_params arguments (country, climate, moisture, soil_type, region)."""
+        request = _Request(tuple(site), rows, detail)
+        self._queue.put(request)
+        return request.future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        n_rows = len(batch[0].rows)
+        deadline = time.perf_counter() + self.window
+        while n_rows < self.max_rows:
+            try:
+                timeout = deadline - time.perf_counter()
+                request = self._queue.get_nowait() if timeout <= 0 else self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            n_rows += len(request.rows)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._evaluate(batch)
+            except Exception as exc:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(exc)
+
+    def _evaluate(self, batch):
+        groups = {}
+        for request in batch:
+            groups.setdefault(request.site, []).append(request)
+        for site, requests in groups.items():
+            # A failing group only fails its own requests
+            try:
+                crop_data = parameters.get_agri_params(*site)["agb_bgb_soil"]
+                records = [row for request in requests for row in request.rows]
+                active, values = E.score_records(records, crop_data)
+                self._split(requests, active, values)
+            except Exception as exc:
+                for request in requests:
+                    if not request.future.done():
+                        request.future.set_exception(exc)
+        if self.metrics:
+            self.metrics.batch(len(batch), sum(len(r.rows) for r in batch))
+
+    @staticmethod
+    def _split(requests, active, values):
+        results = np.where(active, values[E.COL_RESULT], np.nan)
+        defaults = np.column_stack([values[col] for col in E.DEFAULT_FACTOR_COLUMNS]).round(6)
+        start = 0
+        for request in requests:
+            stop = start + len(request.rows)
+            part = results[start:stop]
+            response = {
+                "results": [None if v != v else float(v) for v in part],
+                "total": float(np.nansum(part))
+            }
+            if request.detail:
+                response["defaults"] = [
+                    dict(zip(E.DEFAULT_FACTOR_COLUMNS, row)) if ok else None
+                    for ok, row in zip(active[start:stop], defaults[start:stop].tolist())
+                ]
+            request.future.set_result(response)
+            start = stop
+
+
+# --- METRICS ---
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.errors = 0
+        self.rows = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self._latency = deque(maxlen=METRICS_WINDOW)
+        self._recent = deque()
+
+    def request(self, path, seconds, ok=True, rows=0):
+        now = time.time()
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            self.errors += not ok
+            self.rows += rows
+            self._latency.append(seconds)
+            self._recent.append(now)
+            while self._recent and self._recent[0] < now - 10:
+                self._recent.popleft()
+
+    def batch(self, n_requests, n_rows):
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += n_requests
+
+    def snapshot(self):
+        with self._lock:
+            latency = np.array(self._latency) * 1000
+            now = time.time()
+            recent = sum(t >= now - 10 for t in self._recent)
+            return {
+                "uptime_s": round(now - self.started, 1),
+                "requests": dict(self.requests),
+                "errors": self.errors,
+                "rows_scored": self.rows,
+                "throughput_rps_10s": round(recent / min(10.0, max(now - self.started, 1e-9)), 1),
+                "latency_ms": {
+                    f"p{q}": round(float(np.percentile(latency, q)), 3) if len(latency) else None
+                    for q in (50, 95, 99)
+                },
+                "batches": self.batches,
+                "mean_requests_per_batch": round(self.batched_requests / self.batches, 2) if self.batches else None
+            }
+
+
+# --- HTTP ---
+def crops_payload():
+    return {
+        "crops": {
+            crop: dict(zip(("agb", "bgb", "soil"), values)) for crop, values in parameters.AGRI_CROP_DATA.items()
+        },
+        "tillage": E.RF_TILLAGE,
+        "input": E.RF_INPUT,
+        "residue": E.RF_RESIDUE,
+        "columns": E.INPUT_COLUMNS
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: clients reuse one connection
+    server_version = "cafi-api"
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    batcher = None
+    metrics = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _timed(self, path, func):
+        started = time.perf_counter()
+        status, payload, rows = 500, {"error": "internal error"}, 0
+        try:
+            status, payload, rows = func()
+        except ValueError as exc:
+            status, payload = 400, {"error": str(exc)}
+        except Exception as exc:
+            status, payload = 500, {"error": f"{type(exc).__name__}: {exc}"}
+        finally:
+            self._send(status, payload)
+            self.metrics.request(path, time.perf_counter() - started, status < 400, rows)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        routes = {
+            "/health": lambda: (200, {"status": "ok"}, 0),
+            "/metrics": lambda: (200, self.metrics.snapshot(), 0),
+            "/gwp": lambda: (200, parameters.GWP_DEFAULTS, 0),
+            "/crops": lambda: (200, crops_payload(), 0),
+            "/params": lambda: (200, parameters.get_agri_params(*[(query.get(f) or [None])[0] for f in SITE_FIELDS]), 0)
+        }
+        if url.path not in routes:
+            return self._send(404, {"error": f"Unknown endpoint {url.path}"})
+        self._timed(url.path, routes[url.path])
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        # Always consume the body so the kept-alive connection stays in sync
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if url.path != "/score":
+            return self._send(404, {"error": f"Unknown endpoint {url.path}"})
+
+        def score():
+            try:
+                payload = json.loads(body or b"{}")
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"Invalid JSON: {exc}")
+            if not isinstance(payload, dict):
+                raise ValueError("Body must be a JSON object")
+            rows = parse_rows(payload.get("rows", []))
+            site = [payload.get(f) for f in SITE_FIELDS]
+            for field, value in zip(SITE_FIELDS, site):
+                if value is not None and not isinstance(value, str):
+                    raise ValueError(f"'{field}' must be a string")
+            return 200, self.batcher.score(site, rows, bool(payload.get("detail"))), len(rows)
+        self._timed(url.path, score)
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog; the default 5 resets bursts of new connections
+
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT, window=BATCH_WINDOW, max_rows=MAX_BATCH_ROWS):
+    metrics = Metrics()
+    handler = type("BoundHandler", (Handler,), {
+        "metrics": metrics, "batcher": MicroBatcher(window, max_rows, metrics)
+    })
+    return Server((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local JSON API for the agriculture calculation.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW * 1000, help="Wait for more requests after the first one (default 1 ms)")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_ROWS, help="Most rows evaluated in one batch")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.batch_window_ms / 1000, args.max_batch)
+    print(f"Listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# arr.py
+import streamlit as st
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import shared_state
+import parameters
+import arr_engine
+import profiling
+
+A = arr_engine
+
+def project_horizon():
+    # Implementation + capitalization years of the Start page, else the default horizon
+    years = (shared_state.get("gi_impl", 0) or 0) + (shared_state.get("gi_cap", 0) or 0)
+    return int(years) or A.DEFAULT_HORIZON
+
+# --- COHORT IMPORT ---
+def render_import():
+    with st.expander("Import planting cohorts (.xlsx or .csv)"):
+        st.caption(
+            "One line per cohort, e.g. a national restoration programme. Recognised columns: "
+            + ", ".join(A.INPUT_COLUMNS) + ". Systems must match the list below."
+        )
+        upload = st.file_uploader("Cohorts", type=["xlsx", "csv"], key="upload_arr")
+        append = st.checkbox("Add to the cohorts already entered", key="upload_append_arr")
+        if st.button("Import", key="upload_btn_arr", disabled=upload is None):
+            bar = st.progress(0.0, text="Reading cohorts...")
+
+            def progress(lines, fraction):
+                bar.progress(fraction or 0.0, text=f"Read {lines:,} lines...")
+
+            try:
+                with profiling.span("arr.read_cohorts") as timing:
+                    cohorts, issues, unmapped, lines = A.read_cohorts(upload, filename=upload.name, progress=progress)
+                    timing.note(lines=lines)
+            except ValueError as exc:
+                bar.empty()
+                st.error(str(exc))
+                return
+            bar.progress(1.0, text=f"Read {len(cohorts):,} cohort(s) from {lines:,} lines")
+
+            if append and "df_arr_cohorts" in st.session_state:
+                cohorts = pd.concat([A.coerce_cohort_frame(st.session_state["df_arr_cohorts"]), cohorts], ignore_index=True)
+            st.session_state["df_arr_cohorts"] = cohorts
+            st.session_state["import_report_arr"] = (issues, unmapped)
+            shared_state.rerun_fragment()
+
+        report = st.session_state.get("import_report_arr")
+        if report:
+            issues, unmapped = report
+            if unmapped:
+                st.caption("Ignored columns: " + ", ".join(str(h) for h in unmapped))
+            if len(issues):
+                st.warning(f"{issues['Row'].nunique():,} row(s) were not imported (spreadsheet row numbers below).")
+                st.dataframe(issues, hide_index=True, use_container_width=True)
+
+# --- RENDERER ---
+@shared_state.fragment
+def render_cohorts():
+    render_import()
+
+    # The stored table is only replaced when it changes: autosave compares by identity
+    if "df_arr_cohorts" not in st.session_state:
+        st.session_state["df_arr_cohorts"] = A.empty_cohort_frame()
+    typed = A.coerce_cohort_frame(st.session_state["df_arr_cohorts"])
+    if not typed.dtypes.equals(st.session_state["df_arr_cohorts"].dtypes):
+        st.session_state["df_arr_cohorts"] = typed
+
+    column_config = {
+        A.COL_LABEL: st.column_config.TextColumn(A.COL_LABEL, width="medium"),
+        A.COL_SYSTEM: st.column_config.SelectboxColumn(A.COL_SYSTEM, options=A.SYSTEMS, width="medium", required=True),
+        A.COL_PLANTING_YEAR: st.column_config.NumberColumn(A.COL_PLANTING_YEAR, step=1, format="%d", help="Project year (1 = first year; 0 or less = planted before the project). Blank = 1", width="small"),
+        A.COL_AREA: st.column_config.NumberColumn(A.COL_AREA, min_value=0.0, width="small"),
+        A.COL_AGB_MAX: st.column_config.NumberColumn(A.COL_AGB_MAX, min_value=0.0, help="Blank = system default", width="medium"),
+        A.COL_GROWTH_RATE: st.column_config.NumberColumn(A.COL_GROWTH_RATE, min_value=0.0, help="Blank = system default", width="medium"),
+        A.COL_RESULT: st.column_config.NumberColumn(A.COL_RESULT, format="%.2f", disabled=True, width="medium")
+    }
+    edited_df = st.data_editor(
+        st.session_state["df_arr_cohorts"],
+        key="editor_arr_cohorts",
+        num_rows="dynamic",
+        column_config=column_config,
+        use_container_width=True
+    )
+
+    # --- LIVE RECALCULATION ---
+    horizon = project_horizon()
+    with profiling.span("arr.calculate_cohorts", rows=len(edited_df), years=horizon):
+        calculated, total, annual = A.calculate_cohorts(edited_df, horizon, shared_state.get("c_fract"))
+    if not calculated.equals(st.session_state["df_arr_cohorts"]):
+        st.session_state["df_arr_cohorts"] = calculated
+    shared_state.set("arr_grand_total", total)
+    shared_state.set_ledger("arr_grand_total", A.cohort_ledger(calculated))
+
+    shown = edited_df.reindex(columns=A.COHORT_COLUMNS)[A.COL_RESULT].to_numpy(dtype=float, na_value=np.nan)
+    if not np.allclose(shown, calculated[A.COL_RESULT].to_numpy(dtype=float), equal_nan=True):
+        shared_state.rerun_fragment()
+
+    st.caption(f"ARR total: **{total:,.2f} tCO2e** over {horizon} years")
+    if total:
+        years = list(range(1, horizon + 1))
+        colors = dict(zip(A.ACTIVITIES, ['#2A9D8F', '#E9C46A', '#8AB17D']))
+        fig = go.Figure([
+            go.Bar(x=years, y=values, name=activity, marker_color=colors.get(activity))
+            for activity, values in annual.items() if values.any()
+        ])
+        fig.update_layout(
+            barmode="stack", height=350, margin=dict(t=30, b=40), title="Removals per year (tCO2e/year)",
+            xaxis_title="Project year", paper_bgcolor='white', plot_bgcolor='white', legend=dict(orientation="h")
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+@profiling.timed("arr.render_arr_module")
+def render_arr_module():
+    st.header("2. Afforestation & Reforestation")
+    horizon = project_horizon()
+    c_fraction = A.carbon_fraction(shared_state.get("c_fract"))
+    st.caption(
+        f"Carbon stock gain of each planting cohort over the project horizon ({horizon} years"
+        + ("" if (shared_state.get("gi_impl") or shared_state.get("gi_cap")) else ", default: enter the project duration on the Start page")
+        + f"), with carbon fraction {c_fraction} (Tier 2 value on the Start page if entered)."
+    )
+    with st.expander("Growth curves per system"):
+        st.caption("Above-ground biomass = AGB max x (1 - exp(-k x age)) ^ p; below-ground = above-ground x root-to-shoot ratio.")
+        st.dataframe(pd.DataFrame(parameters.ARR_SYSTEM_DATA), hide_index=True, use_container_width=True)
+    render_cohorts()
@@ -0,0 +1,238 @@
+# arr_engine.py
+# Afforestation & reforestation (ARR) cohort growth calculator
+# (no Streamlit import, usable headless).
+#
+# Each row is a planting cohort: an area of one system planted in one project
+# year. Above-ground biomass follows the system's growth curve
+#   AGB(age) = AGB max x (1 - exp(-k x age)) ^ p                  (t d.m./ha)
+# (parameters.ARR_SYSTEM_DATA, AGB max and k can be entered per cohort) and the
+# cohort's carbon stock is area x AGB x (1 + root-to-shoot) x carbon fraction.
+# The stocks of all cohorts at the start of the project and the end of every
+# project year are one cohorts x years array built in a single broadcast pass.
+# A cohort's removal is its stock gain over the horizon (cohorts planted in
+# year 1 or later start from bare land; year 0 or earlier means already planted).
+import numpy as np
+import pandas as pd
+import parameters
+import agri_import
+import ledger
+from agri_engine import C_TO_CO2
+
+CHUNK_ROWS = 100_000
+# Years modelled when the project duration is not entered on the Start page
+DEFAULT_HORIZON = 30
+
+# --- SYSTEMS (same order as parameters.ARR_SYSTEM_DATA) ---
+SYSTEMS = list(parameters.ARR_SYSTEM_DATA["System"])
+SYSTEM_ACTIVITY = dict(zip(SYSTEMS, parameters.ARR_SYSTEM_DATA["Activity"]))
+ACTIVITIES = list(dict.fromkeys(parameters.ARR_SYSTEM_DATA["Activity"]))
+_AGB_MAX = np.array(parameters.ARR_SYSTEM_DATA["AGB max (t d.m./ha)"], dtype=float)
+_GROWTH_RATE = np.array(parameters.ARR_SYSTEM_DATA["Growth rate k (1/year)"], dtype=float)
+_SHAPE = np.array(parameters.ARR_SYSTEM_DATA["Shape p"], dtype=float)
+_ROOT_SHOOT = np.array(parameters.ARR_SYSTEM_DATA["Root-to-shoot ratio"], dtype=float)
+_ACTIVITY_CODES = np.array([ACTIVITIES.index(a) for a in parameters.ARR_SYSTEM_DATA["Activity"]])
+
+# --- COLUMN NAMES (shared with the data editor in arr.py) ---
+COL_LABEL = "Description"
+COL_SYSTEM = "System"
+COL_PLANTING_YEAR = "Planting year"
+COL_AREA = "Area (ha)"
+COL_AGB_MAX = "AGB max local (t d.m./ha)"
+COL_GROWTH_RATE = "Growth rate local (1/year)"
+COL_RESULT = "GHG removals (tCO2e)"
+
+NUMERIC_COLUMNS = [COL_PLANTING_YEAR, COL_AREA, COL_AGB_MAX, COL_GROWTH_RATE]
+INPUT_COLUMNS = [COL_LABEL, COL_SYSTEM] + NUMERIC_COLUMNS
+COHORT_COLUMNS = INPUT_COLUMNS + [COL_RESULT]
+
+HEADER_ALIASES = {
+    "cohort": COL_LABEL,
+    "name": COL_LABEL,
+    "species": COL_SYSTEM,
+    "system": COL_SYSTEM,
+    "planting system": COL_SYSTEM,
+    "year": COL_PLANTING_YEAR,
+    "year planted": COL_PLANTING_YEAR,
+    "area": COL_AREA,
+    "area ha": COL_AREA,
+    "hectares": COL_AREA,
+    "agb max": COL_AGB_MAX,
+    "growth rate": COL_GROWTH_RATE,
+    "k": COL_GROWTH_RATE
+}
+_KNOWN_HEADERS = {agri_import.normalize_header(c): c for c in INPUT_COLUMNS}
+_KNOWN_HEADERS.update(HEADER_ALIASES)
+_SYSTEM_CODES = {agri_import.normalize_header(s): i for i, s in enumerate(SYSTEMS)}
+
+
+def map_headers(headers):
+    """Return {source position: cohort column} for recognised headers."""
+    mapping = {}
+    for pos, header in enumerate(headers):
+        col = _KNOWN_HEADERS.get(agri_import.normalize_header(header))
+        if col and col not in mapping.values():
+            mapping[pos] = col
+    return mapping
+
+
+def carbon_fraction(value=None):
+    """Tier 2 carbon fraction (the Start page c_fract input) if valid, else the default."""
+    try:
+        value = float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        value = None
+    return value if value is not None and 0 < value <= 1 else parameters.CARBON_FRACTION_DEFAULT
+
+
+# --- SCHEMA ---
+def cohort_dtypes():
+    dtypes = {col: np.dtype("float64") for col in COHORT_COLUMNS}
+    dtypes.update({COL_LABEL: np.dtype(object), COL_SYSTEM: pd.CategoricalDtype(SYSTEMS)})
+    return dtypes
+
+
+def empty_cohort_frame():
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in cohort_dtypes().items()})
+
+
+def coerce_cohort_frame(df):
+    """Return df with the cohort table columns in the typed schema (unknown systems become NaN)."""
+    out = df.reindex(columns=COHORT_COLUMNS)
+    for col, dtype in cohort_dtypes().items():
+        series = out[col]
+        if series.dtype == dtype:
+            continue
+        if isinstance(dtype, pd.CategoricalDtype):
+            # Match names loosely ("pine plantation"), once per distinct name;
+            # the trailing -1 is for blank cells (factorize code -1)
+            codes, names = pd.factorize(series.astype(object))
+            lookup = [_SYSTEM_CODES.get(agri_import.normalize_header(v), -1) for v in names] + [-1]
+            out[col] = pd.Categorical.from_codes(np.array(lookup)[codes], dtype=dtype)
+        elif dtype == object:
+            out[col] = series.astype(object)
+        else:
+            out[col] = pd.to_numeric(series, errors="coerce").astype(dtype)
+    return out
+
+
+# --- GROWTH ---
+def _numbers(df, col):
+    return df[col].to_numpy(dtype=float, na_value=np.nan) if col in df.columns else np.full(len(df), np.nan)
+
+
+def cohort_parameters(df):
+    """Per-cohort arrays: active mask, system codes, planting year, area, AGB max, k, p, root-to-shoot.
+    Blank local values take the system default; a blank planting year means year 1."""
+    system = df[COL_SYSTEM].cat.codes.to_numpy()
+    area = np.nan_to_num(_numbers(df, COL_AREA))
+    active = (system >= 0) & (area > 0)
+    system = np.maximum(system, 0)
+    planted = _numbers(df, COL_PLANTING_YEAR)
+    planted = np.where(np.isnan(planted), 1.0, np.floor(planted))
+    agb_max = _numbers(df, COL_AGB_MAX)
+    agb_max = np.where(np.isnan(agb_max), _AGB_MAX[system], agb_max)
+    rate = _numbers(df, COL_GROWTH_RATE)
+    rate = np.where(np.isnan(rate), _GROWTH_RATE[system], rate)
+    return active, system, planted, np.where(active, area, 0.0), agb_max, rate, _SHAPE[system], _ROOT_SHOOT[system]
+
+
+def carbon_stocks(df, horizon, c_fraction=None, dtype=np.float64):
+    """tC held by every cohort at the end of project years 0..horizon (year 0 = project
+    start): a (cohorts, horizon + 1) array."""
+    _, _, planted, area, agb_max, rate, shape, root_shoot = cohort_parameters(df)
+    c_fraction = carbon_fraction(c_fraction)
+    years = np.arange(0, int(horizon) + 1, dtype=dtype)
+    # Age at the end of each year (planted at the start of its planting year);
+    # worked in place: age -> exp(-k age) -> growth fraction -> tC
+    stocks = years[None, :] - (planted - 1).astype(dtype)[:, None]
+    np.maximum(stocks, 0, out=stocks)
+    stocks *= -rate.astype(dtype)[:, None]
+    np.exp(stocks, out=stocks)
+    np.subtract(1, stocks, out=stocks)
+    np.power(stocks, shape.astype(dtype)[:, None], out=stocks)
+    stocks *= (area * agb_max * (1 + root_shoot) * c_fraction).astype(dtype)[:, None]
+    return stocks
+
+
+# --- CALCULATION ---
+def calculate_cohorts(df, horizon, c_fraction=None):
+    """Fill the result column of a cohort table.
+
+    Returns (df, total tCO2e, annual) where annual is {activity: tCO2e removed in
+    each project year}.
+    """
+    out = coerce_cohort_frame(df)
+    horizon = max(int(horizon), 0)
+    annual = {activity: np.zeros(horizon) for activity in ACTIVITIES}
+    if out.empty:
+        return out, 0.0, annual
+
+    active, system = cohort_parameters(out)[:2]
+    stocks = carbon_stocks(out, horizon, c_fraction)
+    removals = (stocks[:, -1] - stocks[:, 0]) * C_TO_CO2
+    out[COL_RESULT] = np.where(active, removals, np.nan)
+
+    # Stock per activity and year (one matrix product) -> removals in each year
+    members = (_ACTIVITY_CODES[system][None, :] == np.arange(len(ACTIVITIES))[:, None]) & active
+    by_activity = members.astype(float) @ stocks
+    for i, activity in enumerate(ACTIVITIES):
+        annual[activity] = np.diff(by_activity[i]) * C_TO_CO2
+    return out, float(removals[active].sum()), annual
+
+
+def cohort_ledger(df):
+    """Per-gas ledger of a calculated cohort table (CO2 only)."""
+    return ledger.Ledger.co2(df[COL_RESULT].to_numpy(dtype=float, na_value=np.nan))
+
+
+# --- IMPORT ---
+def _validate_chunk(chunk, first_row):
+    """Return (typed valid rows, issues) for a raw chunk of cohort columns.
+
+    Systems not in parameters.ARR_SYSTEM_DATA and cells that are not numbers are
+    reported (as in agri_import) and their rows left out; lines whose cells are
+    all blank (empty or whitespace) are skipped.
+    """
+    rows = np.arange(first_row, first_row + len(chunk))
+    typed = coerce_cohort_frame(chunk)
+    bad = np.zeros(len(chunk), dtype=bool)
+    blank = {col: (chunk[col].isna() | (chunk[col].astype("string").str.strip() == "")).to_numpy() for col in chunk.columns}
+    issues = []
+    checks = [(COL_SYSTEM, "Unknown system")] + [(col, "Not a number") for col in NUMERIC_COLUMNS]
+    for col, problem in checks:
+        if col not in chunk.columns:
+            continue
+        invalid = typed[col].isna().to_numpy() & ~blank[col]
+        for r, v in zip(rows[invalid], chunk[col].to_numpy()[invalid]):
+            issues.append({"Row": int(r), "Column": col, "Value": v, "Problem": problem})
+        bad |= invalid
+    empty = np.logical_and.reduce(list(blank.values())) if blank else np.ones(len(chunk), dtype=bool)
+    return typed[~bad & ~empty], issues
+
+
+def read_cohorts(source, filename=None, sheet=None, chunk_rows=CHUNK_ROWS, progress=None):
+    """Read a .csv/.xlsx cohort list (e.g. a national restoration programme).
+
+    Returns (df, issues, unmapped_headers, rows_read) like agri_import.import_table:
+    issues has one row per rejected cell, with spreadsheet row numbers (header = row 1).
+    """
+    parts, issues, unmapped, mapping, total, done = [], [], [], {}, None, 0
+    for kind, payload, extra in agri_import.iter_chunks(source, filename, sheet, chunk_rows, csv_dtype=None):
+        if kind == "header":
+            mapping = map_headers(payload)
+            unmapped = [h for pos, h in enumerate(payload) if pos not in mapping and h not in (None, "")]
+            if not {COL_SYSTEM, COL_AREA} <= set(mapping.values()):
+                raise ValueError("The file needs at least a 'System' and an 'Area (ha)' column.")
+            total = extra
+            continue
+
+        chunk = agri_import.chunk_frame(payload, mapping)
+        valid, chunk_issues = _validate_chunk(chunk, done + 2)
+        parts.append(valid)
+        issues.extend(chunk_issues)
+        done += len(payload)
+        if progress:
+            fraction = extra if extra is not None else (min(done / total, 1.0) if total else None)
+            progress(done, fraction)
+    df = pd.concat(parts, ignore_index=True) if parts else empty_cohort_frame()
+    return df, pd.DataFrame(issues, columns=agri_import.ISSUE_COLUMNS), unmapped, done
@@ -0,0 +1,185 @@
+# batch.py
+# Headless scoring of project workbooks (no Streamlit, no shared_state)
+#
+#   python batch.py projects/ -o portfolio_results.csv --workers 8
+#
+# Each workbook holds a "General Info" sheet (two columns: field, value) and
+# one sheet per agriculture section ("3.1", "3.2", "3.3") using the same
+# column names as the data editors in agri.py.
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import parameters
+import agri_engine
+
+PROJECT_EXTENSIONS = (".xlsx", ".xlsm")
+GENERAL_INFO_SHEET = "General Info"
+SECTION_SHEETS = {"3_1": "3.1", "3_2": "3.2", "3_3": "3.3"}
+
+# Workbook labels (as shown on the Start page) -> session keys
+GI_FIELDS = {
+    "User Name": "gi_user_name",
+    "Date": "gi_date",
+    "Project Name": "gi_project_name",
+    "Funding Agency": "gi_funding_agency",
+    "Executing Agency": "gi_executing_agency",
+    "Project Cost (USD)": "gi_project_cost",
+    "Region": "gi_region",
+    "Country": "gi_country",
+    "Climate": "gi_climate",
+    "Moisture": "gi_moisture",
+    "Soil Type": "gi_soil",
+    "Implementation (yrs)": "gi_impl",
+    "Capitalization (yrs)": "gi_cap"
+}
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return value
+
+
+def read_general_info(sheet):
+    # Accept either the Start page labels or the gi_* keys in the first column
+    known = {label.lower(): key for label, key in GI_FIELDS.items()}
+    known.update({key: key for key in GI_FIELDS.values()})
+    info = {key: None for key in GI_FIELDS.values()}
+    for field, value in sheet.iloc[:, :2].itertuples(index=False, name=None):
+        key = known.get(str(field).strip().lower())
+        if key:
+            info[key] = _clean(value)
+    return info
+
+
+def _find_sheet(sheet_names, section_key):
+    for name in (SECTION_SHEETS[section_key], section_key, agri_engine.SECTIONS[section_key]):
+        if name in sheet_names:
+            return name
+    return None
+
+
+def read_project(path):
+    """Read one workbook into (general_info, {section_key: df})."""
+    with pd.ExcelFile(path, engine="openpyxl") as book:
+        if GENERAL_INFO_SHEET in book.sheet_names:
+            info = read_general_info(book.parse(GENERAL_INFO_SHEET, header=None))
+        else:
+            info = {key: None for key in GI_FIELDS.values()}
+
+        frames = {}
+        for key in SECTION_SHEETS:
+            name = _find_sheet(book.sheet_names, key)
+            df = book.parse(name) if name else pd.DataFrame(columns=agri_engine.AGRI_COLUMNS)
+            missing = [c for c in (agri_engine.COL_CROP, agri_engine.COL_AREA) if c not in df.columns]
+            if missing and not df.empty:
+                raise ValueError(f"Sheet '{name}' is missing column(s): {', '.join(missing)}")
+            frames[key] = agri_engine.coerce_section_frame(df)
+    return info, frames
+
+
+def score_project(path):
+    """Score one workbook; never raises, failures are returned as data."""
+    started = time.perf_counter()
+    try:
+        info, frames = read_project(path)
+        params = parameters.site_params(info)
+        _, totals = agri_engine.calculate_sections(frames, params["agb_bgb_soil"])
+        row = {"file": os.path.basename(path), **info}
+        for i, key in enumerate(SECTION_SHEETS, start=1):
+            row[f"rows_{key}"] = len(frames[key])
+            row[f"agri_total_{i}"] = totals[key]
+        row["agri_grand_total"] = sum(totals.values())
+        row["seconds"] = round(time.perf_counter() - started, 4)
+        return {"ok": True, "row": row}
+    except Exception as exc:
+        return {
+            "ok": False,
+            "row": {
+                "file": os.path.basename(path),
+                "error": f"{type(exc).__name__}: {exc}",
+                "traceback": traceback.format_exc()
+            }
+        }
+
+
+def find_projects(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, n) for n in names
+                    if n.lower().endswith(PROJECT_EXTENSIONS) and not n.startswith("~$")
+                )
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def run_batch(paths, workers=None, progress=None):
+    """Score all project files in parallel; returns (results_df, failures_df)."""
+    files = find_projects(paths)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files) or 1))
+    ok_rows, failed_rows = [], []
+
+    if workers == 1:
+        outcomes = map(score_project, files)
+        executor = None
+    else:
+        # Several files per task keeps the IPC overhead small on big batches
+        chunksize = max(1, len(files) // (workers * 4))
+        executor = ProcessPoolExecutor(max_workers=workers)
+        outcomes = executor.map(score_project, files, chunksize=chunksize)
+
+    try:
+        for done, outcome in enumerate(outcomes, start=1):
+            (ok_rows if outcome["ok"] else failed_rows).append(outcome["row"])
+            if progress:
+                progress(done, len(files))
+    finally:
+        if executor:
+            executor.shutdown()
+
+    results = pd.DataFrame(ok_rows)
+    failures = pd.DataFrame(failed_rows, columns=["file", "error", "traceback"])
+    return results, failures
+
+
+def write_table(df, path):
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        df.to_excel(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score project workbooks without the Streamlit app.")
+    parser.add_argument("paths", nargs="+", help="Project workbooks or directories containing them")
+    parser.add_argument("-o", "--output", default="batch_results.csv", help="Consolidated results file (.csv or .xlsx)")
+    parser.add_argument("--failures", help="Failure report (default: <output>_failures.csv)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    results, failures = run_batch(args.paths, workers=args.workers)
+    write_table(results, args.output)
+
+    failures_path = args.failures or os.path.splitext(args.output)[0] + "_failures.csv"
+    if not failures.empty:
+        failures.to_csv(failures_path, index=False)
+
+    elapsed = time.perf_counter() - started
+    print(f"Scored {len(results)} project(s), {len(failures)} failed, in {elapsed:.2f}s -> {args.output}")
+    if not failures.empty:
+        print(f"Failure report: {failures_path}")
+    return 1 if not failures.empty else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+# benchmark.py
+# Timing suite for the calculation paths and page renders
+#
+#   python benchmark.py -o bench.json                      # run and save
+#   python benchmark.py -o new.json --compare bench.json   # run and compare
+#   python benchmark.py --compare bench.json new.json      # compare two saved runs
+#
+# Agriculture tables are synthetic: rows cycle through every crop in
+# AGRI_CROP_DATA x every tillage/input/residue combination, with random areas
+# and a local override on every 10th row. Page renders go through AppTest.
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import parameters
+import agri_engine
+import results
+
+E = agri_engine
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+CALC_SIZES = [10, 1_000, 100_000, 1_000_000]
+RENDER_SIZES = [10, 1_000]
+PAGES = {"general_info": "0 Start", "agri": "3 Agriculture", "results": "Results"}
+DEFAULT_THRESHOLD = 0.20  # slowdown ratio reported as a regression
+
+
+# --- SYNTHETIC DATA ---
+def management_combos(crop_data=None):
+    """Every (crop, tillage, input, residue) combination, as four arrays."""
+    crops = list(crop_data or parameters.AGRI_CROP_DATA)
+    grid = np.array(np.meshgrid(
+        np.arange(len(crops)), np.arange(len(E.TILLAGE_OPTIONS)),
+        np.arange(len(E.INPUT_OPTIONS)), np.arange(len(E.RESIDUE_OPTIONS)), indexing="ij"
+    )).reshape(4, -1)
+    return (
+        np.array(crops, dtype=object)[grid[0]], np.array(E.TILLAGE_OPTIONS, dtype=object)[grid[1]],
+        np.array(E.INPUT_OPTIONS, dtype=object)[grid[2]], np.array(E.RESIDUE_OPTIONS, dtype=object)[grid[3]]
+    )
+
+
+def synthetic_section(n_rows, seed=0, crop_data=None):
+    """Typed section table of n_rows covering all combinations (given enough rows)."""
+    crops, tillage, inputs, residue = management_combos(crop_data)
+    rng = np.random.default_rng(seed)
+    pick = np.arange(n_rows) % len(crops)
+    df = pd.DataFrame({
+        E.COL_CROP: crops[pick],
+        E.COL_AREA: rng.uniform(0.5, 500.0, n_rows).round(2),
+        E.COL_TILLAGE: tillage[pick],
+        E.COL_INPUT: inputs[pick],
+        E.COL_RESIDUE: residue[pick]
+    })
+    df[E.COL_LOC_SOIL] = np.where(np.arange(n_rows) % 10 == 0, 30.0, np.nan)
+    return E.coerce_section_frame(df, list(crop_data or parameters.AGRI_CROP_DATA))
+
+
+# --- TIMING ---
+def measure(func, repeat=3):
+    """Run func `repeat` times; returns (stats dict, last return value)."""
+    times, value = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = func()
+        times.append(time.perf_counter() - started)
+    return {"seconds": statistics.median(times), "min": min(times), "repeat": repeat}, value
+
+
+def bench_calculation(sizes, repeat):
+    crop_data = parameters.AGRI_CROP_DATA
+    out = {}
+    for n in sizes:
+        df = synthetic_section(n)
+        stats, (calculated, total) = measure(lambda: E.calculate_section(df, crop_data), repeat)
+        out[f"agri_calculate/{n}"] = {**stats, "rows": n}
+
+        # Incremental path used by the editors: a no-op rerun and a one-row edit
+        _, total, snapshot, _ = E.update_section(calculated, None, 0.0, crop_data)
+        stats, _ = measure(lambda: E.update_section(calculated, snapshot, total, crop_data), repeat)
+        out[f"agri_update_noop/{n}"] = {**stats, "rows": n}
+
+        edited = calculated.copy()
+        edited.loc[edited.index[0], E.COL_AREA] = 999.0
+        stats, _ = measure(lambda: E.update_section(edited, snapshot, total, crop_data), repeat)
+        out[f"agri_update_one_row/{n}"] = {**stats, "rows": n}
+
+    # The Results page aggregates session totals, so its cost does not depend on rows
+    state = {f"agri_total_{i}": 1000.0 * i for i in (1, 2, 3)}
+    state.update(energy_grand_total=1.0, arr_grand_total=2.0, forest_grand_total=3.0, gi_impl=5, gi_cap=10)
+    stats, _ = measure(lambda: results.summarize(state), repeat)
+    out["results_summarize"] = stats
+    return out
+
+
+def bench_pages(sizes, repeat, pages=PAGES):
+    from streamlit.testing.v1 import AppTest
+
+    out = {}
+    for n in sizes:
+        tables = {key: synthetic_section(n, seed=i) for i, key in enumerate(E.SECTIONS)}
+        _, totals = E.calculate_sections(tables, parameters.AGRI_CROP_DATA)
+        for name, label in pages.items():
+            at = AppTest.from_file(APP_PATH, default_timeout=600)
+            at.session_state["current_page"] = label
+            for key, df in tables.items():
+                at.session_state[f"df_{key}"] = df
+            for i, key in enumerate(E.SECTIONS, start=1):
+                at.session_state[f"agri_total_{i}"] = totals[key]
+
+            started = time.perf_counter()
+            at.run()
+            first = time.perf_counter() - started
+            if at.exception:
+                raise RuntimeError(f"Page '{label}' failed: {at.exception[0].message}")
+
+            stats, _ = measure(at.run, repeat)
+            out[f"render_{name}/{n}"] = {**stats, "first": first, "rows": n}
+    return out
+
+
+# --- REPORT ---
+def environment():
+    import streamlit
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "streamlit": streamlit.__version__
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Per-benchmark table of baseline vs current median seconds."""
+    rows = []
+    for name in sorted(set(baseline["results"]) | set(current["results"])):
+        old = baseline["results"].get(name, {}).get("seconds")
+        new = current["results"].get(name, {}).get("seconds")
+        ratio = new / old if old and new is not None else None
+        if ratio is None:
+            status = "new" if old is None else "missing"
+        elif ratio > 1 + threshold:
+            status = "REGRESSION"
+        elif ratio < 1 - threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append({"benchmark": name, "baseline_s": old, "current_s": new, "ratio": ratio, "status": status})
+    return pd.DataFrame(rows, columns=["benchmark", "baseline_s", "current_s", "ratio", "status"])
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the calculation paths and page renders.")
+    parser.add_argument("current", nargs="?", help="Existing report to compare instead of running the suite")
+    parser.add_argument("-o", "--output", help="Write the report (JSON) here")
+    parser.add_argument("--compare", metavar="BASELINE", help="Baseline report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Slowdown ratio counted as a regression (default 0.2)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=CALC_SIZES, help="Row counts for the calculation benchmarks")
+    parser.add_argument("--render-sizes", type=int, nargs="*", default=RENDER_SIZES, help="Rows per section for the page renders")
+    parser.add_argument("--skip-render", action="store_true", help="Skip the AppTest page renders")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark (median is reported)")
+    args = parser.parse_args(argv)
+
+    if args.current:
+        report = load_report(args.current)
+    else:
+        # Page renders autosave like a real session; keep that out of the project database
+        os.environ.setdefault("CAFI_DB_PATH", os.path.join(tempfile.mkdtemp(), "benchmark.db"))
+        report = {"environment": environment(), "results": bench_calculation(args.sizes, args.repeat)}
+        if not args.skip_render and args.render_sizes:
+            report["results"].update(bench_pages(args.render_sizes, args.repeat))
+        for name, r in report["results"].items():
+            print(f"{name:<32} {r['seconds'] * 1000:>10.2f} ms")
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Report -> {args.output}")
+
+    if args.compare:
+        table = compare(load_report(args.compare), report, args.threshold)
+        print(table.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+        return 1 if (table["status"] == "REGRESSION").any() else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+# build_params.py
+# Compiles the agriculture parameter sources into the artifact parameters.py loads.
+#
+#   python build_params.py                      # rebuilds only if a source changed
+#   python build_params.py --force --out agri_params.json
+#
+# Sources (each optional): every sheet of parameter_with_source.xlsx and
+# DEFAULT_AGB_BGB_SOIL_BY_REGION.csv with one row per default value. Recognized
+# headers (any case): Region, Country, Climate, Moisture, Soil type, Crop (or
+# System), AGB, BGB, Soil carbon (or SOC). A missing or empty Region..Soil type
+# cell means "any". The built-in AGRI_CROP_DATA is the lowest-priority source,
+# used wherever nothing more specific exists.
+#
+# For every region x country x climate x moisture x soil type (each also "not
+# set"; a country is only paired with its own region) the builder resolves each
+# crop factor to the most specific matching row (country before region before
+# soil type, moisture and climate; the workbook before the CSV before the
+# built-in table), so the app only does dict lookups.
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import re
+
+import pandas as pd
+import parameters
+
+BUILDER_VERSION = 2
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_XLSX = os.path.join(SOURCE_DIR, "parameter_with_source.xlsx")
+DEFAULT_CSV = os.path.join(SOURCE_DIR, "DEFAULT_AGB_BGB_SOIL_BY_REGION.csv")
+DIMENSIONS = ("region", "country", "climate", "moisture", "soil_type")
+FACTORS = ("agb", "bgb", "soil")
+# Bits of the specificity score: a matching country outranks everything below it
+WEIGHTS = {"country": 16, "region": 8, "soil_type": 4, "moisture": 2, "climate": 1}
+
+
+# --- SOURCES ---
+def _field(header):
+    h = re.sub(r"[^a-z0-9]", "", str(header).lower())
+    if h in ("region", "country", "climate", "moisture"):
+        return h
+    if h.startswith("climate"):
+        return "climate"
+    if h.startswith("moisture"):
+        return "moisture"
+    if h.startswith("soiltype") or h == "soilclass":
+        return "soil_type"
+    if h in ("crop", "system") or "croppingsystem" in h or h.startswith("agroforestry"):
+        return "crop"
+    if h.startswith("agb") or "aboveground" in h:
+        return "agb"
+    if h.startswith("bgb") or "belowground" in h:
+        return "bgb"
+    if h.startswith("soil") or h.startswith("soc"):
+        return "soil"  # "Soil", "Soil carbon", "SOC (tC/ha)"
+    return None
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    text = str(value).strip()
+    return text if text and text not in ("*", "-", "Any", "any", "All", "all") else None
+
+
+def source_rows(df, rank):
+    """Rows of one source table as dicts; rank orders sources (higher wins ties)."""
+    fields = {col: _field(col) for col in df.columns}
+    if "crop" not in fields.values():
+        return []
+    df = df.rename(columns={col: f for col, f in fields.items() if f}).loc[:, lambda d: ~d.columns.duplicated()]
+    rows = []
+    for record in df.to_dict("records"):
+        crop = _clean(record.get("crop"))
+        if crop is None:
+            continue
+        row = {dim: _clean(record.get(dim)) for dim in DIMENSIONS}
+        row.update(crop=crop, rank=rank)
+        for factor in FACTORS:
+            value = pd.to_numeric(pd.Series([record.get(factor)]), errors="coerce").iloc[0]
+            row[factor] = None if pd.isna(value) else float(value)
+        if any(row[f] is not None for f in FACTORS):
+            rows.append(row)
+    return rows
+
+
+def builtin_rows():
+    return [
+        dict({dim: None for dim in DIMENSIONS}, crop=crop, rank=0, **dict(zip(FACTORS, map(float, values[:3]))))
+        for crop, values in parameters.AGRI_CROP_DATA.items()
+    ]
+
+
+def read_sources(xlsx=None, csv=None):
+    rows = builtin_rows()
+    if csv and os.path.exists(csv):
+        rows += source_rows(pd.read_csv(csv), rank=1)
+    if xlsx and os.path.exists(xlsx):
+        for df in pd.read_excel(xlsx, sheet_name=None).values():
+            rows += source_rows(df, rank=2)
+    return rows
+
+
+def source_digest(xlsx=None, csv=None):
+    """Digest of everything the artifact depends on; equal digests mean nothing to rebuild."""
+    digest = hashlib.sha256(f"builder:{BUILDER_VERSION}".encode())
+    builtin = [parameters.AGRI_CROP_DATA, parameters.REGIONS, parameters.CLIMATES, parameters.MOISTURES, parameters.SOIL_TYPES]
+    digest.update(json.dumps(builtin, sort_keys=True, default=list).encode())
+    for path in (xlsx, csv):
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                digest.update(os.path.basename(path).encode() + hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+# --- COMPILE ---
+def _extend(values, extra):
+    return list(dict.fromkeys(list(values) + [v for v in extra if v is not None]))
+
+
+def compile_params(rows):
+    """Artifact dict: site lists, deduplicated crop tables and the site -> table index."""
+    regions = {region: list(countries) for region, countries in parameters.REGIONS.items()}
+    for row in rows:
+        if row["region"] and row["country"]:
+            regions.setdefault(row["region"], [])
+            if row["country"] not in regions[row["region"]]:
+                regions[row["region"]].append(row["country"])
+    region_of = {c: r for r, countries in regions.items() for c in countries}
+    climates = _extend(parameters.CLIMATES, (r["climate"] for r in rows))
+    moistures = _extend(parameters.MOISTURES, (r["moisture"] for r in rows))
+    soil_types = _extend(parameters.SOIL_TYPES, (r["soil_type"] for r in rows))
+    crops = list(dict.fromkeys(r["crop"] for r in rows))
+
+    # Region and country pairs: neither, a region alone, or a country with its region
+    places = [(None, None)] + [(region, None) for region in regions] + [(r, c) for c, r in region_of.items()]
+    tables, table_ids, index = [], {}, {}
+    for place, climate, moisture, soil_type in itertools.product(places, [None] + climates, [None] + moistures, [None] + soil_types):
+        site = place + (climate, moisture, soil_type)
+        query = dict(zip(DIMENSIONS, site))
+        best = {}
+        for row in rows:
+            if any(row[dim] is not None and row[dim] != query[dim] for dim in DIMENSIONS):
+                continue
+            score = (sum(WEIGHTS[dim] for dim in DIMENSIONS if row[dim] is not None), row["rank"])
+            for factor in FACTORS:
+                slot = (row["crop"], factor)
+                if row[factor] is not None and (slot not in best or score >= best[slot][0]):
+                    best[slot] = (score, row[factor])
+        table = {
+            crop: [best[(crop, f)][1] if (crop, f) in best else 0.0 for f in FACTORS]
+            for crop in crops if any((crop, f) in best for f in FACTORS)
+        }
+        frozen = json.dumps(table)
+        if frozen not in table_ids:
+            table_ids[frozen] = len(tables)
+            tables.append(table)
+        index["|".join(part or "" for part in site)] = table_ids[frozen]
+
+    return {
+        "builder": BUILDER_VERSION,
+        "regions": regions, "climates": climates, "moistures": moistures, "soil_types": soil_types,
+        "tables": tables, "index": index
+    }
+
+
+def _artifact_digest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("inputs")
+    except (OSError, ValueError):
+        return None
+
+
+def build(xlsx=DEFAULT_XLSX, csv=DEFAULT_CSV, out=parameters.PARAMS_PATH, force=False):
+    """Compile the sources into out; returns False if it was already up to date."""
+    digest = source_digest(xlsx, csv)
+    if not force and _artifact_digest(out) == digest:
+        return False
+    artifact = compile_params(read_sources(xlsx, csv))
+    artifact["inputs"] = digest
+    artifact["sources"] = [os.path.basename(p) for p in (xlsx, csv) if p and os.path.exists(p)]
+    tmp = f"{out}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, separators=(",", ":"))
+    os.replace(tmp, out)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the agriculture parameter sources for the app.")
+    parser.add_argument("--xlsx", default=DEFAULT_XLSX, help="Source workbook (every sheet is read)")
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="Regional defaults CSV")
+    parser.add_argument("--out", default=parameters.PARAMS_PATH)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the sources did not change")
+    args = parser.parse_args(argv)
+
+    if build(args.xlsx, args.csv, args.out, args.force):
+        store = parameters.load_param_store(args.out)
+        print(f"Wrote {args.out}: {len(store.region_of)} countries, {len({id(t) for t in store.tables.values()})} distinct crop tables")
+    else:
+        print(f"{args.out} is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# calc_cache.py
+# Content-addressed, disk-backed cache of calculation results (no Streamlit import).
+#
+#   <dir>/<key[:2]>/<key>.npy   one float64 matrix per entry
+#
+# Keys are digests of everything a result depends on (the per-row input hashes
+# and a parameter token, see key()), so an entry never goes stale: changed
+# inputs or parameters simply produce a new key. The directory is shared by
+# every session and process using the same CAFI_CACHE_DIR. When it grows past
+# CAFI_CACHE_MB the least recently used entries (by file mtime, refreshed on
+# every hit) are deleted. CAFI_CACHE=0 turns the cache off.
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+CACHE_DIR = os.environ.get("CAFI_CACHE_DIR", "cafi_cache")
+MAX_BYTES = int(float(os.environ.get("CAFI_CACHE_MB", "256")) * 1024 * 1024)
+ENABLED = os.environ.get("CAFI_CACHE", "1").strip().lower() not in ("0", "false", "no")
+MIN_ROWS = 1_000  # smaller tables recompute faster than a disk round trip
+TOUCH_INTERVAL = 60  # seconds; hits refresh the mtime at most this often
+
+
+def token(*parts):
+    """Stable digest of JSON-serializable parts (parameter tables, versions)."""
+    text = json.dumps(parts, sort_keys=True, default=float, separators=(",", ":"))
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def key(namespace, params_token, row_hashes):
+    """Entry key for one table: namespace, parameter token and per-row input hashes (uint64)."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{namespace}:{params_token}:".encode())
+    digest.update(np.ascontiguousarray(row_hashes, dtype=np.uint64).tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = None  # bytes on disk, counted lazily
+
+    def _path(self, entry_key):
+        return os.path.join(self.directory, entry_key[:2], f"{entry_key}.npy")
+
+    def get(self, entry_key):
+        """Stored matrix or None."""
+        path = self._path(entry_key)
+        try:
+            matrix = np.load(path, allow_pickle=False)
+            if time.time() - os.path.getmtime(path) > TOUCH_INTERVAL:
+                os.utime(path)
+        except (OSError, ValueError):
+            # Missing, evicted meanwhile or truncated: recompute
+            self.misses += 1
+            return None
+        self.hits += 1
+        return matrix
+
+    def put(self, entry_key, matrix):
+        path = self._path(entry_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(matrix, dtype=np.float64), allow_pickle=False)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._size is None:
+                self._size = self.size()
+            else:
+                self._size += os.path.getsize(path)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".npy"):
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, os.path.join(root, name)
+
+    def _evict(self):
+        # Oldest first until the cache is back under 90% of its budget
+        entries = sorted(self._entries())
+        size = sum(s for _, s, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= entry_size
+        self._size = size
+
+    def size(self):
+        return sum(s for _, s, _ in self._entries())
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in list(self._entries()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "bytes": self.size(), "max_bytes": self.max_bytes}
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide result cache, or None when CAFI_CACHE=0."""
+    global _shared
+    if not ENABLED:
+        return None
+    with _shared_lock:
+        if _shared is None:
+            _shared = ResultCache()
+        return _shared
@@ -0,0 +1,13 @@
+# conftest.py
+# Shared pytest fixtures: every test gets its own result cache directory, so the
+# suite never reads or fills the app's cafi_cache/.
+import pytest
+import calc_cache
+
+
+@pytest.fixture(autouse=True)
+def result_cache(tmp_path, monkeypatch):
+    cache = calc_cache.ResultCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(calc_cache, "ENABLED", True)
+    monkeypatch.setattr(calc_cache, "_shared", cache)
+    return cache
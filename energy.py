@@ -0,0 +1,91 @@
+# energy.py
+import streamlit as st
+import numpy as np
+import shared_state
+import parameters
+import energy_engine
+import profiling
+
+E = energy_engine
+
+# --- RENDERER ---
+# Each activity table runs as a fragment; results are recomputed (vectorized) on every edit.
+@shared_state.fragment
+def render_activity(activity):
+    key_df = f"df_energy_{activity}"
+    # The stored table is only replaced when it changes: autosave compares by identity
+    if key_df not in st.session_state:
+        st.session_state[key_df] = E.empty_activity_frame(activity)
+    typed = E.coerce_activity_frame(st.session_state[key_df], activity)
+    if not typed.dtypes.equals(st.session_state[key_df].dtypes):
+        st.session_state[key_df] = typed
+
+    fuel_use_help = f"Blank = default {parameters.FUEL_QTY_DATA['Value'][0]} t/household/year"
+    column_config = {
+        E.COL_LABEL: st.column_config.TextColumn(E.COL_LABEL, width="medium"),
+        E.COL_HOUSEHOLDS: st.column_config.NumberColumn(E.COL_HOUSEHOLDS, min_value=0, step=1, format="%d", width="small"),
+        E.COL_FUEL: st.column_config.SelectboxColumn(E.COL_FUEL, options=E.FUELS, width="small", required=True),
+        E.COL_FUEL_USE: st.column_config.NumberColumn(E.COL_FUEL_USE, min_value=0.0, help=fuel_use_help, width="medium"),
+        E.COL_SAVINGS: st.column_config.NumberColumn(E.COL_SAVINGS, min_value=0.0, max_value=100.0, width="small"),
+        E.COL_NRB: st.column_config.NumberColumn(E.COL_NRB, min_value=0.0, max_value=100.0, help="Blank = 100%", width="small"),
+        E.COL_CHARCOAL: st.column_config.NumberColumn(E.COL_CHARCOAL, min_value=0.0, width="medium"),
+        E.COL_KILN_REDUCTION: st.column_config.NumberColumn(E.COL_KILN_REDUCTION, min_value=0.0, max_value=100.0, width="medium"),
+        E.COL_SUBSTITUTE: st.column_config.SelectboxColumn(E.COL_SUBSTITUTE, options=E.SUBSTITUTES, width="medium", required=True),
+        E.COL_RESULT: st.column_config.NumberColumn(E.COL_RESULT, format="%.2f", disabled=True, width="medium")
+    }
+
+    edited_df = st.data_editor(
+        st.session_state[key_df],
+        key=f"editor_energy_{activity}",
+        num_rows="dynamic",
+        column_config={col: cfg for col, cfg in column_config.items() if col in E.ACTIVITY_COLUMNS[activity]},
+        use_container_width=True
+    )
+
+    # --- LIVE RECALCULATION ---
+    with profiling.span("energy.calculate_activity", rows=len(edited_df)):
+        calculated, total, book = E.calculate_activity(
+            edited_df, activity, shared_state.get("gi_country"), shared_state.gwp()
+        )
+    if not calculated.equals(st.session_state[key_df]):
+        st.session_state[key_df] = calculated
+    shared_state.set(f"energy_total_{activity}", total)
+    shared_state.set_ledger(f"energy_total_{activity}", book)
+    shared_state.set("energy_grand_total", sum(shared_state.get(f"energy_total_{a}", 0.0) for a in E.ACTIVITIES))
+
+    shown = edited_df[E.COL_RESULT].to_numpy(dtype=float, na_value=np.nan)
+    if not np.allclose(shown, calculated[E.COL_RESULT].to_numpy(), equal_nan=True):
+        shared_state.rerun_fragment()
+
+    st.caption(f"Activity total: **{total:,.2f} tCO2e/year** · Energy total: {shared_state.get('energy_grand_total', 0.0):,.2f} tCO2e/year")
+
+@profiling.timed("energy.render_energy_module")
+def render_energy_module():
+    st.header("1. Energy")
+    grid = E.grid_intensity(shared_state.get("gi_country"))
+    st.caption(
+        f"Annual avoided emissions; gases weighted with the GWP values of the Start page ({shared_state.get('gwp_set')}). "
+        + (f"Grid electricity: {grid} kgCO2/MWh." if grid is not None else "Grid electricity: default factor (select a Congo Basin country to use its grid).")
+    )
+
+    tabs = st.tabs([f"1.{i} {label}" for i, label in enumerate(E.ACTIVITIES.values(), start=1)])
+    for tab, activity in zip(tabs, E.ACTIVITIES):
+        with tab:
+            render_activity(activity)
+
+    st.divider()
+
+    # --- CALCULATION ---
+    # Totals update live; this recomputes every table (e.g. after changing the country or GWP).
+    if st.button("Calculate Energy", type="primary"):
+        frames = {a: st.session_state[f"df_energy_{a}"] for a in E.ACTIVITIES if f"df_energy_{a}" in st.session_state}
+        frames, totals, ledgers = E.calculate_energy(frames, shared_state.get("gi_country"), shared_state.gwp())
+        for activity, df in frames.items():
+            st.session_state[f"df_energy_{activity}"] = df
+            shared_state.set(f"energy_total_{activity}", totals[activity])
+            shared_state.set_ledger(f"energy_total_{activity}", ledgers[activity])
+        grand_total = sum(totals.values())
+        shared_state.set("energy_grand_total", grand_total)
+
+        st.success(f"Calculated! Total: {grand_total:,.2f} tCO2e/year")
+        st.rerun()
@@ -0,0 +1,224 @@
+# energy_engine.py
+# Columnar energy calculator (no Streamlit import, usable headless)
+#
+# Three household-level activities, each computed as a rows x gases emission
+# matrix (grams) kept as a per-gas ledger and weighted by GWP in one matrix product:
+#   cookstoves    fuel saved by improved stoves x traditional stove EFs
+#   charcoal      charcoal production with lower-emission kilns x charcoal EFs
+#   substitution  traditional stove emissions - emissions of the substitute fuel
+import numpy as np
+import pandas as pd
+import parameters
+import ledger
+
+# --- GAS AXIS (see ledger.py) ---
+GASES, CO2 = ledger.GASES, ledger.CO2
+gwp_vector = ledger.gwp_vector
+# Column names used in parameters.py -> gas axis
+_GAS_COLUMNS = {
+    "CO2": "CO2", "CH4": "CH4", "NMVOCs": "NMVOC", "CO": "CO", "Black carbon": "BC",
+    "CO2 [kg/MWh]": "CO2", "CH4 [g/MWh]": "CH4", "N2O [g/MWh]": "N2O"
+}
+_GAS_SCALE = {"CO2 [kg/MWh]": 1000.0}  # kg -> g
+
+
+def _ef_matrix(data, label_col, labels=None):
+    """parameters table -> (labels, rows x GASES array in grams); rows with no values are skipped."""
+    table = pd.DataFrame(data)
+    gas_cols = [c for c in table.columns if c in _GAS_COLUMNS]
+    table = table.dropna(subset=gas_cols, how="all")
+    out = np.zeros((len(table), len(GASES)))
+    for col in gas_cols:
+        out[:, GASES.index(_GAS_COLUMNS[col])] = table[col].astype(float).fillna(0.0) * _GAS_SCALE.get(col, 1.0)
+    return list(labels or table[label_col]), out
+
+
+# Traditional cookstoves: "Trad. cookstoves [Wood]" -> "Wood"
+FUELS, COOKSTOVE_EF = _ef_matrix(
+    parameters.EF_COOKSTOVES_DATA, "Type",
+    [t.split("[")[-1].rstrip("]") for t in parameters.EF_COOKSTOVES_DATA["Type"]]
+)
+_, CHARCOAL_EF = _ef_matrix(parameters.EF_CHARCOAL_DATA, "Type")
+CHARCOAL_EF = CHARCOAL_EF[0]
+SUBSTITUTES, SUBSTITUTION_EF = _ef_matrix(parameters.EF_SUBSTITUTION_DATA, "Fuel")  # g/MWh
+ELECTRIC = "Electric (incl. induction)"
+
+FUEL_USE_DEFAULT = dict(zip(
+    parameters.FUEL_QTY_DATA["Fuel consumption of a stove (ton/household/year)"],
+    parameters.FUEL_QTY_DATA["Value"]
+))
+MWH_PER_KG = parameters.ENERGY_GEN_DATA["MWh/kg"][0]
+
+# Start page country -> C_INTENSITY_DATA country (grid electricity)
+GRID_COUNTRIES = {
+    "Cameroon": "Cameroon",
+    "Central African Republic": "CAR",
+    "Republic of Congo": "Congo",
+    "Democratic Republic of the Congo": "DRC",
+    "Equatorial Guinea": "Eq. Guinea",
+    "Gabon": "Gabon"
+}
+
+
+def grid_intensity(country):
+    """kgCO2/MWh of grid electricity for a Start page country, or None."""
+    table = dict(zip(parameters.C_INTENSITY_DATA["Country"], parameters.C_INTENSITY_DATA["kgCO2/MWh"]))
+    return table.get(GRID_COUNTRIES.get(country))
+
+
+# --- COLUMN NAMES (shared with the data editors in energy.py) ---
+COL_LABEL = "Description"
+COL_HOUSEHOLDS = "Households"
+COL_FUEL = "Fuel"
+COL_FUEL_USE = "Fuel use (t/household/year)"
+COL_SAVINGS = "Fuel savings (%)"
+COL_NRB = "Non-renewable biomass (%)"
+COL_CHARCOAL = "Charcoal produced (t/year)"
+COL_KILN_REDUCTION = "Emission reduction of improved kilns (%)"
+COL_SUBSTITUTE = "Substitute fuel"
+COL_RESULT = "GHG emission reduced (tCO2e/year)"
+
+ACTIVITIES = {
+    "cookstoves": "Improved cookstoves",
+    "charcoal": "Charcoal production efficiency",
+    "substitution": "Wood fuel substitution"
+}
+ACTIVITY_COLUMNS = {
+    "cookstoves": [COL_LABEL, COL_HOUSEHOLDS, COL_FUEL, COL_FUEL_USE, COL_SAVINGS, COL_NRB, COL_RESULT],
+    "charcoal": [COL_LABEL, COL_CHARCOAL, COL_KILN_REDUCTION, COL_RESULT],
+    "substitution": [COL_LABEL, COL_HOUSEHOLDS, COL_FUEL, COL_FUEL_USE, COL_SUBSTITUTE, COL_NRB, COL_RESULT]
+}
+
+
+# --- SCHEMA ---
+def activity_dtypes(activity):
+    dtypes = {col: np.dtype("float64") for col in ACTIVITY_COLUMNS[activity]}
+    dtypes[COL_LABEL] = np.dtype(object)
+    if COL_FUEL in dtypes:
+        dtypes[COL_FUEL] = pd.CategoricalDtype(FUELS)
+    if COL_SUBSTITUTE in dtypes:
+        dtypes[COL_SUBSTITUTE] = pd.CategoricalDtype(SUBSTITUTES)
+    return dtypes
+
+
+def empty_activity_frame(activity):
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in activity_dtypes(activity).items()})
+
+
+def coerce_activity_frame(df, activity):
+    """Return df with the activity's columns in the typed schema (unknown options become NaN)."""
+    out = df.reindex(columns=ACTIVITY_COLUMNS[activity])
+    for col, dtype in activity_dtypes(activity).items():
+        series = out[col]
+        if series.dtype == dtype:
+            continue
+        if isinstance(dtype, pd.CategoricalDtype):
+            values = series.astype(object)
+            out[col] = pd.Categorical(values.where(values.isin(dtype.categories)), dtype=dtype)
+        elif dtype == object:
+            out[col] = series.astype(object)
+        else:
+            out[col] = pd.to_numeric(series, errors="coerce").astype(dtype)
+    return out
+
+
+def _numbers(df, col, default=0.0):
+    return df[col].to_numpy(dtype=float, na_value=np.nan).copy() if col in df.columns else np.full(len(df), default)
+
+
+def _filled(values, default):
+    # Blank cells take the default (per row when default is an array)
+    return np.where(np.isnan(values), default, values)
+
+
+def _codes(df, col):
+    return df[col].cat.codes.to_numpy()
+
+
+# --- EMISSIONS (rows x GASES, grams) ---
+def _cookstove_emissions(df):
+    fuel = _codes(df, COL_FUEL)
+    households = _filled(_numbers(df, COL_HOUSEHOLDS), 0.0)
+    active = (fuel >= 0) & (households > 0)
+    fuel = np.maximum(fuel, 0)
+
+    use_default = np.array([FUEL_USE_DEFAULT.get(f, 0.0) for f in FUELS])[fuel]
+    fuel_use = _filled(_numbers(df, COL_FUEL_USE), use_default)
+    savings = _filled(_numbers(df, COL_SAVINGS), 0.0) / 100
+    nrb = _filled(_numbers(df, COL_NRB), 100.0) / 100
+
+    saved_kg = households * fuel_use * 1000 * savings
+    gases = saved_kg[:, None] * COOKSTOVE_EF[fuel]
+    # Only CO2 from non-renewable biomass counts; other gases count in full
+    gases[:, CO2] *= nrb
+    return active, gases
+
+
+def _charcoal_emissions(df):
+    charcoal = _filled(_numbers(df, COL_CHARCOAL), 0.0)
+    reduction = _filled(_numbers(df, COL_KILN_REDUCTION), 0.0) / 100
+    active = charcoal > 0
+    return active, (charcoal * 1000 * reduction)[:, None] * CHARCOAL_EF
+
+
+def _substitution_emissions(df, country=None):
+    fuel, substitute = _codes(df, COL_FUEL), _codes(df, COL_SUBSTITUTE)
+    households = _filled(_numbers(df, COL_HOUSEHOLDS), 0.0)
+    active = (fuel >= 0) & (substitute >= 0) & (households > 0)
+    fuel, substitute = np.maximum(fuel, 0), np.maximum(substitute, 0)
+
+    use_default = np.array([FUEL_USE_DEFAULT.get(f, 0.0) for f in FUELS])[fuel]
+    fuel_kg = households * _filled(_numbers(df, COL_FUEL_USE), use_default) * 1000
+    nrb = _filled(_numbers(df, COL_NRB), 100.0) / 100
+
+    baseline = fuel_kg[:, None] * COOKSTOVE_EF[fuel]
+    baseline[:, CO2] *= nrb
+
+    # The substitute delivers the same useful energy as the traditional stove
+    substitute_ef = SUBSTITUTION_EF.copy()
+    grid = grid_intensity(country)
+    if grid is not None:
+        substitute_ef[SUBSTITUTES.index(ELECTRIC), CO2] = grid * 1000
+    project = (fuel_kg * MWH_PER_KG)[:, None] * substitute_ef[substitute]
+    return active, baseline - project
+
+
+def activity_emissions(df, activity, country=None):
+    """(active mask, rows x GASES grams avoided per year) for one activity table."""
+    df = coerce_activity_frame(df, activity)
+    if activity == "cookstoves":
+        active, gases = _cookstove_emissions(df)
+    elif activity == "charcoal":
+        active, gases = _charcoal_emissions(df)
+    else:
+        active, gases = _substitution_emissions(df, country)
+    gases[~active] = 0.0
+    return active, gases
+
+
+# --- CALCULATION ---
+def activity_ledger(df, activity, country=None):
+    """Per-gas ledger (tonnes avoided per year, inactive rows NaN) of one activity table."""
+    active, gases = activity_emissions(df, activity, country)
+    gases[~active] = np.nan
+    return ledger.Ledger(gases / 1e6)
+
+
+def calculate_activity(df, activity, country=None, gwp=None):
+    """Fill the result column of one activity table; returns (df, total tCO2e/year, ledger)."""
+    out = coerce_activity_frame(df, activity)
+    book = activity_ledger(out, activity, country)
+    if out.empty:
+        return out, 0.0, book
+    gwp = gwp_vector() if gwp is None else gwp
+    # One matrix product over the gas axis
+    out[COL_RESULT] = book.co2e(gwp)
+    return out, book.total(gwp), book
+
+
+def calculate_energy(frames, country=None, gwp=None):
+    """Run calculate_activity over {activity: df}; returns (frames, totals, ledgers)."""
+    out_frames, totals, ledgers = {}, {}, {}
+    for activity, df in frames.items():
+        out_frames[activity], totals[activity], ledgers[activity] = calculate_activity(df, activity, country, gwp)
+    return out_frames, totals, ledgers
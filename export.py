@@ -0,0 +1,164 @@
+# export.py
+# Streaming report export to .xlsx (openpyxl write-only) or .csv. No Streamlit import.
+#
+# The workbook has a "General Info" sheet and one sheet per agriculture section
+# ("3.1", "3.2", "3.3"), the layout batch.py reads, plus a "Summary" sheet with
+# the sector breakdown and section totals. Section tables are recalculated and
+# written CHUNK_ROWS at a time, so memory depends on the chunk size, not on the
+# project size.
+import csv
+import datetime
+import io
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+import parameters
+import agri_engine
+from batch import GENERAL_INFO_SHEET, GI_FIELDS, SECTION_SHEETS
+
+E = agri_engine
+CHUNK_ROWS = 20_000
+FORMATS = {"xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "csv": "text/csv"}
+
+
+# --- CONTENT ---
+def summary_rows(summary):
+    """Sector breakdown and agriculture section totals (as on the Results page)."""
+    return [
+        ("Sector breakdown (tCO2e)", None),
+        ("Energy", summary["energy"]),
+        ("Afforestation & Reforestation", summary["arr"]),
+        ("Agriculture", summary["agri_total"]),
+        ("Forestry & Conservation", summary["forest"]),
+        ("Total", summary["grand_total"]),
+        (None, None),
+        ("Agriculture sections (tCO2e)", None),
+    ] + [(label, summary[f"agri_{i}"]) for i, label in enumerate(E.SECTIONS.values(), start=1)]
+
+
+def info_rows(info):
+    return [(label, info.get(key)) for label, key in GI_FIELDS.items()]
+
+
+def section_chunks(df, crop_data=None, chunk_rows=CHUNK_ROWS):
+    """Yield the section table with defaults and tCO2e, chunk_rows rows at a time."""
+    for start in range(0, len(df), chunk_rows):
+        chunk, _ = E.calculate_section(df.iloc[start:start + chunk_rows], crop_data)
+        yield chunk.reindex(columns=E.AGRI_COLUMNS)
+
+
+def _cell_rows(chunk):
+    # Plain Python values; missing cells become None (blank)
+    columns = [
+        np.where(pd.isna(col), None, col.astype(object)) for _, col in chunk.items()
+    ]
+    return zip(*columns)
+
+
+def _total_rows(frames):
+    return sum(len(df) for df in frames.values())
+
+
+# --- WRITERS ---
+def write_xlsx(target, info, summary, frames, crop_data=None, chunk_rows=CHUNK_ROWS, progress=None):
+    """Write the report workbook to a path or binary file. frames: {section_key: df}."""
+    book = Workbook(write_only=True)
+    sheet = book.create_sheet(GENERAL_INFO_SHEET)
+    for row in info_rows(info):
+        sheet.append(row)
+    sheet = book.create_sheet("Summary")
+    for row in summary_rows(summary):
+        sheet.append(row)
+
+    total, done = _total_rows(frames), 0
+    for key, sheet_name in SECTION_SHEETS.items():
+        sheet = book.create_sheet(sheet_name)
+        sheet.append(E.AGRI_COLUMNS)
+        df = frames.get(key)
+        if df is None:
+            continue
+        for chunk in section_chunks(df, crop_data, chunk_rows):
+            for row in _cell_rows(chunk):
+                sheet.append(row)
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+    book.save(target)
+
+
+def write_csv(target, info, summary, frames, crop_data=None, chunk_rows=CHUNK_ROWS, progress=None):
+    """Write the report as one CSV (text file): info and summary blocks, then all section rows."""
+    writer = csv.writer(target)
+    writer.writerow([GENERAL_INFO_SHEET, None])
+    writer.writerows(info_rows(info))
+    writer.writerow([])
+    writer.writerows(summary_rows(summary))
+    writer.writerow([])
+
+    total, done, header = _total_rows(frames), 0, True
+    for key, sheet_name in SECTION_SHEETS.items():
+        df = frames.get(key)
+        if df is None:
+            continue
+        for chunk in section_chunks(df, crop_data, chunk_rows):
+            chunk.insert(0, "Section", sheet_name)
+            chunk.to_csv(target, header=header, index=False, lineterminator="\n")
+            header = False
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+    if header:
+        writer.writerow(["Section"] + E.AGRI_COLUMNS)
+
+
+def export_report(fmt, info, summary, frames, crop_data=None, chunk_rows=CHUNK_ROWS, progress=None, directory=None):
+    """Write the report to a temporary file and return its path (the caller removes it)."""
+    handle, path = tempfile.mkstemp(suffix=f".{fmt}", prefix="cafi_report_", dir=directory)
+    try:
+        if fmt == "xlsx":
+            with os.fdopen(handle, "wb") as target:
+                write_xlsx(target, info, summary, frames, crop_data, chunk_rows, progress)
+        elif fmt == "csv":
+            with os.fdopen(handle, "w", newline="", encoding="utf-8") as target:
+                write_csv(target, info, summary, frames, crop_data, chunk_rows, progress)
+        else:
+            os.close(handle)
+            raise ValueError(f"Unknown export format: {fmt}")
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+class ReportFile(io.BufferedReader):
+    """Binary reader over a generated report; the temporary file is removed on close."""
+
+    def __init__(self, path):
+        super().__init__(io.FileIO(path, "rb"))
+        self.path = path
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def open_report(fmt, info, summary, frames, crop_data=None, chunk_rows=CHUNK_ROWS, progress=None, directory=None):
+    """Like export_report, but return the open file; closing it removes the file."""
+    return ReportFile(export_report(fmt, info, summary, frames, crop_data, chunk_rows, progress, directory))
+
+
+def report_filename(info, fmt):
+    name = str(info.get("gi_project_name") or "project").strip() or "project"
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+    return f"{safe}_{datetime.date.today().isoformat()}.{fmt}"
+
+
+def crop_data_for(info):
+    return parameters.site_params(info)["agb_bgb_soil"]
@@ -0,0 +1,119 @@
+# forest.py
+import streamlit as st
+import numpy as np
+import shared_state
+import parameters
+import forest_engine
+import profiling
+
+F = forest_engine
+
+# --- INVENTORY IMPORT ---
+# Inventories are only kept as their per-concession summary, never as raw lines.
+def render_import():
+    with st.expander("Import concession inventory (.xlsx or .csv)", expanded=True):
+        st.caption(
+            "One line per cutting block or per felled tree. Recognised columns: "
+            + ", ".join(F.INPUT_COLUMNS) + ". Blank cells count as 0; lines with a cell that is not a number are left out."
+        )
+        upload = st.file_uploader("Inventory", type=["xlsx", "csv"], key="upload_forest")
+        append = st.checkbox("Add to the inventory already imported", key="upload_append_forest")
+        if st.button("Import", key="upload_btn_forest", disabled=upload is None):
+            bar = st.progress(0.0, text="Reading inventory...")
+
+            def progress(lines, fraction):
+                bar.progress(fraction or 0.0, text=f"Read {lines:,} lines...")
+
+            try:
+                with profiling.span("forest.aggregate_inventory") as timing:
+                    summary, issues, unmapped, lines = F.aggregate_inventory(upload, filename=upload.name, progress=progress)
+                    timing.note(lines=lines)
+            except ValueError as exc:
+                bar.empty()
+                st.error(str(exc))
+                return
+            bar.progress(1.0, text=f"Read {lines:,} lines from {len(summary):,} concession(s)")
+
+            if append:
+                summary = F.combine_summaries([st.session_state.get("df_forest_inventory"), summary])
+            st.session_state["df_forest_inventory"] = summary
+            st.session_state["import_report_forest"] = (issues, unmapped)
+
+        report = st.session_state.get("import_report_forest")
+        if report:
+            issues, unmapped = report
+            if unmapped:
+                st.caption("Ignored columns: " + ", ".join(str(h) for h in unmapped))
+            if len(issues):
+                st.warning(f"{issues['Row'].nunique():,} line(s) were not imported (spreadsheet row numbers below).")
+                st.dataframe(issues, hide_index=True, use_container_width=True)
+        if st.session_state.get("df_forest_inventory") is not None and st.button("Clear imported inventory", key="clear_forest_inventory"):
+            st.session_state.pop("df_forest_inventory", None)
+            st.session_state.pop("import_report_forest", None)
+            shared_state.rerun_fragment()
+
+# --- RENDERER ---
+@shared_state.fragment
+def render_concessions():
+    render_import()
+
+    st.markdown("**Cutting blocks entered by hand**")
+    # The stored table is only replaced when it changes: autosave compares by identity
+    if "df_forest_blocks" not in st.session_state:
+        st.session_state["df_forest_blocks"] = F.empty_block_frame()
+    typed = F.coerce_block_frame(st.session_state["df_forest_blocks"])
+    if not typed.dtypes.equals(st.session_state["df_forest_blocks"].dtypes):
+        st.session_state["df_forest_blocks"] = typed
+
+    column_config = {
+        F.COL_CONCESSION: st.column_config.TextColumn(F.COL_CONCESSION, width="medium"),
+        F.COL_BLOCK: st.column_config.TextColumn(F.COL_BLOCK, width="small"),
+        F.COL_AREA: st.column_config.NumberColumn(F.COL_AREA, min_value=0.0, width="small"),
+        F.COL_ABANDONED: st.column_config.NumberColumn(F.COL_ABANDONED, min_value=0.0, width="medium"),
+        F.COL_LOG_LEFT: st.column_config.NumberColumn(F.COL_LOG_LEFT, min_value=0.0, max_value=100.0, width="medium"),
+        F.COL_SKID: st.column_config.NumberColumn(F.COL_SKID, min_value=0.0, width="medium"),
+        F.COL_ROAD: st.column_config.NumberColumn(F.COL_ROAD, min_value=0.0, width="medium"),
+        F.COL_RESULT: st.column_config.NumberColumn(F.COL_RESULT, format="%.2f", disabled=True, width="medium")
+    }
+    edited_df = st.data_editor(
+        st.session_state["df_forest_blocks"],
+        key="editor_forest_blocks",
+        num_rows="dynamic",
+        column_config=column_config,
+        use_container_width=True
+    )
+
+    # --- LIVE RECALCULATION ---
+    with profiling.span("forest.calculate_blocks", rows=len(edited_df)):
+        calculated, _ = F.calculate_blocks(edited_df)
+        summary = F.combine_summaries([st.session_state.get("df_forest_inventory"), F.summarize_blocks(calculated)])
+    if not calculated.equals(st.session_state["df_forest_blocks"]):
+        st.session_state["df_forest_blocks"] = calculated
+    total = float(summary[F.COL_RESULT].sum()) if len(summary) else 0.0
+    shared_state.set("forest_grand_total", total)
+    shared_state.set_ledger("forest_grand_total", F.summary_ledger(summary))
+
+    shown = edited_df.reindex(columns=F.BLOCK_COLUMNS)[F.COL_RESULT].to_numpy(dtype=float, na_value=np.nan)
+    if not np.allclose(shown, calculated[F.COL_RESULT].to_numpy(dtype=float), equal_nan=True):
+        shared_state.rerun_fragment()
+
+    # --- PER-CONCESSION SUMMARY ---
+    st.markdown("**Emission reductions per concession**")
+    if summary.empty:
+        st.info("Import an inventory or enter cutting blocks to see results.")
+    else:
+        st.dataframe(
+            summary,
+            hide_index=True,
+            use_container_width=True,
+            column_config={col: st.column_config.NumberColumn(col, format="%.2f") for col in F.SUMMARY_COLUMNS[2:]}
+        )
+    st.caption(f"Forestry total: **{total:,.2f} tCO2e**")
+
+@profiling.timed("forest.render_forest_module")
+def render_forest_module():
+    st.header("4. Forestry & Conservation")
+    st.subheader("4.1 Forest concessions transitioning to reduced impact logging (RIL-C)")
+    factors = "; ".join(f"{name}: {value}" for name, value in zip(parameters.RIL_C_DATA["Parameter"], parameters.RIL_C_DATA["Value"]))
+    st.caption(f"Emission reductions from the avoided logging damage, with the RIL-C factors {factors}.")
+    render_concessions()
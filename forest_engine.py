@@ -0,0 +1,234 @@
+# forest_engine.py
+# Reduced-impact logging (RIL-C) calculator over concession inventories
+# (no Streamlit import, usable headless).
+#
+# Each inventory line is a cutting block or a single felled tree. The avoided
+# damage it reports is converted with the RIL-C factors in parameters.RIL_C_DATA:
+#   tC = abandoned trees x F_abandoned
+#        + area x (log length left % x F_log + skid trees/ha x F_skid + road m2/ha x F_road)
+# Inventories are read in chunks and reduced to one row per concession as they
+# stream, so memory does not grow with the file.
+import numpy as np
+import pandas as pd
+import parameters
+import agri_import
+import ledger
+from agri_engine import C_TO_CO2
+
+CHUNK_ROWS = 100_000
+
+# --- RIL-C FACTORS (same order as parameters.RIL_C_DATA) ---
+F_ABANDONED, F_LOG_LEFT, F_SKID, F_ROAD = parameters.RIL_C_DATA["Value"]
+
+# --- COLUMN NAMES (shared with the data editor in forest.py) ---
+COL_CONCESSION = "Concession"
+COL_BLOCK = "Cutting block"
+COL_AREA = "Area (ha)"
+COL_ABANDONED = "Felled trees abandoned avoided (trees)"
+COL_LOG_LEFT = "Log length left avoided (%)"
+COL_SKID = "Trees killed by skidding avoided (trees/ha)"
+COL_ROAD = "Haul road & log-landing area avoided (m2/ha)"
+COL_RESULT = "GHG emission reduced (tCO2e)"
+
+NUMERIC_COLUMNS = [COL_AREA, COL_ABANDONED, COL_LOG_LEFT, COL_SKID, COL_ROAD]
+INPUT_COLUMNS = [COL_CONCESSION, COL_BLOCK] + NUMERIC_COLUMNS
+BLOCK_COLUMNS = INPUT_COLUMNS + [COL_RESULT]
+
+# Per-concession summary
+COMPONENTS = {
+    "Abandoned trees (tC)": COL_ABANDONED,
+    "Log length left (tC)": COL_LOG_LEFT,
+    "Skidding damage (tC)": COL_SKID,
+    "Haul roads & landings (tC)": COL_ROAD
+}
+SUMMARY_COLUMNS = [COL_CONCESSION, "Lines", COL_AREA] + list(COMPONENTS) + [COL_RESULT]
+UNNAMED = "(no concession)"
+
+HEADER_ALIASES = {
+    "concession": COL_CONCESSION,
+    "concession name": COL_CONCESSION,
+    "fmu": COL_CONCESSION,
+    "block": COL_BLOCK,
+    "cutting block": COL_BLOCK,
+    "area": COL_AREA,
+    "area ha": COL_AREA,
+    "hectares": COL_AREA,
+    "abandoned": COL_ABANDONED,
+    "trees abandoned": COL_ABANDONED,
+    "felled trees abandoned": COL_ABANDONED,
+    "log length left": COL_LOG_LEFT,
+    "log left": COL_LOG_LEFT,
+    "skid": COL_SKID,
+    "skidding": COL_SKID,
+    "trees killed by skidding": COL_SKID,
+    "road": COL_ROAD,
+    "haul road": COL_ROAD,
+    "haul road area": COL_ROAD
+}
+_KNOWN_HEADERS = {agri_import.normalize_header(c): c for c in INPUT_COLUMNS}
+_KNOWN_HEADERS.update(HEADER_ALIASES)
+
+
+def map_headers(headers):
+    """Return {source position: inventory column} for recognised headers."""
+    mapping = {}
+    for pos, header in enumerate(headers):
+        col = _KNOWN_HEADERS.get(agri_import.normalize_header(header))
+        if col and col not in mapping.values():
+            mapping[pos] = col
+    return mapping
+
+
+# --- SCHEMA ---
+def block_dtypes():
+    dtypes = {col: np.dtype("float64") for col in BLOCK_COLUMNS}
+    dtypes.update({COL_CONCESSION: np.dtype(object), COL_BLOCK: np.dtype(object)})
+    return dtypes
+
+
+def empty_block_frame():
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in block_dtypes().items()})
+
+
+def coerce_block_frame(df):
+    """Return df with the block table columns in the typed schema."""
+    out = df.reindex(columns=BLOCK_COLUMNS)
+    for col, dtype in block_dtypes().items():
+        if out[col].dtype == dtype:
+            continue
+        if dtype == object:
+            out[col] = out[col].astype(object)
+        else:
+            out[col] = pd.to_numeric(out[col], errors="coerce").astype(dtype)
+    return out
+
+
+def empty_summary():
+    return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+
+def coerce_summary(df):
+    """Return a per-concession summary (e.g. a saved one) with the summary columns, numbers as numbers."""
+    out = df.reindex(columns=SUMMARY_COLUMNS)
+    for col in SUMMARY_COLUMNS[1:]:
+        out[col] = pd.to_numeric(out[col], errors="coerce").fillna(0.0)
+    out["Lines"] = out["Lines"].astype("int64")
+    return out
+
+
+# --- CALCULATION ---
+def block_components(df):
+    """tC per line and component: {component name: array}. Blank cells count as 0."""
+    values = {
+        col: pd.to_numeric(df[col], errors="coerce").fillna(0.0).to_numpy(dtype=float) if col in df.columns
+        else np.zeros(len(df))
+        for col in NUMERIC_COLUMNS
+    }
+    area = values[COL_AREA]
+    return {
+        "Abandoned trees (tC)": values[COL_ABANDONED] * F_ABANDONED,
+        "Log length left (tC)": area * values[COL_LOG_LEFT] * F_LOG_LEFT,
+        "Skidding damage (tC)": area * values[COL_SKID] * F_SKID,
+        "Haul roads & landings (tC)": area * values[COL_ROAD] * F_ROAD
+    }
+
+
+def calculate_blocks(df):
+    """Fill the result column of a block table; returns (df, total tCO2e)."""
+    out = coerce_block_frame(df)
+    if out.empty:
+        return out, 0.0
+    total_c = np.sum(list(block_components(out).values()), axis=0)
+    out[COL_RESULT] = total_c * C_TO_CO2
+    return out, float(out[COL_RESULT].sum())
+
+
+def _concession_labels(df):
+    if COL_CONCESSION not in df.columns:
+        return pd.Series(UNNAMED, index=df.index)
+    labels = df[COL_CONCESSION].astype("string").str.strip()
+    return labels.mask(labels.isna() | (labels == ""), UNNAMED).astype(object)
+
+
+def summarize_blocks(df):
+    """One row per concession: lines, area, tC per component and tCO2e."""
+    if df.empty:
+        return empty_summary()
+    parts = pd.DataFrame(block_components(df), index=df.index)
+    parts[COL_AREA] = pd.to_numeric(df[COL_AREA], errors="coerce").fillna(0.0) if COL_AREA in df.columns else 0.0
+    parts["Lines"] = 1
+    parts[COL_CONCESSION] = _concession_labels(df)
+    summary = parts.groupby(COL_CONCESSION, sort=False).sum()
+    summary[COL_RESULT] = summary[list(COMPONENTS)].sum(axis=1) * C_TO_CO2
+    return summary.reset_index()[SUMMARY_COLUMNS]
+
+
+def combine_summaries(summaries):
+    """Add up per-concession summaries (e.g. chunks, or imported + entered blocks)."""
+    summaries = [s for s in summaries if s is not None and len(s)]
+    if not summaries:
+        return empty_summary()
+    combined = pd.concat(summaries).groupby(COL_CONCESSION, sort=False).sum(numeric_only=True)
+    combined[COL_RESULT] = combined[list(COMPONENTS)].sum(axis=1) * C_TO_CO2
+    return combined.reset_index()[SUMMARY_COLUMNS]
+
+
+def summary_ledger(summary):
+    """Per-gas ledger of a per-concession summary (CO2 only, one row per concession)."""
+    return ledger.Ledger.co2(summary[COL_RESULT].to_numpy(dtype=float))
+
+
+# --- STREAMING INVENTORIES ---
+def _validate_chunk(chunk, first_row):
+    """Return (lines to summarize, issues) for a raw chunk of inventory columns.
+
+    Cells that are not numbers are reported (as in agri_import) and their lines
+    left out; lines whose cells are all blank are skipped.
+    """
+    rows = np.arange(first_row, first_row + len(chunk))
+    out = chunk.copy()
+    bad = np.zeros(len(chunk), dtype=bool)
+    empty = np.ones(len(chunk), dtype=bool)
+    issues = []
+    for col in chunk.columns:
+        raw = chunk[col]
+        blank = (raw.isna() | (raw.astype("string").str.strip() == "")).to_numpy()
+        empty &= blank
+        if col not in NUMERIC_COLUMNS:
+            continue
+        values = pd.to_numeric(raw, errors="coerce")
+        invalid = values.isna().to_numpy() & ~blank
+        for r, v in zip(rows[invalid], raw.to_numpy()[invalid]):
+            issues.append({"Row": int(r), "Column": col, "Value": v, "Problem": "Not a number"})
+        bad |= invalid
+        out[col] = values.astype(float)
+    return out[~bad & ~empty], issues
+
+
+def aggregate_inventory(source, filename=None, sheet=None, chunk_rows=CHUNK_ROWS, progress=None):
+    """Stream a .csv/.xlsx inventory into a per-concession summary.
+
+    Returns (summary, issues, unmapped_headers, lines_used) like
+    arr_engine.read_cohorts: issues has one row per rejected cell, with
+    spreadsheet row numbers (header = row 1). Only the running summary (one row
+    per concession) and one chunk are held in memory at a time.
+    """
+    summary, issues, unmapped, mapping, total, read, done = empty_summary(), [], [], {}, None, 0, 0
+    for kind, payload, extra in agri_import.iter_chunks(source, filename, sheet, chunk_rows, csv_dtype=None):
+        if kind == "header":
+            mapping = map_headers(payload)
+            unmapped = [h for pos, h in enumerate(payload) if pos not in mapping and h not in (None, "")]
+            if not set(NUMERIC_COLUMNS[1:]) & set(mapping.values()):
+                raise ValueError("No RIL-C columns found (e.g. 'Felled trees abandoned', 'Log length left', 'Skidding', 'Haul road').")
+            total = extra
+            continue
+
+        chunk, chunk_issues = _validate_chunk(agri_import.chunk_frame(payload, mapping), read + 2)
+        summary = combine_summaries([summary, summarize_blocks(chunk)])
+        issues.extend(chunk_issues)
+        read += len(payload)
+        done += len(chunk)
+        if progress:
+            fraction = extra if extra is not None else (min(read / total, 1.0) if total else None)
+            progress(done, fraction)
+    return summary, pd.DataFrame(issues, columns=agri_import.ISSUE_COLUMNS), unmapped, done
@@ -2,123 +2,98 @@
 import streamlit as st
 import pandas as pd
 import shared_state
-from datetime import date
 import parameters
+import profiling
 
-# Try to import synced lists
-try:
-    import imported_data
-    SOIL_TYPE = imported_data.SOIL_TYPES
-    CLIMATE = imported_data.CLIMATES
-    MOISTURE = imported_data.MOISTURES
-except ImportError:
-    # Manual Defaults
-    SOIL_TYPE = [
-        "Clay soils", 
-        "Sandy soils", 
-        "Spodic soils", 
-        "Volcanic soils", 
-        "Wetland soils", 
-        "Organic soils"
-    ]
-    CLIMATE = ["Tropical lowland", "Tropical montane"]
-    MOISTURE = ["Moist", "Wet", "Dry"]
+# Read-only reference tables are built once per process and shared by all sessions
+@st.cache_resource
+def param_table(data_name):
+    return pd.DataFrame(getattr(parameters, data_name))
 
-def render_general_info():
-    st.markdown("""
-        <div style='background-color: white; padding: 15px; border-radius: 5px; border: 1px solid #ddd; margin-bottom: 20px;'>
-            <h2 style='color: #2E86C1; margin:0; text-align: center;'>CAFI Mitigation Tool</h2>
-        </div>
-    """, unsafe_allow_html=True)
-
-    # 1. DESCRIPTION
-    st.markdown("### 1. Description")
+def make_param_box(title, data_name=None, custom_component=None):
     with st.container(border=True):
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown("#### **Project Details**")
-            st.text_input("User Name", key="gi_user_name")
-            st.date_input("Date", key="gi_date", value=date.today())
-            st.text_input("Project Name", key="gi_project_name")
-            st.text_input("Funding Agency", key="gi_funding_agency")
-            st.text_input("Executing Agency", key="gi_executing_agency")
-            
-            # FIXED: Removed 'value=0' because it is already initialized in shared_state
-            st.number_input("Project Cost (USD)", key="gi_project_cost", step=1000)
+        st.markdown(f"**{title}**")
+        if custom_component:
+            custom_component()
+        elif data_name:
+            st.dataframe(param_table(data_name), hide_index=True, use_container_width=True)
 
-        with col2:
-            st.markdown("#### **Project Site & Environment**")
-            
-            # --- REGION & COUNTRY LOGIC ---
-            region_list = ["Central Africa", "Southeast Asia", "South America"]
-            
-            # Get current state
-            current_reg = shared_state.get("gi_region")
-            
-            # Determine index for selectbox (None if not set)
-            reg_index = region_list.index(current_reg) if current_reg in region_list else None
-            
-            region = st.selectbox(
-                "Region", 
-                region_list, 
-                index=reg_index, 
-                key="region_selector", 
-                placeholder="Select region..."
-            )
-            
-            # Update state if changed
-            if region != shared_state.get("gi_region"): 
-                shared_state.set("gi_region", region)
-                # Reset country if region changes
-                shared_state.set("gi_country", None)
-                st.rerun()
-            
-            # Define Country List based on Region
-            if region == "Central Africa":
-                country_list = [
-                    "Cameroon", 
-                    "Central African Republic", 
-                    "Democratic Republic of the Congo", 
-                    "Equatorial Guinea", 
-                    "Gabon", 
-                    "Republic of Congo"
-                ]
-            elif region == "Southeast Asia":
-                country_list = ["Indonesia"]
-            elif region == "South America":
-                country_list = ["Brazil"]
-            else:
-                country_list = []
-
-            current_country = shared_state.get("gi_country")
-            cnt_index = country_list.index(current_country) if current_country in country_list else None
-
-            country = st.selectbox(
-                "Country", 
-                country_list, 
-                index=cnt_index, 
-                key="country_selector",
-                placeholder="Select country..."
-            )
-            shared_state.set("gi_country", country)
-            
-            st.divider()
-            
-            # Environment Dropdowns (Start Empty)
-            e1, e2, e3 = st.columns(3)
-            e1.selectbox("Climate", CLIMATE, key="gi_climate", index=None, placeholder="Select...")
-            e2.selectbox("Moisture", MOISTURE, key="gi_moisture", index=None, placeholder="Select...")
-            e3.selectbox("Soil Type", SOIL_TYPE, key="gi_soil", index=None, placeholder="Select...")
-            st.divider()
-            
-            # Years (Start at 0)
-            d1, d2 = st.columns(2)
-            # FIXED: Removed 'value=0' here as well
-            d1.number_input("Implementation (yrs)", key="gi_impl", step=1)
-            d2.number_input("Capitalization (yrs)", key="gi_cap", step=1)
+# --- FRAGMENTS ---
+# Each block reruns on its own when one of its inputs changes.
+@shared_state.fragment
+def render_project_details():
+    st.markdown("#### **Project Details**")
+    st.text_input("User Name", key="gi_user_name")
+    st.date_input("Date", key="gi_date")
+    st.text_input("Project Name", key="gi_project_name")
+    st.text_input("Funding Agency", key="gi_funding_agency")
+    st.text_input("Executing Agency", key="gi_executing_agency")
+    
+    # FIXED: Removed 'value=0' because it is already initialized in shared_state
+    st.number_input("Project Cost (USD)", key="gi_project_cost", step=1000)
 
-    # 2. ACTIVITIES REPORTED
-    st.markdown("### 2. Activities Reported")
+@shared_state.fragment
+def render_project_site():
+    st.markdown("#### **Project Site & Environment**")
+    
+    # --- REGION & COUNTRY LOGIC ---
+    # Site lists come from the compiled parameter store (see build_params.py)
+    store = parameters.param_store()
+    region_list = list(store.regions)
+    
+    # Get current state
+    current_reg = shared_state.get("gi_region")
+    
+    # Determine index for selectbox (None if not set)
+    reg_index = region_list.index(current_reg) if current_reg in region_list else None
+    
+    region = st.selectbox(
+        "Region", 
+        region_list, 
+        index=reg_index, 
+        key="region_selector", 
+        placeholder="Select region..."
+    )
+    
+    # Update state if changed
+    if region != shared_state.get("gi_region"): 
+        shared_state.set("gi_region", region)
+        # Reset country if region changes
+        shared_state.set("gi_country", None)
+        st.rerun()
+    
+    # Define Country List based on Region
+    country_list = store.regions.get(region, [])
+
+    current_country = shared_state.get("gi_country")
+    cnt_index = country_list.index(current_country) if current_country in country_list else None
+
+    country = st.selectbox(
+        "Country", 
+        country_list, 
+        index=cnt_index, 
+        key="country_selector",
+        placeholder="Select country..."
+    )
+    shared_state.set("gi_country", country)
+    
+    st.divider()
+    
+    # Environment Dropdowns (Start Empty)
+    e1, e2, e3 = st.columns(3)
+    e1.selectbox("Climate", store.climates, key="gi_climate", index=None, placeholder="Select...")
+    e2.selectbox("Moisture", store.moistures, key="gi_moisture", index=None, placeholder="Select...")
+    e3.selectbox("Soil Type", store.soil_types, key="gi_soil", index=None, placeholder="Select...")
+    st.divider()
+    
+    # Years (Start at 0)
+    d1, d2 = st.columns(2)
+    # FIXED: Removed 'value=0' here as well
+    d1.number_input("Implementation (yrs)", key="gi_impl", step=1)
+    d2.number_input("Capitalization (yrs)", key="gi_cap", step=1)
+
+@shared_state.fragment
+def render_activities():
     with st.container(border=True):
         col_act_1, col_act_2 = st.columns(2)
         with col_act_1:
@@ -143,29 +118,23 @@ def render_general_info():
             st.checkbox("Transformation factories or equipment for sustainably sourced", value=False, key="act_forest_2")
             st.checkbox("Forest conservation", value=False, key="act_forest_3")
 
-    # 3. PARAMETERS (Read-only reference data)
-    st.markdown("### 3. Parameters")
-    
-    def make_param_box(title, data_dict=None, custom_component=None):
-        with st.container(border=True):
-            st.markdown(f"**{title}**")
-            if custom_component:
-                custom_component()
-            elif data_dict:
-                st.dataframe(pd.DataFrame(data_dict), hide_index=True, use_container_width=True)
-
+@shared_state.fragment
+def render_tier2_parameters():
     r1c1, r1c2, r1c3 = st.columns(3)
-    
+
     with r1c1:
         with st.container(border=True):
             st.markdown("**Global warming potential**")
+            # Results are re-weighted when the set changes (see ledger.py)
+            st.selectbox("GWP values", list(parameters.GWP_SETS), key="gwp_set", label_visibility="collapsed")
+            gwp_set = parameters.GWP_SETS.get(st.session_state["gwp_set"], {})
             h1, h2, h3 = st.columns([1.5, 1, 1])
             h2.caption("Tier 1 (Def)")
             h3.caption("Tier 2 (Any)")
             for gas, val in parameters.GWP_DEFAULTS.items():
                 c1, c2, c3 = st.columns([1.5, 1, 1])
                 c1.write(gas)
-                c2.write(val)
+                c2.write(gwp_set.get(gas, val))
                 c3.text_input(f"t2_{gas}", label_visibility="collapsed", key=f"gwp_{gas}")
 
     with r1c2:
@@ -190,19 +159,47 @@ def render_general_info():
             c2.write(parameters.CARBON_FRACTION_DEFAULT)
             c3.text_input("t2_cf", label_visibility="collapsed", key="c_fract")
 
+@shared_state.fragment
+def render_reference_parameters():
     r2c1, r2c2, r2c3 = st.columns([2, 1.5, 1])
     with r2c1:
-        make_param_box("Emission factor traditional cookstoves (g/kg) [default]", parameters.EF_COOKSTOVES_DATA)
+        make_param_box("Emission factor traditional cookstoves (g/kg) [default]", "EF_COOKSTOVES_DATA")
     with r2c2:
-        make_param_box("Quantity of fuel used", parameters.FUEL_QTY_DATA)
+        make_param_box("Quantity of fuel used", "FUEL_QTY_DATA")
     with r2c3:
-        make_param_box("Energy generated", parameters.ENERGY_GEN_DATA)
+        make_param_box("Energy generated", "ENERGY_GEN_DATA")
 
-    make_param_box("Emission factor charcoal production (g/kg) [default]", parameters.EF_CHARCOAL_DATA)
+    make_param_box("Emission factor charcoal production (g/kg) [default]", "EF_CHARCOAL_DATA")
 
     r4c1, r4c2 = st.columns([1.5, 1])
     with r4c1:
-        make_param_box("Emission factor of substitution fuel [default]", parameters.EF_SUBSTITUTION_DATA)
+        make_param_box("Emission factor of substitution fuel [default]", "EF_SUBSTITUTION_DATA")
     with r4c2:
-        make_param_box("Carbon intensity of electricity in the Congo Basin [default]", parameters.C_INTENSITY_DATA)
-        make_param_box("Emission factor RIL-C", parameters.RIL_C_DATA)
\ No newline at end of file
+        make_param_box("Carbon intensity of electricity in the Congo Basin [default]", "C_INTENSITY_DATA")
+        make_param_box("Emission factor RIL-C", "RIL_C_DATA")
+
+@profiling.timed("general_info.render_general_info")
+def render_general_info():
+    st.markdown("""
+        <div style='background-color: white; padding: 15px; border-radius: 5px; border: 1px solid #ddd; margin-bottom: 20px;'>
+            <h2 style='color: #2E86C1; margin:0; text-align: center;'>CAFI Mitigation Tool</h2>
+        </div>
+    """, unsafe_allow_html=True)
+
+    # 1. DESCRIPTION
+    st.markdown("### 1. Description")
+    with st.container(border=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            render_project_details()
+        with col2:
+            render_project_site()
+
+    # 2. ACTIVITIES REPORTED
+    st.markdown("### 2. Activities Reported")
+    render_activities()
+
+    # 3. PARAMETERS (Read-only reference data)
+    st.markdown("### 3. Parameters")
+    render_tier2_parameters()
+    render_reference_parameters()
@@ -0,0 +1,134 @@
+# jobs.py
+# Shared background worker pool for long calculations (no Streamlit import).
+#
+# Jobs run on a bounded thread pool shared by all sessions, separate from the
+# script runs. A job reports progress through Job.report(), which is also where
+# a cancel request takes effect. MAX_WORKERS caps how many jobs run at once on
+# the server, MAX_QUEUED how many may wait, and MAX_PER_OWNER how many one
+# session may have queued or running, so one heavy user cannot take the pool.
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = int(os.environ.get("CAFI_JOB_WORKERS", "2"))
+MAX_QUEUED = int(os.environ.get("CAFI_JOB_QUEUE", "16"))
+MAX_PER_OWNER = 1
+KEEP_FINISHED = 300  # seconds a finished job stays retrievable
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobLimitError(RuntimeError):
+    pass
+
+
+class Job:
+    def __init__(self, owner, kind):
+        self.id = uuid.uuid4().hex[:12]
+        self.owner = owner
+        self.kind = kind
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Waiting for a free worker..."
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.finished = None
+        self._cancel = threading.Event()
+
+    def report(self, fraction=None, message=None):
+        """Called by the job function; raises JobCancelled once a cancel was requested."""
+        if fraction is not None:
+            self.progress = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        self._cancel.set()
+        if self.status == QUEUED:
+            self.message = "Cancelling..."
+
+    @property
+    def active(self):
+        return self.status in ACTIVE
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+
+class JobPool:
+    def __init__(self, max_workers=MAX_WORKERS, max_queued=MAX_QUEUED, max_per_owner=MAX_PER_OWNER):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_per_owner = max_per_owner
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cafi-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner, kind, func, *args, **kwargs):
+        """Queue func(job, *args, **kwargs); its return value becomes job.result."""
+        with self._lock:
+            self._forget_finished()
+            active = [j for j in self._jobs.values() if j.active]
+            if sum(j.owner == owner for j in active) >= self.max_per_owner:
+                raise JobLimitError("A calculation of yours is already running; wait for it or cancel it.")
+            if len(active) >= self.max_workers + self.max_queued:
+                raise JobLimitError("The server is busy; try again in a moment.")
+            job = Job(owner, kind)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        try:
+            job.report(message="Running...")
+            job.status = RUNNING
+            job.result = func(job, *args, **kwargs)
+            job.progress, job.message, job.status = 1.0, "Done", DONE
+        except JobCancelled:
+            job.message, job.status = "Cancelled", CANCELLED
+        except Exception as exc:
+            job.error = f"{type(exc).__name__}: {exc}"
+            job.message, job.status = "Failed", FAILED
+        finally:
+            job.finished = time.time()
+
+    def _forget_finished(self):
+        cutoff = time.time() - KEEP_FINISHED
+        for job_id in [i for i, j in self._jobs.items() if j.finished and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self, owner=None):
+        with self._lock:
+            return [j for j in self._jobs.values() if owner is None or j.owner == owner]
+
+    def stats(self):
+        with self._lock:
+            statuses = [j.status for j in self._jobs.values()]
+        return {status: statuses.count(status) for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide job pool (shared by all sessions)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = JobPool()
+        return _shared
@@ -0,0 +1,121 @@
+# ledger.py
+# Per-gas emission ledger (no Streamlit import, usable headless)
+#
+# Every sector calculation records what each row avoids or removes per gas, in
+# tonnes (a rows x gases array holding only the gases the sector involves:
+# agriculture and forestry are CO2 only, energy has all of GASES). CO2e is one
+# matrix-vector product with the active GWP vector, so switching GWP sets
+# re-weights totals without recalculating any sector.
+#
+# Session state, per total key of shared_state.RESULT_KEYS (e.g. "agri_total_1"):
+#   ledger_<total key>        the Ledger (session only)
+#   gas_<total key>_<gas>     tonnes per gas, saved with the project so that
+#                             reopened projects can be re-weighted as well
+import numpy as np
+import parameters
+
+# --- GAS AXIS ---
+GASES = ["CO2", "CH4", "NMVOC", "CO", "N2O", "BC"]
+CO2 = GASES.index("CO2")
+GAS_INDEX = {gas: i for i, gas in enumerate(GASES)}
+
+# Activity totals and the grand totals they add up to
+ACTIVITY_TOTALS = {
+    "energy_grand_total": ("energy_total_cookstoves", "energy_total_charcoal", "energy_total_substitution"),
+    "agri_grand_total": ("agri_total_1", "agri_total_2", "agri_total_3"),
+    "arr_grand_total": ("arr_grand_total",),
+    "forest_grand_total": ("forest_grand_total",)
+}
+
+
+def gwp_vector(overrides=None, gwp_set=None):
+    """GWP per gas: Tier 2 values where entered (and valid), else the selected set
+    (parameters.GWP_SETS), else the defaults. Black carbon has no GWP in the tool
+    and is reported but not weighted."""
+    base = dict(parameters.GWP_DEFAULTS, **parameters.GWP_SETS.get(gwp_set, {}))
+    out = np.zeros(len(GASES))
+    for i, gas in enumerate(GASES):
+        value = (overrides or {}).get(gas)
+        try:
+            value = float(value) if value not in (None, "") else None
+        except (TypeError, ValueError):
+            value = None
+        out[i] = value if value is not None else base.get(gas, 0.0)
+    return out
+
+
+def state_gwp(state):
+    """GWP vector of a session-state mapping (gwp_set and the gwp_<gas> Tier 2 inputs)."""
+    return gwp_vector({gas: state.get(f"gwp_{gas}") for gas in GASES}, state.get("gwp_set"))
+
+
+# --- LEDGER ---
+class Ledger:
+    """Tonnes per row for some of GASES; rows that are all NaN are inactive."""
+
+    def __init__(self, values, gases=GASES):
+        self.gases = tuple(gases)
+        values = np.asarray(values, dtype=float)
+        self.values = values.reshape(len(values), len(self.gases))
+        # Kept per gas so re-weighting a total is a dot product of a few numbers
+        self.totals = np.nansum(self.values, axis=0)
+
+    @classmethod
+    def co2(cls, tco2):
+        """Ledger of a CO2-only result column (tCO2 per row, NaN = inactive); no copy is made."""
+        return cls(np.asarray(tco2, dtype=float), ("CO2",))
+
+    def __len__(self):
+        return len(self.values)
+
+    def weights(self, gwp):
+        return np.asarray(gwp)[[GAS_INDEX[gas] for gas in self.gases]]
+
+    def co2e(self, gwp):
+        """tCO2e per row (NaN for inactive rows)."""
+        return self.values @ self.weights(gwp)
+
+    def total(self, gwp):
+        return float(self.totals @ self.weights(gwp))
+
+    def gas_totals(self):
+        return dict(zip(self.gases, self.totals.tolist()))
+
+
+# --- SESSION STATE ---
+def key(total_key):
+    return f"ledger_{total_key}"
+
+
+def gas_key(total_key, gas):
+    return f"gas_{total_key}_{gas}"
+
+
+def gas_fields(total_key, book):
+    """Saved fields {gas_<total key>_<gas>: tonnes} of one ledger."""
+    return {gas_key(total_key, gas): value for gas, value in book.gas_totals().items()}
+
+
+def gas_totals(state, total_key):
+    """{gas: tonnes} recorded for one total key, or {} if it has no ledger (e.g. older projects)."""
+    book = state.get(key(total_key))
+    if book is not None:
+        return book.gas_totals()
+    return {gas: state[gas_key(total_key, gas)] for gas in GASES if state.get(gas_key(total_key, gas)) is not None}
+
+
+def weighted_totals(state, gwp=None):
+    """{total key: tCO2e} re-weighted with gwp (default: the state's GWP) for every
+    activity and grand total with a ledger; totals without one are left out."""
+    gwp = state_gwp(state) if gwp is None else gwp
+    out = {}
+    for grand_key, total_keys in ACTIVITY_TOTALS.items():
+        weighted = False
+        for total_key in total_keys:
+            gases = gas_totals(state, total_key)
+            if gases:
+                out[total_key] = float(sum(tonnes * gwp[GAS_INDEX[gas]] for gas, tonnes in gases.items()))
+                weighted = True
+        if weighted:
+            out[grand_key] = sum(out.get(k, state.get(k, 0.0) or 0.0) for k in total_keys)
+    return out
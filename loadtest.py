@@ -0,0 +1,335 @@
+# loadtest.py
+# Multi-session load and soak test of the app, in one local process (no network)
+#
+#   python loadtest.py --sessions 8 --rounds 5 -o load.json             # load test
+#   python loadtest.py --sessions 8 --duration 600 -o soak.json         # soak: repeat rounds for 10 min
+#   python loadtest.py --sessions 8 -o new.json --compare load.json     # run and compare
+#   python loadtest.py --compare load.json new.json                     # compare two saved runs
+#
+# Every simulated session is an AppTest of app.py: its own session state, but
+# the process, caches, job pool and project database are shared, as with one
+# Streamlit server. All sessions run the same round concurrently (one thread
+# each). AppTest installs a process-wide runtime for each script run, so the
+# reruns themselves take turns (as on a server whose script threads contend for
+# the GIL); calculations, autosaves and everything between reruns overlap.
+# Each round goes through the real pages:
+#
+#   general_info     Start page; the first round also picks region and country
+#   agri_edit        Agriculture page, then edit_rows changed areas and one new
+#                    row per section (each edit is one rerun)
+#   agri_calculate   click Calculate Agriculture and rerun until the job is applied
+#   results          Results page
+#
+# Each rerun is timed under its step, excluding the wait for its turn (reported
+# separately as rerun_wait). After every round the process RSS is
+# sampled and the session-state size of every session is measured; with
+# --tracemalloc, Python allocations are traced as well (slower).
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import parameters
+import agri_engine
+import benchmark
+
+E = agri_engine
+APP_PATH = benchmark.APP_PATH
+STEPS = ("general_info", "agri_edit", "agri_calculate", "results")
+PAGE_LABELS = {"general_info": "0 Start", "agri": "3 Agriculture", "results": "Results"}
+DEFAULT_SESSIONS = 4
+DEFAULT_ROUNDS = 3
+DEFAULT_ROWS = 5_000
+DEFAULT_EDIT_ROWS = 10
+POLL_INTERVAL = 0.05
+# AppTest.run is not thread-safe (see the module header)
+_script_lock = threading.Lock()
+JOB_TIMEOUT = 600
+# Report keys compared between releases besides the per-step latencies (growth can
+# be zero or negative, so the RSS per session at the end stands in for it)
+MEMORY_METRICS = ("rss_per_session_mb", "rss_end_per_session_mb", "state_mb_per_session")
+
+
+# --- MEMORY ---
+def rss_bytes():
+    """Current resident set size (Linux /proc; peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def value_bytes(value, _depth=0):
+    # Approximate deep size of one session-state value
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if _depth < 3 and isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(value_bytes(v, _depth + 1) for v in value)
+    if _depth < 3 and isinstance(value, dict):
+        return sys.getsizeof(value) + sum(value_bytes(v, _depth + 1) for v in value.values())
+    return sys.getsizeof(value)
+
+
+def state_bytes(at):
+    return sum(value_bytes(v) for _, v in at.session_state.items())
+
+
+def _mb(n):
+    return round(n / 2 ** 20, 2)
+
+
+# --- SIMULATED SESSION ---
+class SimSession:
+    def __init__(self, index, rows, edit_rows, seed=0):
+        from streamlit.testing.v1 import AppTest
+
+        self.index = index
+        self.edit_rows = edit_rows
+        self.rng = np.random.default_rng(seed + index)
+        self.at = AppTest.from_file(APP_PATH, default_timeout=JOB_TIMEOUT)
+        self.latencies = {step: [] for step in STEPS}
+        self.waits = []
+        self.rejected = 0
+        self.rounds = 0
+        regions = parameters.param_store().regions
+        self.region = list(regions)[index % len(regions)]
+        self.country = regions[self.region][0] if regions[self.region] else None
+        for i, key in enumerate(E.SECTIONS):
+            self.at.session_state[f"df_{key}"] = benchmark.synthetic_section(rows, seed=seed + index * 3 + i)
+
+    def _rerun(self, step, widget=None):
+        # widget: an interacted AppTest widget (its run() reruns the session)
+        queued = time.perf_counter()
+        with _script_lock:
+            started = time.perf_counter()
+            (widget or self.at).run()
+            elapsed = time.perf_counter() - started
+        self.waits.append(started - queued)
+        if self.at.exception:
+            raise RuntimeError(f"Session {self.index}, {step}: {self.at.exception[0].message}")
+        return elapsed
+
+    def _run(self, step, widget=None):
+        self.latencies[step].append(self._rerun(step, widget))
+
+    def _open(self, step, page):
+        self.at.session_state["current_page"] = PAGE_LABELS[page]
+        self._run(step)
+
+    def general_info(self):
+        self._open("general_info", "general_info")
+        if self.rounds == 0 and self.country:
+            self._run("general_info", self.at.selectbox(key="region_selector").select(self.region))
+            self._run("general_info", self.at.selectbox(key="country_selector").select(self.country))
+
+    def agri_edit(self):
+        self._open("agri_edit", "agri")
+        for key in E.SECTIONS:
+            df = self.at.session_state[f"df_{key}"].copy()
+            rows = self.rng.choice(len(df), size=min(self.edit_rows, len(df)), replace=False)
+            df.iloc[rows, df.columns.get_loc(E.COL_AREA)] = self.rng.uniform(0.5, 500.0, len(rows)).round(2)
+            new_row = df.iloc[[int(self.rng.integers(len(df)))]].copy() if len(df) else df
+            new_row.index = [df.index.max() + 1 if len(df) else 0]
+            self.at.session_state[f"df_{key}"] = pd.concat([df, new_row])
+            self._run("agri_edit")
+
+    def _wait_for_job(self, deadline):
+        while "agri_job" in self.at.session_state and time.perf_counter() < deadline:
+            time.sleep(POLL_INTERVAL)
+            self._rerun("agri_calculate")
+
+    def agri_calculate(self):
+        # Time from the click until the results are applied, polling like the page does
+        started = time.perf_counter()
+        self._wait_for_job(started + JOB_TIMEOUT)
+        buttons = [b for b in self.at.button if b.label == "Calculate Agriculture"]
+        if not buttons:
+            raise RuntimeError(f"Session {self.index}: no Calculate Agriculture button")
+        self._rerun("agri_calculate", buttons[0].click())
+        self._wait_for_job(started + JOB_TIMEOUT)
+        if not any(s.value.startswith("Calculated!") for s in self.at.success):
+            # Refused by the job pool (server-wide queue full), or cancelled
+            self.rejected += 1
+        self.latencies["agri_calculate"].append(time.perf_counter() - started)
+
+    def results(self):
+        self._open("results", "results")
+
+    def round(self):
+        for step in STEPS:
+            getattr(self, step)()
+        self.rounds += 1
+
+
+# --- RUN ---
+def _percentiles(values):
+    if not values:
+        return {"seconds": None, "count": 0}
+    arr = np.asarray(values)
+    return {
+        "seconds": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "p99": float(np.percentile(arr, 99)),
+        "max": float(arr.max()),
+        "count": int(arr.size)
+    }
+
+
+def run_load(sessions=DEFAULT_SESSIONS, rounds=DEFAULT_ROUNDS, duration=None, rows=DEFAULT_ROWS,
+             edit_rows=DEFAULT_EDIT_ROWS, trace=False, log=print):
+    """Run the scenario; returns the report dict (see the module header)."""
+    if trace:
+        tracemalloc.start()
+    rss_start = rss_bytes()
+    started = time.perf_counter()
+    sims = [SimSession(i, rows, edit_rows) for i in range(sessions)]
+    samples, errors = [], []
+    lock = threading.Lock()
+
+    def one_round(sim):
+        try:
+            sim.round()
+        except Exception as exc:
+            with lock:
+                errors.append(str(exc))
+
+    with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="loadtest") as pool:
+        n = 0
+        while (n < rounds) if duration is None else (time.perf_counter() - started < duration or n == 0):
+            round_started = time.perf_counter()
+            list(pool.map(one_round, sims))
+            n += 1
+            sample = {
+                "round": n,
+                "elapsed_s": round(time.perf_counter() - started, 2),
+                "round_s": round(time.perf_counter() - round_started, 3),
+                "rss_mb": _mb(rss_bytes()),
+                "state_mb": [_mb(state_bytes(sim.at)) for sim in sims]
+            }
+            if trace:
+                sample["traced_mb"] = _mb(tracemalloc.get_traced_memory()[0])
+            samples.append(sample)
+            log(f"round {n:>4}  {sample['round_s']:>7.2f} s  RSS {sample['rss_mb']:>8.1f} MB  errors {len(errors)}")
+    if trace:
+        tracemalloc.stop()
+
+    results = {
+        f"rerun/{step}": _percentiles([v for sim in sims for v in sim.latencies[step]]) for step in STEPS
+    }
+    results["rerun/all"] = _percentiles([v for sim in sims for step in STEPS for v in sim.latencies[step]])
+    results["rerun_wait"] = _percentiles([v for sim in sims for v in sim.waits])
+    return {
+        "environment": benchmark.environment(),
+        "config": {"sessions": sessions, "rounds": len(samples), "duration_s": duration, "rows_per_section": rows, "edit_rows": edit_rows},
+        "results": results,
+        "memory": memory_summary(rss_start, samples, sessions),
+        "samples": samples,
+        "rejected_jobs": sum(sim.rejected for sim in sims),
+        "errors": errors
+    }
+
+
+def memory_summary(rss_start, samples, sessions):
+    """RSS per session after the first (warm-up) round and growth over the later rounds."""
+    rss = np.array([s["rss_mb"] for s in samples])
+    state = np.array([s["state_mb"] for s in samples])
+    rss_start_mb = _mb(rss_start)
+    out = {
+        "rss_start_mb": rss_start_mb,
+        "rss_end_mb": float(rss[-1]),
+        "rss_per_session_mb": round((rss[0] - rss_start_mb) / sessions, 2),
+        "rss_end_per_session_mb": round((rss[-1] - rss_start_mb) / sessions, 2),
+        "rss_growth_mb": round(float(rss[-1] - rss[0]), 2),
+        "rss_growth_mb_per_round": round(float(np.polyfit(np.arange(len(rss)), rss, 1)[0]), 3) if len(rss) > 1 else None,
+        "state_mb_per_session": round(float(state[-1].mean()), 2),
+        "state_mb_max_session": round(float(state[-1].max()), 2),
+        "state_growth_mb": round(float(state[-1].mean() - state[0].mean()), 2)
+    }
+    if "traced_mb" in samples[0]:
+        traced = np.array([s["traced_mb"] for s in samples])
+        out["traced_growth_mb"] = round(float(traced[-1] - traced[0]), 2)
+    return out
+
+
+# --- REPORT ---
+def compare(baseline, current, threshold=benchmark.DEFAULT_THRESHOLD):
+    """Latency (p50 and p95 per step) and memory metrics of two reports, as in benchmark.compare."""
+    def flatten(report):
+        flat = {}
+        for name, r in report["results"].items():
+            flat[f"{name} p50"] = {"seconds": r.get("seconds")}
+            flat[f"{name} p95"] = {"seconds": r.get("p95")}
+        for name in MEMORY_METRICS:
+            flat[f"memory/{name}"] = {"seconds": report.get("memory", {}).get(name)}
+        return {"results": flat}
+
+    table = benchmark.compare(flatten(baseline), flatten(current), threshold)
+    return table.rename(columns={"baseline_s": "baseline", "current_s": "current"})
+
+
+def print_report(report):
+    print(f"{'step':<24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'count':>7}")
+    for name, r in report["results"].items():
+        if r["seconds"] is None:
+            continue
+        print(f"{name:<24} {r['seconds'] * 1000:>9.1f} {r['p95'] * 1000:>9.1f} {r['p99'] * 1000:>9.1f} {r['count']:>7}")
+    for name, value in report["memory"].items():
+        print(f"{name:<24} {value}")
+    print(f"rejected jobs: {report['rejected_jobs']}, errors: {len(report['errors'])}")
+    for error in report["errors"][:5]:
+        print(f"  {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load / soak test the app with simulated concurrent sessions.")
+    parser.add_argument("current", nargs="?", help="Existing report to compare instead of running")
+    parser.add_argument("-o", "--output", help="Write the report (JSON) here")
+    parser.add_argument("--compare", metavar="BASELINE", help="Baseline report to compare against")
+    parser.add_argument("--threshold", type=float, default=benchmark.DEFAULT_THRESHOLD, help="Increase ratio counted as a regression (default 0.2)")
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS, help="Concurrent simulated sessions")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="Scenario rounds per session")
+    parser.add_argument("--duration", type=float, help="Soak: repeat rounds for this many seconds (overrides --rounds)")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Rows per agriculture section and session")
+    parser.add_argument("--edit-rows", type=int, default=DEFAULT_EDIT_ROWS, help="Rows changed per section and round")
+    parser.add_argument("--tracemalloc", action="store_true", help="Also trace Python allocations (slower)")
+    args = parser.parse_args(argv)
+
+    if args.current:
+        report = benchmark.load_report(args.current)
+    else:
+        # Thousands of reruns: keep deprecation notices out of the output
+        from streamlit import config, logger
+        config.set_option("logger.level", "error")
+        logger.set_log_level("error")
+        # Sessions autosave like real ones; keep that out of the project database
+        os.environ.setdefault("CAFI_DB_PATH", os.path.join(tempfile.mkdtemp(), "loadtest.db"))
+        report = run_load(args.sessions, args.rounds, args.duration, args.rows, args.edit_rows, args.tracemalloc)
+        print_report(report)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Report -> {args.output}")
+
+    if args.compare:
+        table = compare(benchmark.load_report(args.compare), report, args.threshold)
+        print(table.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+        return 1 if (table["status"] == "REGRESSION").any() else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
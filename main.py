@@ -1,30 +1,23 @@
-# main.py
-import streamlit as st
-import importlib
-import shared_state
-import start_page, energy, arr, agri, forest, results, parameters
-
-# --- CRITICAL: FORCE RELOAD MODULES ---
-importlib.reload(agri)
-importlib.reload(results)
-importlib.reload(parameters)
-
-st.set_page_config(page_title="Carbon Mitigation Tool", layout="wide")
-
-if "current_page" not in st.session_state: st.session_state["current_page"] = "0 Start"
-
-pages = ["0 Start", "1 Energy", "2 Afforestation & Reforestation", "3 Agriculture", "4 Forestry & Conservation", "Results"]
-sel = st.radio("Navigation", pages, index=pages.index(st.session_state["current_page"]), horizontal=True, label_visibility="collapsed")
-
-if sel != st.session_state["current_page"]:
-    st.session_state["current_page"] = sel
-    st.rerun()
-
-st.divider()
-
-if sel == "0 Start": start_page.render_start_page()
-elif sel == "1 Energy": energy.render_energy_module()
-elif sel == "2 Afforestation & Reforestation": arr.render_arr_module()
-elif sel == "3 Agriculture": agri.render_agri_module()
-elif sel == "4 Forestry & Conservation": forest.render_forest_module()
-elif sel == "Results": results.render_results_module()
\ No newline at end of file
+# main.py
+import streamlit as st
+import shared_state
+import page_registry
+import project_panel
+import profiling
+import profiling_panel
+
+st.set_page_config(page_title="Carbon Mitigation Tool", layout="wide")
+shared_state.init_state()
+shared_state.keep_widget_state()
+project_panel.render_project_panel()
+
+sel = page_registry.render_navigation()
+with profiling.span("rerun", page=sel):
+    page_registry.render_page(sel)
+
+    # Debounced save of anything that changed in this run (see project_store.py)
+    shared_state.autosave()
+
+# Timing of recent reruns (CAFI_PROFILE=1, open with ?admin=1)
+if profiling.ENABLED and st.query_params.get("admin"):
+    profiling_panel.render_profiling_panel()
@@ -0,0 +1,57 @@
+# page_registry.py
+# Lazy page loading: a page module is imported the first time it is shown,
+# and only the selected page is rendered on each rerun.
+import importlib
+import os
+import sys
+import streamlit as st
+
+# Dev-only: set CAFI_HOT_RELOAD=1 to pick up code edits without restarting
+HOT_RELOAD = os.environ.get("CAFI_HOT_RELOAD", "").strip().lower() in ("1", "true", "yes")
+
+# (Navigation label, module, render function)
+PAGES = [
+    ("0 Start", "general_info", "render_general_info"),
+    ("1 Energy", "energy", "render_energy_module"),
+    ("2 Afforestation & Reforestation", "arr", "render_arr_module"),
+    ("3 Agriculture", "agri", "render_agri_module"),
+    ("4 Forestry & Conservation", "forest", "render_forest_module"),
+    ("Results", "results", "render_results_module"),
+    ("Portfolio", "portfolio", "render_portfolio_module")
+]
+PAGE_LABELS = [label for label, _, _ in PAGES]
+
+# Non-page modules reloaded (if already imported) before a page when HOT_RELOAD is on
+SHARED_MODULES = ["parameters", "calc_cache", "ledger", "shared_state", "agri_engine", "agri_import", "agri_uncertainty", "agri_scenarios", "energy_engine", "arr_engine", "forest_engine", "portfolio_store"]
+
+
+def _import(module_name):
+    try:
+        module = importlib.import_module(module_name)
+    except ModuleNotFoundError as exc:
+        # Only a missing page file counts as "not available"; real import errors surface
+        if exc.name == module_name:
+            return None
+        raise
+    if HOT_RELOAD:
+        for name in SHARED_MODULES:
+            if name in sys.modules:
+                importlib.reload(sys.modules[name])
+        module = importlib.reload(module)
+    return module
+
+
+def render_navigation():
+    st.radio("Navigation", PAGE_LABELS, key="current_page", horizontal=True, label_visibility="collapsed")
+    st.divider()
+    return st.session_state["current_page"]
+
+
+def render_page(label):
+    _, module_name, func_name = PAGES[PAGE_LABELS.index(label)]
+    module = _import(module_name)
+    if module is None:
+        st.header(label.replace(" ", ". ", 1) if label[0].isdigit() else label)
+        st.info(f"🚧 Module under development. (File '{module_name}.py' not found)")
+        return
+    getattr(module, func_name)()
@@ -1,4 +1,7 @@
 # parameters.py
+import json
+import os
+import threading
 import pandas as pd
 
 # --- 1. GLOBAL CONSTANTS ---
@@ -10,6 +13,17 @@ GWP_DEFAULTS = {
     "N2O": 265
 }
 
+# Selectable 100-year GWP sets (Start and Results pages); gases a set does not
+# list keep the value above. AR6 CH4 is the non-fossil value (biomass fuels).
+DEFAULT_GWP_SET = "Tool default"
+GWP_SETS = {
+    DEFAULT_GWP_SET: {},
+    "IPCC AR4": {"CO2": 1, "CH4": 25, "N2O": 298},
+    "IPCC AR5": {"CO2": 1, "CH4": 28, "N2O": 265},
+    "IPCC AR5 (climate-carbon feedback)": {"CO2": 1, "CH4": 34, "N2O": 298},
+    "IPCC AR6": {"CO2": 1, "CH4": 27.0, "N2O": 273}
+}
+
 REF_SOC_DEFAULT = 19
 CARBON_FRACTION_DEFAULT = 0.47
 
@@ -75,6 +89,29 @@ RIL_C_DATA = {
     "Value": [0.3092, 0.0257, 0.4500, 0.0132]
 }
 
+# --- 3b. AFFORESTATION & REFORESTATION ---
+# Growth curve per planted system (arr_engine.py): above-ground biomass at a
+# given age follows AGB max x (1 - exp(-k x age)) ^ p, in t dry matter/ha.
+# Indicative Tier 1 curves for tropical Africa (growth rates and root-to-shoot
+# ratios in the range of the IPCC 2019 Refinement, Vol. 4 Ch. 4); local values
+# can be entered per cohort. Activity = the ARR activity of the Start page.
+ARR_SYSTEM_DATA = {
+    "System": [
+        "Agroforestry (trees on farms)", "Woodlot / boundary planting",
+        "Eucalyptus plantation", "Acacia plantation", "Pine plantation", "Teak plantation",
+        "Natural regeneration (moist forest)", "Natural regeneration (dry forest)"
+    ],
+    "Activity": [
+        "Agroforestry", "Agroforestry",
+        "Forest plantations", "Forest plantations", "Forest plantations", "Forest plantations",
+        "Natural regeneration", "Natural regeneration"
+    ],
+    "AGB max (t d.m./ha)": [80, 100, 150, 140, 250, 220, 300, 120],
+    "Growth rate k (1/year)": [0.10, 0.15, 0.25, 0.20, 0.08, 0.07, 0.04, 0.05],
+    "Shape p": [1.5, 1.5, 2.0, 2.0, 2.0, 2.0, 1.5, 1.5],
+    "Root-to-shoot ratio": [0.24, 0.24, 0.24, 0.24, 0.20, 0.24, 0.37, 0.28]
+}
+
 # --- 4. AGRICULTURE DATA ---
 # Format: "Crop Name": (AGB_Default, BGB_Default, Soil_Default)
 # Sourced strictly from 'parameter_with_source.xlsx' (Central Africa)
@@ -93,8 +130,120 @@ AGRI_CROP_DATA = {
     "Tea": (0.7, 0.0, 27.3),
 }
 
-def get_agri_params(country):
+# Uncertainty of the agriculture factors for the Monte Carlo mode (agri_uncertainty.py)
+# Format: "factor": (distribution, spread). Spread is the relative standard deviation
+# for "normal"/"lognormal" and the relative half-width for "uniform"/"triangular".
+# One multiplier is drawn per crop (or per management option) and draw, so all rows
+# sharing a default move together. Locally entered values are not sampled.
+AGRI_UNCERTAINTY = {
+    "agb": ("normal", 0.30),
+    "bgb": ("normal", 0.30),
+    "soil": ("lognormal", 0.25),
+    "tillage": ("triangular", 0.05),
+    "input": ("triangular", 0.05),
+    "residue": ("triangular", 0.05),
+}
+
+# --- 5. PROJECT SITE ---
+# Built-in lists; a compiled parameter artifact (build_params.py) may extend them
+REGIONS = {
+    "Central Africa": [
+        "Cameroon",
+        "Central African Republic",
+        "Democratic Republic of the Congo",
+        "Equatorial Guinea",
+        "Gabon",
+        "Republic of Congo"
+    ],
+    "Southeast Asia": ["Indonesia"],
+    "South America": ["Brazil"]
+}
+CLIMATES = ["Tropical lowland", "Tropical montane"]
+MOISTURES = ["Moist", "Wet", "Dry"]
+SOIL_TYPES = ["Clay soils", "Sandy soils", "Spodic soils", "Volcanic soils", "Wetland soils", "Organic soils"]
+
+# --- 6. COMPILED PARAMETER STORE ---
+# build_params.py compiles the source workbook/CSV into PARAMS_PATH: one crop
+# table per region x country x climate x moisture x soil type (each may be "not
+# set"; a country always comes with its own region), already resolved, so a
+# lookup is a single dict access. Without the artifact every site gets
+# AGRI_CROP_DATA.
+PARAMS_PATH = os.environ.get("CAFI_PARAMS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "agri_params.json"))
+
+
+class ParamStore:
+    def __init__(self, regions, climates, moistures, soil_types, tables=None, default=None, source=None):
+        self.regions = regions
+        self.climates = climates
+        self.moistures = moistures
+        self.soil_types = soil_types
+        self.region_of = {country: region for region, countries in regions.items() for country in countries}
+        self.tables = tables or {}
+        self.default = AGRI_CROP_DATA if default is None else default
+        self.source = source
+        self._known = (set(regions), set(self.region_of), set(climates), set(moistures), set(soil_types))
+
+    def key(self, country=None, climate=None, moisture=None, soil_type=None, region=None):
+        # Values the store does not know count as "not set"; a known country decides the region
+        site = (region, country, climate, moisture, soil_type)
+        region, country, climate, moisture, soil_type = (v if v in known else None for v, known in zip(site, self._known))
+        if country is not None:
+            region = self.region_of[country]
+        return region, country, climate, moisture, soil_type
+
+    def crop_data(self, country=None, climate=None, moisture=None, soil_type=None, region=None):
+        key = self.key(country, climate, moisture, soil_type, region)
+        table = self.tables.get(key)
+        if table is None:
+            # Region -> global: the same site without its region (e.g. an artifact of an older builder)
+            table = self.tables.get((None, None) + key[2:], self.default)
+        return table
+
+
+def load_param_store(path=PARAMS_PATH):
+    """ParamStore from a compiled artifact, or the built-in tables if there is none."""
+    if not os.path.exists(path):
+        return ParamStore(REGIONS, CLIMATES, MOISTURES, SOIL_TYPES)
+    with open(path, encoding="utf-8") as f:
+        artifact = json.load(f)
+    # Identical crop tables are stored once and shared by all their sites
+    tables = [{crop: tuple(values) for crop, values in table.items()} for table in artifact["tables"]]
+    region_of = {country: region for region, countries in artifact["regions"].items() for country in countries}
+    index = {}
+    for key, i in artifact["index"].items():
+        site = tuple(part or None for part in key.split("|"))
+        if artifact.get("builder", 1) < 2:
+            # Builder 1 keys had no region: country|climate|moisture|soil type
+            site = (region_of.get(site[0]),) + site
+        index[site] = tables[i]
+    return ParamStore(
+        artifact["regions"], artifact["climates"], artifact["moistures"], artifact["soil_types"],
+        index, index.get((None,) * 5), source=path
+    )
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def param_store():
+    """Process-wide parameter store, loaded on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = load_param_store()
+        return _shared
+
+
+def get_agri_params(country, climate=None, moisture=None, soil_type=None, region=None):
     return {
-        "agb_bgb_soil": AGRI_CROP_DATA,
+        "agb_bgb_soil": param_store().crop_data(country, climate, moisture, soil_type, region),
         "residue_multiplier": 0.47
-    }
\ No newline at end of file
+    }
+
+
+def site_params(info):
+    """get_agri_params for a project's General Information fields (gi_* keys)."""
+    return get_agri_params(
+        info.get("gi_country"), info.get("gi_climate"), info.get("gi_moisture"), info.get("gi_soil"), info.get("gi_region")
+    )
@@ -0,0 +1,63 @@
+# portfolio.py
+import streamlit as st
+import plotly.graph_objects as go
+from collections import ChainMap
+import ledger
+import portfolio_store
+import profiling
+
+P = portfolio_store
+FILTERS = {"region": "Region", "country": "Country", "sector": "Sector", "activity": "Activity"}
+
+# --- PUBLISH (used on the Results page) ---
+def render_publish():
+    project_id = st.session_state.get("project_id")
+    if st.button("Add to portfolio", disabled=project_id is None, help=None if project_id else "Enter project data first; the project is saved automatically."):
+        with profiling.span("portfolio.publish"):
+            # Totals as shown on the Results page, with the active GWP values
+            state = ChainMap(ledger.weighted_totals(st.session_state), st.session_state)
+            P.get_portfolio().publish_state(project_id, state)
+        st.success("Project results added to the portfolio (see the Portfolio page).")
+
+# --- DASHBOARD ---
+# Every query below reads the precomputed rollups, never the per-row files.
+@profiling.timed("portfolio.render_portfolio_module")
+def render_portfolio_module():
+    st.header("Portfolio")
+    store = P.get_portfolio()
+    if store.projects.empty:
+        st.info("No projects yet. Use 'Add to portfolio' on the Results page of a project.")
+        return
+
+    cols = st.columns(len(FILTERS))
+    filters = {}
+    for col, (key, label) in zip(cols, FILTERS.items()):
+        options = sorted(store.rollups[key].dropna().unique())
+        filters[key] = col.multiselect(label, options, key=f"portfolio_{key}")
+
+    with profiling.span("portfolio.query"):
+        by_sector = store.totals(by=("sector",), **filters)
+        by_country = store.totals(by=("region", "country"), **filters)
+        by_activity = store.totals(by=("sector", "activity"), **filters)
+        n_projects = store.project_count(**filters)
+        top = store.top_projects(20, **filters)
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Emission reduction (tCO2e)", f"{by_sector['tco2e'].sum():,.0f}")
+    m2.metric("Projects", f"{n_projects:,}")
+    m3.metric("Result rows", f"{int(by_sector['rows'].sum()):,}")
+
+    col_left, col_right = st.columns(2)
+    with col_left:
+        fig = go.Figure(go.Bar(x=by_sector["sector"], y=by_sector["tco2e"], marker_color="#2A9D8F"))
+        fig.update_layout(height=400, margin=dict(t=30, b=40), title="By sector (tCO2e)", paper_bgcolor='white', plot_bgcolor='white')
+        st.plotly_chart(fig, use_container_width=True)
+    with col_right:
+        fig = go.Figure(go.Bar(x=by_country["country"], y=by_country["tco2e"], marker_color="#E9C46A"))
+        fig.update_layout(height=400, margin=dict(t=30, b=40), title="By country (tCO2e)", paper_bgcolor='white', plot_bgcolor='white')
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.markdown("**By activity**")
+    st.dataframe(by_activity, hide_index=True, use_container_width=True)
+    st.markdown("**Top projects**")
+    st.dataframe(top, hide_index=True, use_container_width=True)
@@ -0,0 +1,235 @@
+# portfolio_store.py
+# Columnar (Parquet) results store for many projects, with precomputed rollups
+# for the Portfolio page. No Streamlit import.
+#
+#   <dir>/rows/<project_id>.parquet   per-row outputs of one project
+#   <dir>/projects.parquet            one row per project
+#   <dir>/project_activity.parquet    per project x activity: rows and tCO2e
+#   <dir>/rollups.parquet             per country x region x sector x activity
+#
+# Publishing a project rewrites its own rows file and applies the difference
+# between its old and new activity totals to the rollups, so the cost does not
+# depend on how many rows the rest of the portfolio holds. Dashboard queries
+# only read the two small tables above.
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import agri_engine
+import arr_engine
+import energy_engine
+import forest_engine
+
+RESULTS_DIR = os.environ.get("CAFI_RESULTS_DIR", "cafi_results")
+NOT_SET = "(not set)"
+
+# (sector, activity, session key of the total, [(table key, result column)])
+ACTIVITIES = (
+    [
+        ("Energy", label, f"energy_total_{key}", [(f"df_energy_{key}", energy_engine.COL_RESULT)])
+        for key, label in energy_engine.ACTIVITIES.items()
+    ]
+    + [(
+        "Afforestation & Reforestation", "Afforestation & Reforestation", "arr_grand_total",
+        [("df_arr_cohorts", arr_engine.COL_RESULT)]
+    )]
+    + [
+        ("Agriculture", label, f"agri_total_{i}", [(f"df_{key}", agri_engine.COL_RESULT)])
+        for i, (key, label) in enumerate(agri_engine.SECTIONS.items(), start=1)
+    ]
+    + [(
+        "Forestry & Conservation", "Reduced impact logging (RIL-C)", "forest_grand_total",
+        [("df_forest_blocks", forest_engine.COL_RESULT), ("df_forest_inventory", forest_engine.COL_RESULT)]
+    )]
+)
+SECTORS = list(dict.fromkeys(sector for sector, _, _, _ in ACTIVITIES))
+
+ROW_COLUMNS = {"sector": "string", "activity": "string", "row": "int32", "tco2e": "float64"}
+PROJECT_COLUMNS = {
+    "project_id": "string", "name": "string", "country": "string", "region": "string",
+    "updated_at": "float64", "rows": "int64", "tco2e": "float64"
+}
+ROLLUP_KEYS = ["country", "region", "sector", "activity"]
+ACTIVITY_COLUMNS = {
+    "project_id": "string", "country": "string", "region": "string", "sector": "string", "activity": "string",
+    "rows": "int64", "tco2e": "float64"
+}
+ROLLUP_COLUMNS = {
+    "country": "string", "region": "string", "sector": "string", "activity": "string",
+    "projects": "int64", "rows": "int64", "tco2e": "float64"
+}
+
+
+def _empty(columns):
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in columns.items()})
+
+
+def _typed(df, columns):
+    return df.reindex(columns=list(columns)).astype(columns)
+
+
+# --- PROJECT OUTPUTS ---
+def project_outputs(state):
+    """(activity totals {(sector, activity): tCO2e}, per-row outputs) from a session-state mapping."""
+    totals, parts = {}, []
+    for sector, activity, total_key, tables in ACTIVITIES:
+        totals[(sector, activity)] = float(state.get(total_key, 0.0) or 0.0)
+        for table_key, result_col in tables:
+            df = state.get(table_key)
+            if df is None or result_col not in getattr(df, "columns", ()):
+                continue
+            values = pd.to_numeric(df[result_col], errors="coerce").to_numpy(dtype=float)
+            values = values[~np.isnan(values)]
+            if len(values):
+                parts.append(pd.DataFrame({
+                    "sector": sector, "activity": activity,
+                    "row": np.arange(len(values), dtype="int32"), "tco2e": values
+                }))
+    rows = pd.concat(parts, ignore_index=True) if parts else _empty(ROW_COLUMNS)
+    return totals, _typed(rows, ROW_COLUMNS)
+
+
+def _activity_frame(project_id, country, region, totals, rows):
+    counts = rows.groupby(["sector", "activity"]).size().to_dict() if len(rows) else {}
+    records = [
+        {
+            "project_id": project_id, "country": country, "region": region, "sector": sector, "activity": activity,
+            "rows": int(counts.get((sector, activity), 0)), "tco2e": tco2e
+        }
+        for (sector, activity), tco2e in totals.items()
+        if tco2e or counts.get((sector, activity))
+    ]
+    return _typed(pd.DataFrame(records), ACTIVITY_COLUMNS) if records else _empty(ACTIVITY_COLUMNS)
+
+
+def _rollup_delta(old, new):
+    # New contributions count +1 project, the ones they replace -1
+    signed = pd.concat([
+        new.assign(projects=1),
+        old.assign(projects=-1, rows=-old["rows"], tco2e=-old["tco2e"])
+    ])
+    return signed.groupby(ROLLUP_KEYS)[["projects", "rows", "tco2e"]].sum()
+
+
+def _write_parquet(df, path):
+    # Write then rename, so readers never see a half-written file
+    tmp = f"{path}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _read_parquet(path, columns):
+    return _typed(pd.read_parquet(path), columns) if os.path.exists(path) else _empty(columns)
+
+
+# --- STORE ---
+class PortfolioStore:
+    def __init__(self, path=RESULTS_DIR):
+        self.path = path
+        os.makedirs(os.path.join(path, "rows"), exist_ok=True)
+        self._lock = threading.Lock()
+        self.projects = _read_parquet(self._file("projects"), PROJECT_COLUMNS)
+        self.activities = _read_parquet(self._file("project_activity"), ACTIVITY_COLUMNS)
+        self.rollups = _read_parquet(self._file("rollups"), ROLLUP_COLUMNS)
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.parquet")
+
+    def _rows_file(self, project_id):
+        return os.path.join(self.path, "rows", f"{project_id}.parquet")
+
+    def _save_tables(self):
+        _write_parquet(self.projects, self._file("projects"))
+        _write_parquet(self.activities, self._file("project_activity"))
+        _write_parquet(self.rollups, self._file("rollups"))
+
+    def _replace_project(self, project_id, new_activities, project_row):
+        old = self.activities[self.activities["project_id"] == project_id]
+        delta = _rollup_delta(old, new_activities)
+        rollups = self.rollups.set_index(ROLLUP_KEYS)[["projects", "rows", "tco2e"]].add(delta, fill_value=0)
+        self.rollups = _typed(rollups[rollups["projects"] > 0].reset_index(), ROLLUP_COLUMNS)
+
+        keep_activities = self.activities[self.activities["project_id"] != project_id]
+        self.activities = _typed(pd.concat([keep_activities, new_activities], ignore_index=True), ACTIVITY_COLUMNS)
+        keep_projects = self.projects[self.projects["project_id"] != project_id]
+        parts = [keep_projects] + ([_typed(pd.DataFrame([project_row]), PROJECT_COLUMNS)] if project_row else [])
+        self.projects = _typed(pd.concat(parts, ignore_index=True), PROJECT_COLUMNS)
+
+    def publish(self, project_id, name=None, country=None, region=None, totals=None, rows=None):
+        """Add or replace one project: its rows file, its activity totals and the rollups."""
+        country, region = country or NOT_SET, region or NOT_SET
+        rows = _typed(rows, ROW_COLUMNS) if rows is not None else _empty(ROW_COLUMNS)
+        new_activities = _activity_frame(project_id, country, region, totals or {}, rows)
+        project_row = {
+            "project_id": project_id, "name": name or project_id, "country": country, "region": region,
+            "updated_at": time.time(), "rows": len(rows), "tco2e": float(new_activities["tco2e"].sum())
+        }
+        with self._lock:
+            _write_parquet(rows, self._rows_file(project_id))
+            self._replace_project(project_id, new_activities, project_row)
+            self._save_tables()
+
+    def publish_state(self, project_id, state):
+        """publish() from a session-state mapping (the current project in the app)."""
+        totals, rows = project_outputs(state)
+        self.publish(
+            project_id, state.get("gi_project_name"), state.get("gi_country"), state.get("gi_region"), totals, rows
+        )
+
+    def remove(self, project_id):
+        with self._lock:
+            self._replace_project(project_id, _empty(ACTIVITY_COLUMNS), None)
+            self._save_tables()
+            if os.path.exists(self._rows_file(project_id)):
+                os.remove(self._rows_file(project_id))
+
+    def rebuild_rollups(self):
+        """Recompute the rollups from the per-project table (e.g. after editing files by hand)."""
+        with self._lock:
+            grouped = self.activities.groupby(ROLLUP_KEYS).agg(
+                projects=("project_id", "nunique"), rows=("rows", "sum"), tco2e=("tco2e", "sum")
+            )
+            self.rollups = _typed(grouped.reset_index(), ROLLUP_COLUMNS)
+            self._save_tables()
+
+    # --- QUERIES (rollups only) ---
+    def _mask(self, df, filters):
+        mask = np.ones(len(df), dtype=bool)
+        for col, values in filters.items():
+            if values:
+                mask &= df[col].isin(list(values)).to_numpy()
+        return mask
+
+    def totals(self, by=("sector",), **filters):
+        """tCO2e and rows grouped by rollup keys; filters: country/region/sector/activity=[values]."""
+        rollups = self.rollups[self._mask(self.rollups, filters)]
+        return rollups.groupby(list(by))[["rows", "tco2e"]].sum().reset_index()
+
+    def project_count(self, **filters):
+        activities = self.activities[self._mask(self.activities, filters)]
+        return int(activities["project_id"].nunique())
+
+    def top_projects(self, n=20, **filters):
+        """Projects ranked by tCO2e within the filtered activities."""
+        activities = self.activities[self._mask(self.activities, filters)]
+        ranked = activities.groupby("project_id")[["rows", "tco2e"]].sum().nlargest(n, "tco2e")
+        info = self.projects.set_index("project_id")[["name", "country", "region"]]
+        return info.join(ranked, how="inner").sort_values("tco2e", ascending=False).reset_index()
+
+    def project_rows(self, project_id):
+        path = self._rows_file(project_id)
+        return _read_parquet(path, ROW_COLUMNS)
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_portfolio(path=RESULTS_DIR):
+    """Process-wide portfolio store (shared by all sessions)."""
+    with _shared_lock:
+        if path not in _shared:
+            _shared[path] = PortfolioStore(path)
+        return _shared[path]
@@ -0,0 +1,160 @@
+# profiling.py
+# Per-rerun timing of the hot paths. Off unless CAFI_PROFILE is set:
+#   CAFI_PROFILE=1     wall time, peak memory (tracemalloc) and row counts
+#   CAFI_PROFILE=time  wall time and row counts only (no tracemalloc overhead)
+# Each outermost span (a full rerun, or a fragment rerun) becomes one record,
+# kept in memory for the admin panel and appended to a rotating JSONL log.
+# No Streamlit import, so the engine and batch code can use it too.
+import collections
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+_MODE = os.environ.get("CAFI_PROFILE", "").strip().lower()
+ENABLED = _MODE not in ("", "0", "false", "no", "off")
+TRACE_MEMORY = ENABLED and _MODE != "time"
+LOG_PATH = os.environ.get("CAFI_PROFILE_LOG", "cafi_profile.jsonl")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+RECENT_RUNS = 200
+
+recent = collections.deque(maxlen=RECENT_RUNS)
+_local = threading.local()
+_logger = None
+_logger_lock = threading.Lock()
+
+
+# --- NO-OP (instrumentation disabled) ---
+class _NoSpan:
+    __slots__ = ()
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def note(self, **values):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+# --- SPANS ---
+class Span:
+    """Times one block; set `.rows` or call note() inside it to record counts."""
+
+    def __init__(self, name, rows=None, **meta):
+        self.name = name
+        self.rows = rows
+        self.meta = meta
+        self.child_peak = 0
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+            _local.spans = []
+        self.depth = len(stack)
+        stack.append(self)
+        # Reserve the slot now so spans are listed in start order
+        self.index = len(_local.spans)
+        _local.spans.append(None)
+        if TRACE_MEMORY:
+            self.start_mem, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        self.started = time.perf_counter()
+        return self
+
+    def note(self, **values):
+        self.meta.update(values)
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        stack = _local.stack
+        stack.pop()
+        entry = {"name": self.name, "depth": self.depth, "seconds": round(seconds, 6), "rows": self.rows, **self.meta}
+        if TRACE_MEMORY:
+            # reset_peak() in nested spans hides their peaks from us, so children report upwards
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self.child_peak)
+            entry["peak_kb"] = round(max(peak - self.start_mem, 0) / 1024, 1)
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        if exc_type is not None:
+            # st.rerun()/st.stop() unwind through here as exceptions
+            entry["exit"] = exc_type.__name__
+        _local.spans[self.index] = entry
+        if not stack:
+            _finish(self, entry)
+            _local.stack = None
+        return False
+
+
+def span(name, rows=None, **meta):
+    """Context manager timing a block (free when profiling is off)."""
+    if not ENABLED:
+        return _NO_SPAN
+    return Span(name, rows, **meta)
+
+
+def timed(name=None):
+    """Decorator version of span(); returns the function unchanged when profiling is off."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        label = name or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# --- RECORDS ---
+def _finish(root, entry):
+    spans = _local.spans
+    record = {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "root": root.name,
+        "seconds": entry["seconds"],
+        "peak_kb": entry.get("peak_kb"),
+        **root.meta,
+        "spans": spans
+    }
+    recent.append(record)
+    try:
+        _get_logger().info(json.dumps(record, default=str))
+    except OSError:
+        pass
+
+
+def _get_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            logger = logging.getLogger("cafi.profile")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            _logger = logger
+    return _logger
+
+
+if TRACE_MEMORY and not tracemalloc.is_tracing():
+    tracemalloc.start()
@@ -0,0 +1,38 @@
+# profiling_panel.py
+import streamlit as st
+import pandas as pd
+import profiling
+
+def render_profiling_panel():
+    with st.sidebar.expander("⏱ Profiling", expanded=True):
+        runs = list(profiling.recent)
+        if not runs:
+            st.caption("No reruns recorded yet.")
+            return
+
+        summary = pd.DataFrame([
+            {
+                "Time": r["ts"][11:],
+                "Run": r["root"],
+                "Page": r.get("page", ""),
+                "ms": r["seconds"] * 1000,
+                "Peak KB": r.get("peak_kb")
+            }
+            for r in reversed(runs)
+        ])
+        st.dataframe(summary, hide_index=True, use_container_width=True, column_config={
+            "ms": st.column_config.NumberColumn("ms", format="%.1f")
+        })
+
+        # Span breakdown of one run (latest first)
+        pick = st.selectbox(
+            "Run details", range(len(runs)), key="profiling_run_select",
+            format_func=lambda i: f"{summary['Time'][i]} · {summary['Run'][i]}"
+        )
+        spans = pd.DataFrame(runs[len(runs) - 1 - pick]["spans"])
+        spans["name"] = ["  " * d + n for d, n in zip(spans["depth"], spans["name"])]
+        spans["ms"] = spans.pop("seconds") * 1000
+        st.dataframe(spans.drop(columns="depth"), hide_index=True, use_container_width=True, column_config={
+            "ms": st.column_config.NumberColumn("ms", format="%.1f")
+        })
+        st.caption(f"Also written to `{profiling.LOG_PATH}`.")
@@ -0,0 +1,56 @@
+# project_panel.py
+import streamlit as st
+from datetime import datetime
+import shared_state
+import project_store
+import snapshot
+import export
+
+def render_project_panel():
+    with st.sidebar:
+        st.markdown("### Project")
+        project_id = shared_state.get("project_id")
+        if project_id:
+            st.caption(f"Saved automatically · ID `{project_id}`")
+        else:
+            st.caption("Not saved yet. Projects are saved automatically once you start entering data.")
+
+        store, _ = project_store.get_store()
+        # Only this browser's projects (its owner link, see shared_state.project_owner)
+        projects = store.list_projects(shared_state.project_owner())
+        if projects:
+            labels = {
+                pid: f"{name or 'Untitled'} · {datetime.fromtimestamp(updated):%Y-%m-%d %H:%M}"
+                for pid, name, updated in projects
+            }
+            selected = st.selectbox(
+                "Saved projects", list(labels), format_func=labels.get,
+                index=None, key="project_open_select", placeholder="Select a project..."
+            )
+            if st.button("Open project", disabled=selected is None, use_container_width=True):
+                if not shared_state.open_project(selected):
+                    st.error("Project not found.")
+                else:
+                    st.rerun()
+
+        if st.button("New project", use_container_width=True):
+            shared_state.new_project()
+            st.rerun()
+
+        # --- SNAPSHOT FILES (see snapshot.py) ---
+        # Plain copies: the file is generated on another thread when clicked
+        fields, tables = shared_state.project_fields(), shared_state.project_tables()
+        st.download_button(
+            "Save snapshot", data=lambda: snapshot.dumps(fields, tables),
+            file_name=export.report_filename(fields, snapshot.SUFFIX[1:]), mime=snapshot.MIME,
+            on_click="ignore", use_container_width=True, key="snapshot_download",
+            help="Single file with the project data, agriculture tables and totals, to open on another machine."
+        )
+        upload = st.file_uploader("Open snapshot", type=[snapshot.SUFFIX[1:]], key="snapshot_upload")
+        if st.button("Load snapshot", disabled=upload is None, use_container_width=True):
+            try:
+                shared_state.open_snapshot(upload.getvalue())
+            except ValueError as exc:
+                st.error(str(exc))
+            else:
+                st.rerun()
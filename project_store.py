@@ -0,0 +1,380 @@
+# project_store.py
+# SQLite project persistence: pooled connections, bulk row inserts and a
+# debounced autosaver. No Streamlit import (shared_state wires it to the app).
+#
+# Each project records the owner (workspace) that created it; list_projects and
+# load_project take an owner and leave other owners' projects out. Projects
+# saved before owners existed have none: they open by ID and the first owner to
+# open one claims it.
+import functools
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import agri_engine
+import arr_engine
+import energy_engine
+import forest_engine
+
+DB_PATH = os.environ.get("CAFI_DB_PATH", "cafi_projects.db")
+POOL_SIZE = 4
+AUTOSAVE_DELAY = 2.0  # seconds between the first unsaved change and the write
+logger = logging.getLogger("cafi.autosave")
+
+# Agriculture tables as stored in SQLite. Defaults are not stored (the engine
+# recomputes them); local overrides are sparse, so they live in their own table
+# and only rows that have any are written.
+E = agri_engine
+AGRI_ROW_COLUMNS = {
+    E.COL_CROP: "crop", E.COL_AREA: "area",
+    E.COL_TILLAGE: "tillage", E.COL_INPUT: "input", E.COL_RESIDUE: "residue",
+    E.COL_RESULT: "result"
+}
+AGRI_LOCAL_COLUMNS = {
+    E.COL_LOC_AGB: "loc_agb", E.COL_LOC_BGB: "loc_bgb", E.COL_LOC_SOIL: "loc_soil",
+    E.COL_LOC_TILLAGE: "loc_tillage", E.COL_LOC_INPUT: "loc_input", E.COL_LOC_RESIDUE: "loc_residue"
+}
+_TEXT_COLUMNS = {"crop", "tillage", "input", "residue"}
+
+# Tables of the other modules, stored whole as one compressed Arrow IPC blob each:
+# {table name: function re-typing a loaded frame}. Like the agriculture sections,
+# a table lives in session state as "df_<table name>".
+FRAME_TABLES = {
+    **{
+        f"energy_{activity}": functools.partial(energy_engine.coerce_activity_frame, activity=activity)
+        for activity in energy_engine.ACTIVITIES
+    },
+    "arr_cohorts": arr_engine.coerce_cohort_frame,
+    "forest_blocks": forest_engine.coerce_block_frame,
+    # Imported inventories are only kept as their per-concession summary
+    "forest_inventory": forest_engine.coerce_summary
+}
+
+
+def _sql_columns(names):
+    return ", ".join(f"{c} {'TEXT' if c in _TEXT_COLUMNS else 'REAL'}" for c in names)
+
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS projects (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        updated_at REAL,
+        owner TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS project_fields (
+        project_id TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT,
+        PRIMARY KEY (project_id, key)
+    )""",
+    f"CREATE TABLE IF NOT EXISTS agri_rows (project_id TEXT NOT NULL, section TEXT NOT NULL, row_id INTEGER NOT NULL, "
+    f"{_sql_columns(AGRI_ROW_COLUMNS.values())})",
+    "CREATE INDEX IF NOT EXISTS agri_rows_project ON agri_rows (project_id, section, row_id)",
+    f"CREATE TABLE IF NOT EXISTS agri_local (project_id TEXT NOT NULL, section TEXT NOT NULL, row_id INTEGER NOT NULL, "
+    f"{_sql_columns(AGRI_LOCAL_COLUMNS.values())})",
+    "CREATE INDEX IF NOT EXISTS agri_local_project ON agri_local (project_id, section, row_id)",
+    """CREATE TABLE IF NOT EXISTS frame_tables (
+        project_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        data BLOB,
+        PRIMARY KEY (project_id, name)
+    )"""
+]
+# Columns added after a table was first released: (table, column, type)
+ADDED_COLUMNS = [("projects", "owner", "TEXT")]
+
+
+# --- CONNECTION POOL ---
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, size=POOL_SIZE):
+        self.path = path
+        self._pool = queue.Queue(maxsize=size)
+        for _ in range(size):
+            conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._pool.put(conn)
+        with self.connection() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            for table, column, kind in ADDED_COLUMNS:
+                if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS projects_owner ON projects (owner, updated_at)")
+
+    @contextmanager
+    def connection(self):
+        # One transaction per checkout: commit on success, roll back on error
+        conn = self._pool.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+# --- VALUE ENCODING ---
+def _encode(value):
+    if isinstance(value, date):
+        return json.dumps({"__date__": value.isoformat()})
+    if hasattr(value, "item"):  # numpy scalars
+        value = value.item()
+    return json.dumps(value)
+
+
+def _decode(text):
+    value = json.loads(text)
+    if isinstance(value, dict) and "__date__" in value:
+        return date.fromisoformat(value["__date__"])
+    return value
+
+
+def _is_storable(value):
+    return value is None or isinstance(value, (str, int, float, bool, date)) or hasattr(value, "item")
+
+
+def frame_table(df):
+    """pyarrow Table of a module table; text columns may hold numbers (e.g. imported labels)."""
+    df = df.reset_index(drop=True)
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def frame_ipc(df):
+    """Compressed Arrow IPC file of a module table (FRAME_TABLES)."""
+    sink = pa.BufferOutputStream()
+    table = frame_table(df)
+    with ipc.new_file(sink, table.schema, options=ipc.IpcWriteOptions(compression="zstd")) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def read_frame(name, data):
+    """Typed module table from frame_ipc() bytes (or an Arrow buffer)."""
+    df = ipc.open_file(pa.BufferReader(data)).read_all().to_pandas()
+    return FRAME_TABLES[name](df)
+
+
+# --- STORE ---
+class ProjectStore:
+    def __init__(self, path=DB_PATH, pool_size=POOL_SIZE):
+        self.pool = ConnectionPool(path, pool_size)
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex[:12]
+
+    def claim_project(self, project_id, owner):
+        """Create the project for owner, or take it if it has no owner. False if another owner has it."""
+        with self.pool.connection() as conn:
+            conn.execute(
+                "INSERT INTO projects (id, updated_at, owner) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET owner = excluded.owner WHERE projects.owner IS NULL",
+                (project_id, time.time(), owner)
+            )
+            row = conn.execute("SELECT owner FROM projects WHERE id = ?", (project_id,)).fetchone()
+        return row[0] == owner
+
+    def save_project(self, project_id, name=None, fields=None, tables=None):
+        """Write fields and any given tables (agriculture sections, FRAME_TABLES) in one transaction."""
+        with self.pool.connection() as conn:
+            self._write(conn, project_id, name, fields, tables)
+
+    def save_many(self, payloads):
+        # Batched autosave: {project_id: (name, fields, tables)} in one transaction
+        with self.pool.connection() as conn:
+            for project_id, (name, fields, tables) in payloads.items():
+                self._write(conn, project_id, name, fields, tables)
+
+    def _write(self, conn, project_id, name, fields, tables):
+        conn.execute(
+            "INSERT INTO projects (id, name, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET name = COALESCE(excluded.name, projects.name), updated_at = excluded.updated_at",
+            (project_id, name, time.time())
+        )
+        if fields:
+            conn.executemany(
+                "INSERT OR REPLACE INTO project_fields (project_id, key, value) VALUES (?, ?, ?)",
+                [(project_id, k, _encode(v)) for k, v in fields.items() if _is_storable(v)]
+            )
+        for section, df in (tables or {}).items():
+            if section in FRAME_TABLES:
+                self._write_frame(conn, project_id, section, df)
+            else:
+                self._write_table(conn, project_id, section, df)
+
+    @staticmethod
+    def _write_frame(conn, project_id, name, df):
+        if df is None or df.empty:
+            conn.execute("DELETE FROM frame_tables WHERE project_id = ? AND name = ?", (project_id, name))
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO frame_tables (project_id, name, data) VALUES (?, ?, ?)",
+            (project_id, name, frame_ipc(df).to_pybytes())
+        )
+
+    @staticmethod
+    def _insert_columns(conn, table, project_id, section, row_ids, df, columns):
+        # Column-wise tolist() + zip avoids per-row pandas overhead; NaN is stored as NULL
+        values = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in columns]
+        n = len(row_ids)
+        conn.executemany(
+            f"INSERT INTO {table} (project_id, section, row_id, {', '.join(columns.values())}) "
+            f"VALUES (?, ?, ?, {', '.join('?' * len(columns))})",
+            zip([project_id] * n, [section] * n, row_ids, *values)
+        )
+
+    def _write_table(self, conn, project_id, section, df):
+        for table in ("agri_rows", "agri_local"):
+            conn.execute(f"DELETE FROM {table} WHERE project_id = ? AND section = ?", (project_id, section))
+        if df is None or df.empty:
+            return
+        df = df.reindex(columns=agri_engine.AGRI_COLUMNS)
+        self._insert_columns(conn, "agri_rows", project_id, section, range(len(df)), df, AGRI_ROW_COLUMNS)
+
+        has_local = df[list(AGRI_LOCAL_COLUMNS)].notna().any(axis=1).to_numpy()
+        if has_local.any():
+            self._insert_columns(
+                conn, "agri_local", project_id, section,
+                has_local.nonzero()[0].tolist(), df.loc[has_local], AGRI_LOCAL_COLUMNS
+            )
+
+    @staticmethod
+    def _read_table(conn, project_id, section):
+        rows = conn.execute(
+            f"SELECT {', '.join(AGRI_ROW_COLUMNS.values())} FROM agri_rows "
+            "WHERE project_id = ? AND section = ? ORDER BY row_id", (project_id, section)
+        ).fetchall()
+        columns = list(zip(*rows)) or [()] * len(AGRI_ROW_COLUMNS)
+        df = pd.DataFrame(dict(zip(AGRI_ROW_COLUMNS, columns)))
+
+        local = conn.execute(
+            f"SELECT row_id, {', '.join(AGRI_LOCAL_COLUMNS.values())} FROM agri_local "
+            "WHERE project_id = ? AND section = ?", (project_id, section)
+        ).fetchall()
+        for col in AGRI_LOCAL_COLUMNS:
+            df[col] = float("nan")
+        if local:
+            local_columns = list(zip(*local))
+            row_ids = list(local_columns[0])
+            for col, values in zip(AGRI_LOCAL_COLUMNS, local_columns[1:]):
+                df.loc[row_ids, col] = pd.array(values, dtype="float64")
+        return df
+
+    def load_project(self, project_id, crop_list=None, owner=None):
+        """Return (name, fields, {section or table name: df}), or None if the project does not
+        exist or belongs to an owner other than the given one."""
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT name, owner FROM projects WHERE id = ?", (project_id,)).fetchone()
+            if row is None or owner is not None and row[1] not in (None, owner):
+                return None
+            fields = {
+                k: _decode(v) for k, v in
+                conn.execute("SELECT key, value FROM project_fields WHERE project_id = ?", (project_id,))
+            }
+            tables = {
+                section: agri_engine.coerce_section_frame(self._read_table(conn, project_id, section), crop_list)
+                for section in agri_engine.SECTIONS
+            }
+            for name, data in conn.execute("SELECT name, data FROM frame_tables WHERE project_id = ?", (project_id,)):
+                if name in FRAME_TABLES:
+                    tables[name] = read_frame(name, data)
+        return row[0], fields, tables
+
+    def list_projects(self, owner=None):
+        # owner=None lists every project (scripts and maintenance)
+        with self.pool.connection() as conn:
+            if owner is None:
+                return conn.execute("SELECT id, name, updated_at FROM projects ORDER BY updated_at DESC").fetchall()
+            return conn.execute(
+                "SELECT id, name, updated_at FROM projects WHERE owner = ? ORDER BY updated_at DESC", (owner,)
+            ).fetchall()
+
+    def delete_project(self, project_id):
+        with self.pool.connection() as conn:
+            for table, col in (("agri_rows", "project_id"), ("agri_local", "project_id"), ("frame_tables", "project_id"),
+                               ("project_fields", "project_id"), ("projects", "id")):
+                conn.execute(f"DELETE FROM {table} WHERE {col} = ?", (project_id,))
+
+
+# --- DEBOUNCED AUTOSAVE ---
+class Autosaver:
+    """Collects changes and writes them in one batch AUTOSAVE_DELAY seconds
+    after the first unsaved change, so fast editing does not write per keystroke."""
+
+    def __init__(self, store, delay=AUTOSAVE_DELAY):
+        self.store = store
+        self.delay = delay
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._timer = None
+
+    def schedule(self, project_id, name=None, fields=None, tables=None):
+        with self._lock:
+            self._merge(project_id, name, fields, tables)
+
+    def _merge(self, project_id, name, fields, tables):
+        # Called with self._lock held; later values win
+        old_name, old_fields, old_tables = self._pending.get(project_id, (None, {}, {}))
+        self._pending[project_id] = (
+            name or old_name,
+            {**old_fields, **(fields or {})},
+            {**old_tables, **(tables or {})}
+        )
+        if self._timer is None:
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        # One write at a time (timer thread or a session's own flush), and the
+        # changes are taken inside it, so an older payload never commits last
+        with self._save_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._timer = None
+            if not pending:
+                return
+            try:
+                self.store.save_many(pending)
+            except Exception:
+                # Keep the changes (under any made since) and try again later
+                logger.exception("Autosave of %d project(s) failed, retrying in %.0f s", len(pending), self.delay)
+                with self._lock:
+                    for project_id, (name, fields, tables) in pending.items():
+                        newer = self._pending.pop(project_id, None)
+                        self._merge(project_id, name, fields, tables)
+                        if newer:
+                            self._merge(project_id, *newer)
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_store(path=DB_PATH):
+    """Process-wide store and autosaver (shared by all sessions)."""
+    with _shared_lock:
+        if path not in _shared:
+            store = ProjectStore(path)
+            _shared[path] = (store, Autosaver(store))
+        return _shared[path]
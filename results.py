@@ -1,129 +1,305 @@
-# results.py
-import streamlit as st
-import plotly.graph_objects as go
-import shared_state
-import datetime
-
-def render_results_module():
-    # --- 1. GATHER DATA ---
-    # Global Totals
-    energy = shared_state.get("energy_grand_total", 0.0) or 0.0
-    arr = shared_state.get("arr_grand_total", 0.0) or 0.0
-    forest = shared_state.get("forest_grand_total", 0.0) or 0.0
-    
-    # Agri Sub-totals (From agri.py)
-    agri_1 = shared_state.get("agri_total_1", 0.0) or 0.0 # Deforestation-free outgrower
-    agri_2 = shared_state.get("agri_total_2", 0.0) or 0.0 # Agro-industrial expansion
-    agri_3 = shared_state.get("agri_total_3", 0.0) or 0.0 # Sustainable intensification
-    agri_total = agri_1 + agri_2 + agri_3
-    
-    # Fallback: if totals exist but sub-totals are 0 (legacy data issue)
-    if agri_total == 0 and shared_state.get("agri_grand_total", 0.0) > 0:
-        agri_1 = shared_state.get("agri_grand_total", 0.0)
-        agri_total = agri_1
-
-    grand_total = energy + arr + agri_total + forest
-
-    # Project Info (Corrected keys to match general_info.py)
-    impl_years = shared_state.get("gi_impl", 0) or 0
-    cap_years = shared_state.get("gi_cap", 0) or 0
-    total_duration = impl_years + cap_years
-
-    info = {
-        "Project": shared_state.get("gi_project_name", "-"),
-        "Executing agency": shared_state.get("gi_executing_agency", "-"),
-        "Funding agency": shared_state.get("gi_funding_agency", "-"),
-        "Country": shared_state.get("gi_country", "-"),
-        "Project cost": f"${shared_state.get('gi_project_cost', 0):,.0f}",
-        "Duration": f"{total_duration} years"
-    }
-
-    # --- 2. LAYOUT ---
-    st.markdown("### Final Results Dashboard")
-    
-    col_left, col_mid, col_right = st.columns([1.5, 1, 1.5])
-
-    # --- LEFT CHART: SECTOR OVERVIEW ---
-    with col_left:
-        st.markdown("<h6 style='text-align:center; color:#555;'>Global Mitigation by Sector (tCO2e)</h6>", unsafe_allow_html=True)
-        
-        # Data
-        sec_labels = ["Energy", "Afforestation & Reforestation", "Agriculture", "Forestry & Conservation"]
-        sec_values = [energy, arr, agri_total, forest]
-        
-        fig1 = go.Figure(go.Bar(
-            x=sec_labels,
-            y=sec_values,
-            marker_color=['#B0B0B0', '#B0B0B0', '#2A9D8F', '#B0B0B0'], # Highlight Agri in Green
-            text=[f"{v:,.0f}" if v > 0 else "" for v in sec_values],
-            textposition='auto'
-        ))
-        
-        fig1.update_layout(
-            showlegend=False,
-            height=500,
-            margin=dict(t=20, b=50),
-            paper_bgcolor='white', plot_bgcolor='white'
-        )
-        fig1.update_yaxes(showgrid=True, gridcolor='#eee', zeroline=True, zerolinecolor='black')
-        st.plotly_chart(fig1, use_container_width=True)
-
-
-    # --- MIDDLE: INFO & TOTAL ---
-    with col_mid:
-        # Info Table
-        html = """<style>
-            .it{width:100%; border-collapse:collapse; border:2px solid black; font-size:0.85em; font-family:sans-serif;} 
-            .it td{border:1px solid black; padding:6px; text-align:center;} 
-            .il{background:#f2f2f2; font-weight:bold; width:40%; text-align:left; padding-left:10px;} 
-            .iv{color:#0056b3; font-style:italic;}
-        </style><table class='it'>"""
-        for k, v in info.items():
-            html += f"<tr><td class='il'>{k}</td><td class='iv'>{v}</td></tr>"
-        html += "</table>"
-        st.markdown(html, unsafe_allow_html=True)
-        
-        st.write("")
-        
-        # Green Total Box
-        st.markdown(f"""
-        <div style="border:2px solid black; text-align:center; margin-bottom:20px;">
-            <div style="padding:10px; font-weight:bold; border-bottom:1px solid #ddd; background:white;">Total Emission Reduction</div>
-            <div style="background:#ccf7d6; padding:30px 10px;">
-                <div style="font-size:2.5em; font-weight:bold; color:#155724;">{grand_total:,.0f}</div>
-                <div style="font-size:1.1em; color:#155724;">tCO₂ eq.</div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-
-
-    # --- RIGHT CHART: AGRICULTURE DEEP-DIVE ---
-    with col_right:
-        # Specific Header for Agriculture
-        st.markdown("<h6 style='text-align:center; color:#2A9D8F;'>Agriculture Sector Breakdown (tCO2e)</h6>", unsafe_allow_html=True)
-        
-        # Data - ONLY Agriculture Categories
-        agri_labels = [
-            "Deforestation-free outgrower",
-            "Agro-industrial expansion",
-            "Sustainable intensification"
-        ]
-        agri_values = [agri_1, agri_2, agri_3]
-        agri_colors = ['#E9C46A', '#F4A261', '#E76F51'] # Distinct colors
-        
-        fig2 = go.Figure(go.Bar(
-            x=agri_labels,
-            y=agri_values,
-            marker_color=agri_colors,
-            text=[f"{v:,.0f}" if v > 0 else "" for v in agri_values],
-            textposition='auto'
-        ))
-        
-        fig2.update_layout(
-            showlegend=False,
-            height=500,
-            margin=dict(t=20, b=50),
-            paper_bgcolor='white', plot_bgcolor='white'
-        )
-        fig2.update_yaxes(showgrid=True, gridcolor='#eee', zeroline=True, zerolinecolor='black')
-        st.plotly_chart(fig2, use_container_width=True)
\ No newline at end of file
+# results.py
+import streamlit as st
+import plotly.graph_objects as go
+import datetime
+from collections import ChainMap
+import numpy as np
+import pandas as pd
+import profiling
+import parameters
+import agri_engine
+import ledger
+import portfolio_store
+import agri_uncertainty
+import portfolio
+import export
+
+def summarize(state):
+    """Sector and agriculture totals plus project info from a session-state mapping."""
+    # Totals with a per-gas ledger are re-weighted with the active GWP values
+    state = ChainMap(ledger.weighted_totals(state), state)
+
+    # Global Totals
+    energy = state.get("energy_grand_total", 0.0) or 0.0
+    arr = state.get("arr_grand_total", 0.0) or 0.0
+    forest = state.get("forest_grand_total", 0.0) or 0.0
+    
+    # Agri Sub-totals (From agri.py)
+    agri_1 = state.get("agri_total_1", 0.0) or 0.0 # Deforestation-free outgrower
+    agri_2 = state.get("agri_total_2", 0.0) or 0.0 # Agro-industrial expansion
+    agri_3 = state.get("agri_total_3", 0.0) or 0.0 # Sustainable intensification
+    agri_total = agri_1 + agri_2 + agri_3
+    
+    # Fallback: if totals exist but sub-totals are 0 (legacy data issue)
+    if agri_total == 0 and (state.get("agri_grand_total", 0.0) or 0.0) > 0:
+        agri_1 = state.get("agri_grand_total", 0.0)
+        agri_total = agri_1
+
+    grand_total = energy + arr + agri_total + forest
+
+    # Project Info (Corrected keys to match general_info.py)
+    impl_years = state.get("gi_impl", 0) or 0
+    cap_years = state.get("gi_cap", 0) or 0
+    total_duration = impl_years + cap_years
+
+    info = {
+        "Project": state.get("gi_project_name", "-"),
+        "Executing agency": state.get("gi_executing_agency", "-"),
+        "Funding agency": state.get("gi_funding_agency", "-"),
+        "Country": state.get("gi_country", "-"),
+        "Project cost": f"${state.get('gi_project_cost', 0) or 0:,.0f}",
+        "Duration": f"{total_duration} years"
+    }
+    return {
+        "energy": energy, "arr": arr, "forest": forest,
+        "agri_1": agri_1, "agri_2": agri_2, "agri_3": agri_3, "agri_total": agri_total,
+        "grand_total": grand_total, "info": info,
+        "impl_years": impl_years, "cap_years": cap_years
+    }
+
+@profiling.timed("results.bar_figure")
+def bar_figure(labels, values, colors):
+    fig = go.Figure(go.Bar(
+        x=labels,
+        y=values,
+        marker_color=colors,
+        text=[f"{v:,.0f}" if v > 0 else "" for v in values],
+        textposition='auto'
+    ))
+    
+    fig.update_layout(
+        showlegend=False,
+        height=500,
+        margin=dict(t=20, b=50),
+        paper_bgcolor='white', plot_bgcolor='white'
+    )
+    fig.update_yaxes(showgrid=True, gridcolor='#eee', zeroline=True, zerolinecolor='black')
+    return fig
+
+@profiling.timed("results.render_results_module")
+def render_results_module():
+    # --- 1. GATHER DATA ---
+    summary = summarize(st.session_state)
+    energy, arr, forest = summary["energy"], summary["arr"], summary["forest"]
+    agri_1, agri_2, agri_3 = summary["agri_1"], summary["agri_2"], summary["agri_3"]
+    agri_total, grand_total, info = summary["agri_total"], summary["grand_total"], summary["info"]
+    impl_years, cap_years = summary["impl_years"], summary["cap_years"]
+
+    # --- 2. LAYOUT ---
+    st.markdown("### Final Results Dashboard")
+    render_gwp_choice()
+    
+    col_left, col_mid, col_right = st.columns([1.5, 1, 1.5])
+
+    # --- LEFT CHART: SECTOR OVERVIEW ---
+    with col_left:
+        st.markdown("<h6 style='text-align:center; color:#555;'>Global Mitigation by Sector (tCO2e)</h6>", unsafe_allow_html=True)
+        
+        # Data
+        sec_labels = ["Energy", "Afforestation & Reforestation", "Agriculture", "Forestry & Conservation"]
+        sec_values = [energy, arr, agri_total, forest]
+        
+        # Highlight Agri in Green
+        fig1 = bar_figure(sec_labels, sec_values, ['#B0B0B0', '#B0B0B0', '#2A9D8F', '#B0B0B0'])
+        with profiling.span("results.plotly_chart"):
+            st.plotly_chart(fig1, use_container_width=True)
+
+
+    # --- MIDDLE: INFO & TOTAL ---
+    with col_mid:
+        # Info Table
+        html = """<style>
+            .it{width:100%; border-collapse:collapse; border:2px solid black; font-size:0.85em; font-family:sans-serif;} 
+            .it td{border:1px solid black; padding:6px; text-align:center;} 
+            .il{background:#f2f2f2; font-weight:bold; width:40%; text-align:left; padding-left:10px;} 
+            .iv{color:#0056b3; font-style:italic;}
+        </style><table class='it'>"""
+        for k, v in info.items():
+            html += f"<tr><td class='il'>{k}</td><td class='iv'>{v}</td></tr>"
+        html += "</table>"
+        st.markdown(html, unsafe_allow_html=True)
+        
+        st.write("")
+        
+        # Green Total Box
+        st.markdown(f"""
+        <div style="border:2px solid black; text-align:center; margin-bottom:20px;">
+            <div style="padding:10px; font-weight:bold; border-bottom:1px solid #ddd; background:white;">Total Emission Reduction</div>
+            <div style="background:#ccf7d6; padding:30px 10px;">
+                <div style="font-size:2.5em; font-weight:bold; color:#155724;">{grand_total:,.0f}</div>
+                <div style="font-size:1.1em; color:#155724;">tCO₂ eq.</div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+    # --- RIGHT CHART: AGRICULTURE DEEP-DIVE ---
+    with col_right:
+        # Specific Header for Agriculture
+        st.markdown("<h6 style='text-align:center; color:#2A9D8F;'>Agriculture Sector Breakdown (tCO2e)</h6>", unsafe_allow_html=True)
+        
+        # Data - ONLY Agriculture Categories
+        agri_labels = [
+            "Deforestation-free outgrower",
+            "Agro-industrial expansion",
+            "Sustainable intensification"
+        ]
+        agri_values = [agri_1, agri_2, agri_3]
+        agri_colors = ['#E9C46A', '#F4A261', '#E76F51'] # Distinct colors
+        
+        fig2 = bar_figure(agri_labels, agri_values, agri_colors)
+        with profiling.span("results.plotly_chart"):
+            st.plotly_chart(fig2, use_container_width=True)
+
+        # Portfolio (see portfolio_store.py)
+        portfolio.render_publish()
+
+    # --- 3. GASES ---
+    render_gas_breakdown()
+
+    # --- 4. ANNUAL PROJECTION ---
+    render_projection(impl_years, cap_years)
+
+    # --- 5. UNCERTAINTY ---
+    render_uncertainty()
+
+    # --- 6. EXPORT ---
+    render_export(summary)
+
+def render_gwp_choice():
+    # Same setting as on the Start page; totals and charts are re-weighted from the
+    # per-gas ledgers (see ledger.py), no sector is recalculated
+    c1, c2 = st.columns([1, 3])
+    c1.selectbox("GWP values", list(parameters.GWP_SETS), key="gwp_set")
+    overrides = [gas for gas in ledger.GASES if st.session_state.get(f"gwp_{gas}") not in (None, "")]
+    if overrides:
+        c2.caption("Tier 2 values from the Start page are used for " + ", ".join(overrides) + ".")
+
+def gas_table(state):
+    """Tonnes per gas and tCO2e per sector, from the per-gas ledgers in state."""
+    gwp = ledger.state_gwp(state)
+    records = {}
+    for sector, _, total_key, _ in portfolio_store.ACTIVITIES:
+        for gas, tonnes in ledger.gas_totals(state, total_key).items():
+            row = records.setdefault(sector, dict.fromkeys(ledger.GASES, 0.0))
+            row[gas] += tonnes
+    table = pd.DataFrame.from_dict(records, orient="index", columns=ledger.GASES)
+    table = table.loc[:, (table != 0).any()]
+    table["tCO2e"] = table.reindex(columns=ledger.GASES, fill_value=0.0).to_numpy() @ gwp
+    return table.rename_axis("Sector").reset_index()
+
+def render_gas_breakdown():
+    with st.expander("Emissions by gas"):
+        table = gas_table(st.session_state)
+        if table.empty:
+            st.info("Open the sector pages to calculate their per-gas results.")
+            return
+        st.caption("Tonnes avoided or removed per gas; black carbon (BC) is reported but has no GWP.")
+        st.dataframe(table, hide_index=True, use_container_width=True, column_config={
+            col: st.column_config.NumberColumn(col, format="%.2f") for col in table.columns if col != "Sector"
+        })
+
+def render_projection(impl_years, cap_years):
+    st.markdown("### Agriculture: annual projection")
+    if not impl_years and not cap_years:
+        st.info("Enter the implementation and capitalization years on the Start page to see the projection.")
+        return
+
+    params = parameters.site_params(st.session_state)
+    frames = {key: st.session_state[f"df_{key}"] for key in agri_engine.SECTIONS if f"df_{key}" in st.session_state}
+    soil_divisor = st.session_state.get("soil_divisor", agri_engine.SOIL_DIVISOR)
+    with profiling.span("results.projection", rows=sum(len(df) for df in frames.values())):
+        annual = agri_engine.project_sections(frames, impl_years, cap_years, params["agb_bgb_soil"], soil_divisor)
+    # Agriculture is CO2 only, weighted like its ledger
+    gwp_co2 = ledger.state_gwp(st.session_state)[ledger.CO2]
+    annual = {key: values * gwp_co2 for key, values in annual.items()}
+    years = list(range(1, int(impl_years) + int(cap_years) + 1))
+    st.caption(
+        f"Area adopted linearly over {impl_years} implementation year(s); biomass accrues every year once adopted, "
+        f"soil carbon change is spread over {soil_divisor} years."
+    )
+
+    colors = dict(zip(agri_engine.SECTIONS, ['#E9C46A', '#F4A261', '#E76F51']))
+    col_annual, col_cumulative = st.columns(2)
+    with col_annual:
+        fig = go.Figure([
+            go.Bar(x=years, y=values, name=agri_engine.SECTIONS[key], marker_color=colors[key])
+            for key, values in annual.items()
+        ])
+        fig.update_layout(
+            barmode="stack", height=400, margin=dict(t=30, b=40), title="Annual (tCO2e/year)",
+            xaxis_title="Project year", paper_bgcolor='white', plot_bgcolor='white', legend=dict(orientation="h")
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    with col_cumulative:
+        fig = go.Figure([
+            go.Scatter(x=years, y=np.cumsum(values), name=agri_engine.SECTIONS[key], stackgroup="total", line=dict(color=colors[key]))
+            for key, values in annual.items()
+        ])
+        fig.update_layout(
+            height=400, margin=dict(t=30, b=40), title="Cumulative (tCO2e)",
+            xaxis_title="Project year", paper_bgcolor='white', plot_bgcolor='white', legend=dict(orientation="h")
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment
+def render_uncertainty():
+    with st.expander("Agriculture uncertainty (Monte Carlo)"):
+        st.caption(
+            "Samples the default emission and removal factors (distributions in parameters.AGRI_UNCERTAINTY). "
+            "Locally entered values are kept as entered."
+        )
+        c1, c2, c3 = st.columns([1, 1, 1])
+        draws = c1.number_input("Draws", min_value=100, max_value=100_000, value=agri_uncertainty.DEFAULT_DRAWS, step=1000, key="mc_draws")
+        seed = c2.number_input("Random seed", min_value=0, value=agri_uncertainty.DEFAULT_SEED, step=1, key="mc_seed")
+        params = parameters.site_params(st.session_state)
+        frames = {key: st.session_state[f"df_{key}"] for key in agri_engine.SECTIONS if f"df_{key}" in st.session_state}
+        # Results are kept until the tables (totals), draws or seed change
+        inputs = (tuple(st.session_state.get(f"agri_total_{i}", 0.0) for i in (1, 2, 3)), draws, seed)
+
+        c3.write("")
+        if c3.button("Run simulation", disabled=not frames, use_container_width=True):
+            with st.spinner("Sampling..."), profiling.span("results.uncertainty", rows=sum(len(df) for df in frames.values())):
+                samples = agri_uncertainty.simulate(frames, params["agb_bgb_soil"], draws=int(draws), seed=int(seed))
+            st.session_state["agri_uncertainty"] = (inputs, agri_uncertainty.percentile_table(samples), samples["total"])
+
+        stored = st.session_state.get("agri_uncertainty")
+        if not frames:
+            st.info("Enter agriculture data first.")
+        elif stored is None:
+            st.caption("Not run yet.")
+        else:
+            stored_inputs, table, total = stored
+            if stored_inputs != inputs:
+                st.warning("Inputs changed since the last run; run the simulation again.")
+            st.dataframe(table, hide_index=True, use_container_width=True, column_config={
+                col: st.column_config.NumberColumn(col, format="%.0f") for col in table.columns if col != "Section"
+            })
+            fig = go.Figure(go.Histogram(x=total, nbinsx=60, marker_color="#2A9D8F"))
+            fig.update_layout(
+                height=300, margin=dict(t=20, b=40), showlegend=False,
+                xaxis_title="Agriculture total (tCO2e)", paper_bgcolor='white', plot_bgcolor='white'
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment
+def render_export(summary):
+    with st.expander("Export report"):
+        st.caption(
+            "General information, sector breakdown, section totals and every agriculture row with its defaults and tCO2e. "
+            "The file is written in chunks when you click Download."
+        )
+        fmt = st.radio("Format", list(export.FORMATS), horizontal=True, key="export_format", format_func=str.upper)
+        # Plain copies of what the report needs: the file is generated on another thread
+        info = {key: st.session_state.get(key) for key in export.GI_FIELDS.values()}
+        frames = {key: st.session_state[f"df_{key}"] for key in agri_engine.SECTIONS if f"df_{key}" in st.session_state}
+
+        def generate():
+            # Hand Streamlit the open file; it is removed once Streamlit has read and dropped it
+            with profiling.span("results.export", rows=sum(len(df) for df in frames.values()), format=fmt):
+                return export.open_report(fmt, info, summary, frames, export.crop_data_for(info))
+
+        st.download_button(
+            "Download", data=generate, file_name=export.report_filename(info, fmt),
+            mime=export.FORMATS[fmt], on_click="ignore", key="export_download"
+        )
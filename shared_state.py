@@ -1,8 +1,23 @@
 # shared_state.py
+import functools
+import uuid
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 from datetime import date
+import agri_engine
+import ledger
+import parameters
+import project_store
+import snapshot
+import profiling
 
 def init_state():
+    # Reopen the project named in the URL (?project=<id>) after a browser refresh
+    project_owner()
+    if "project_id" not in st.session_state and st.query_params.get("project"):
+        if not open_project(st.query_params["project"]):
+            st.query_params.pop("project", None)
+
     defaults = {
         # Defaults set to None so the dropdowns start empty
         "gi_region": None,
@@ -20,13 +35,185 @@ def init_state():
         "gi_funding_agency": "",
         "gi_executing_agency": "",
         "gi_project_cost": 0.0,
+        "gi_date": date.today(),
         "gi_impl": 0,
-        "gi_cap": 0
+        "gi_cap": 0,
+        "gwp_set": parameters.DEFAULT_GWP_SET,
+
+        # Navigation
+        "current_page": "0 Start"
     }
     for key, value in defaults.items():
         if key not in st.session_state:
             st.session_state[key] = value
 
+# Widget keys whose values must survive while their page is not rendered
+WIDGET_PREFIXES = ("gi_", "act_", "gwp_")
+WIDGET_KEYS = ("soc_ref", "c_fract")
+
+def keep_widget_state():
+    # Streamlit drops the state of widgets that are not drawn in a run; re-assigning
+    # the values detaches them from the widgets so switching pages keeps them.
+    for key in list(st.session_state.keys()):
+        if key.startswith(WIDGET_PREFIXES) or key in WIDGET_KEYS:
+            st.session_state[key] = st.session_state[key]
+
+# --- PERSISTENCE (see project_store.py) ---
+# Results saved with a project next to the widget values above
+RESULT_KEYS = (
+    "agri_total_1", "agri_total_2", "agri_total_3", "agri_grand_total",
+    "energy_total_cookstoves", "energy_total_charcoal", "energy_total_substitution",
+    "energy_grand_total", "arr_grand_total", "forest_grand_total"
+)
+# Per-gas totals of each result (see ledger.py)
+RESULT_PREFIXES = ("gas_",)
+# Saved tables: the agriculture sections and the other modules' tables
+TABLE_KEYS = {name: f"df_{name}" for name in list(agri_engine.SECTIONS) + list(project_store.FRAME_TABLES)}
+# Per-project session keys that are dropped when another project is opened
+PROJECT_KEY_PREFIXES = WIDGET_PREFIXES + RESULT_PREFIXES + ("df_", "agri_rows_", "agri_params_", "editor_", "import_report_", "ledger_")
+PROJECT_KEYS = WIDGET_KEYS + RESULT_KEYS + ("region_selector", "country_selector", "project_id", "agri_uncertainty", "agri_job")
+
+def is_project_field(key):
+    return key.startswith(WIDGET_PREFIXES + RESULT_PREFIXES) or key in WIDGET_KEYS or key in RESULT_KEYS
+
+def project_fields():
+    return {key: value for key, value in st.session_state.items() if is_project_field(key)}
+
+def project_tables():
+    return {section: st.session_state[key] for section, key in TABLE_KEYS.items() if key in st.session_state}
+
+def _remember_saved(fields, tables):
+    st.session_state["_autosave_seen"] = {"fields": dict(fields), "tables": dict(tables)}
+
+def autosave():
+    # Hand what changed since the last call to the shared debounced autosaver.
+    # Tables are compared by identity: pages replace a table only when it changes.
+    fields, tables = project_fields(), project_tables()
+    seen = st.session_state.get("_autosave_seen")
+    if seen is None:
+        # First run of a session: remember the defaults, nothing to save yet
+        _remember_saved(fields, tables)
+        return
+
+    changed_fields = {k: v for k, v in fields.items() if k not in seen["fields"] or seen["fields"][k] != v}
+    changed_tables = {s: df for s, df in tables.items() if seen["tables"].get(s) is not df}
+    # A table removed from the session (e.g. a cleared inventory) is deleted from the project
+    changed_tables.update({s: None for s, df in seen["tables"].items() if df is not None and s not in tables})
+    if not changed_fields and not changed_tables:
+        return
+
+    project_id = st.session_state.get("project_id")
+    if project_id is None:
+        # Don't create a project until something has actually been entered
+        entered = any(v not in (None, "", 0, False) for v in changed_fields.values())
+        if not entered and not any(df is not None and len(df) for df in changed_tables.values()):
+            seen["fields"].update(changed_fields)
+            seen["tables"].update(changed_tables)
+            return
+        project_id = project_store.ProjectStore.new_id()
+        project_store.get_store()[0].claim_project(project_id, project_owner())
+        st.session_state["project_id"] = project_id
+        st.query_params["project"] = project_id
+        changed_fields, changed_tables = fields, tables
+
+    _, autosaver = project_store.get_store()
+    autosaver.schedule(project_id, fields.get("gi_project_name") or None, changed_fields, changed_tables)
+    seen["fields"].update(changed_fields)
+    seen["tables"].update(changed_tables)
+
+def _clear_project():
+    # A background calculation of the previous project is no longer wanted
+    if st.session_state.get("agri_job"):
+        st.session_state["agri_job"][0].cancel()
+    for key in list(st.session_state.keys()):
+        if key.startswith(PROJECT_KEY_PREFIXES) or key in PROJECT_KEYS:
+            del st.session_state[key]
+
+def open_project(project_id):
+    store, autosaver = project_store.get_store()
+    autosaver.flush()
+    # Other owners' projects are not found; an ownerless (older) project is claimed
+    loaded = store.load_project(project_id, owner=project_owner())
+    if loaded is None or not store.claim_project(project_id, project_owner()):
+        return False
+    _, fields, tables = loaded
+    _clear_project()
+    st.session_state.update(fields)
+    for section, df in tables.items():
+        st.session_state[TABLE_KEYS[section]] = df
+    st.session_state["project_id"] = project_id
+    st.query_params["project"] = project_id
+    _remember_saved(project_fields(), project_tables())
+    return True
+
+def open_snapshot(source):
+    # A loaded snapshot becomes a new project, saved like any other
+    snap = snapshot.open_snapshot(source)
+    store, autosaver = project_store.get_store()
+    autosaver.flush()
+    _clear_project()
+    # The file comes from outside: only the keys a project saves are restored
+    st.session_state.update({k: v for k, v in snap.fields.items() if is_project_field(k)})
+    for section, df in snap.tables().items():
+        st.session_state[TABLE_KEYS[section]] = df
+    project_id = project_store.ProjectStore.new_id()
+    store.claim_project(project_id, project_owner())
+    st.session_state["project_id"] = project_id
+    st.query_params["project"] = project_id
+    fields, tables = project_fields(), project_tables()
+    autosaver.schedule(project_id, fields.get("gi_project_name") or None, fields, tables)
+    _remember_saved(fields, tables)
+
+def new_project():
+    _, autosaver = project_store.get_store()
+    autosaver.flush()
+    _clear_project()
+    st.query_params.pop("project", None)
+    st.session_state.pop("_autosave_seen", None)
+
+def fragment(func):
+    # st.fragment that also autosaves (and is profiled) on each partial rerun
+    func = profiling.timed(f"{func.__module__}.{func.__name__}")(func)
+
+    @functools.wraps(func)
+    def run_and_save(*args, **kwargs):
+        result = func(*args, **kwargs)
+        autosave()
+        return result
+    return st.fragment(run_and_save)
+
+def rerun_fragment():
+    # Show freshly computed columns; a fragment-scoped rerun is only allowed
+    # while the fragment itself is rerunning, otherwise rerun the page
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def project_owner():
+    # Whose saved projects this browser lists and may open (see project_store.py).
+    # Kept in the URL (?owner=) so a refresh or bookmark returns to the same
+    # projects; anyone given the full link shares them.
+    if "project_owner" not in st.session_state:
+        st.session_state["project_owner"] = st.query_params.get("owner") or uuid.uuid4().hex
+    st.query_params["owner"] = st.session_state["project_owner"]
+    return st.session_state["project_owner"]
+
+def session_owner():
+    # Identifies this browser session to the shared job pool (see jobs.py)
+    if "job_owner" not in st.session_state:
+        st.session_state["job_owner"] = uuid.uuid4().hex[:12]
+    return st.session_state["job_owner"]
+
+def set_ledger(total_key, book):
+    # Per-gas ledger behind one result total; its gas totals are saved with the project
+    st.session_state[ledger.key(total_key)] = book
+    st.session_state.update(ledger.gas_fields(total_key, book))
+
+def gwp():
+    # Active GWP vector: selected set plus the Tier 2 values of the Start page
+    return ledger.state_gwp(st.session_state)
+
 def get(key, default=None):
     return st.session_state.get(key, default)
 
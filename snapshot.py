@@ -0,0 +1,192 @@
+# snapshot.py
+# Single-file project snapshots (.cafi) for handing a project to someone else.
+# No Streamlit import.
+#
+#   magic "CAFISNAP" | uint16 format version | uint32 header length | header JSON
+#   then one Arrow IPC file per agriculture section and per module table
+#   (project_store.FRAME_TABLES; format 2 and later), zstd, 64-byte aligned
+#
+# The header holds the project fields (gi_*, act_*, gwp_*, Tier-2 overrides and
+# computed totals) and, per section or table, the offset, length, row count and
+# column names of its block. Opening a snapshot only parses the header; a block
+# is decoded when table() asks for it, and only the requested columns. Files are
+# memory-mapped, so unread blocks are never loaded from disk.
+import json
+import struct
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import agri_engine
+import project_store
+
+E = agri_engine
+MAGIC = b"CAFISNAP"
+FORMAT_VERSION = 2
+SUFFIX = ".cafi"
+MIME = "application/octet-stream"
+COMPRESSION = "zstd"
+ALIGN = 64
+_PREFIX = struct.Struct("<8sHI")  # magic, format version, header length
+
+
+# --- VALUE ENCODING (same conventions as project_store) ---
+def _encode(value):
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and "__date__" in value:
+        return date.fromisoformat(value["__date__"])
+    return value
+
+
+def _is_storable(value):
+    return value is None or isinstance(value, (str, int, float, bool, date)) or hasattr(value, "item")
+
+
+# --- WRITE ---
+def _block(table):
+    sink = pa.BufferOutputStream()
+    with ipc.new_file(sink, table.schema, options=ipc.IpcWriteOptions(compression=COMPRESSION)) as writer:
+        writer.write_table(table)
+    return sink.getvalue(), table.num_rows
+
+
+def _section_block(df):
+    return _block(pa.Table.from_pandas(df.reindex(columns=E.AGRI_COLUMNS), preserve_index=False))
+
+
+def _padding(position):
+    return -position % ALIGN
+
+
+def write_snapshot(target, fields, tables):
+    """Write fields {key: value} and tables {section_key or FRAME_TABLES name: df} to a binary file object."""
+    blocks, sections, frames = [], {}, {}
+    for key, df in tables.items():
+        if df is None:
+            continue
+        if key in E.SECTIONS:
+            buffer, rows = _section_block(E.coerce_section_frame(df, _categories(df)))
+            sections[key] = {"rows": rows, "length": buffer.size, "columns": list(E.AGRI_COLUMNS)}
+        elif key in project_store.FRAME_TABLES:
+            table = project_store.frame_table(df)
+            buffer, rows = _block(table)
+            frames[key] = {"rows": rows, "length": buffer.size, "columns": table.column_names}
+        else:
+            continue
+        blocks.append(buffer)
+
+    header = {
+        "format": FORMAT_VERSION,
+        "fields": {k: _encode(v) for k, v in fields.items() if _is_storable(v)},
+        "sections": sections,
+        "tables": frames
+    }
+    # Offsets depend on the header length, which depends on the offsets' digits:
+    # fix the header size first with placeholder offsets of the final width
+    infos = list(sections.values()) + list(frames.values())
+    for info in infos:
+        info["offset"] = 0
+    size = len(json.dumps(header).encode()) + 20 * len(infos)
+    position = _PREFIX.size + size
+    position += _padding(position)
+    for info in infos:
+        info["offset"] = position
+        position += info["length"]
+        position += _padding(position)
+    body = json.dumps(header).encode().ljust(size)
+
+    target.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(body)))
+    target.write(body)
+    written = _PREFIX.size + len(body)
+    for block in blocks:
+        target.write(b"\0" * _padding(written))
+        written += _padding(written)
+        target.write(block)
+        written += block.size
+    return written
+
+
+def save_snapshot(path, fields, tables):
+    with open(path, "wb") as f:
+        return write_snapshot(f, fields, tables)
+
+
+def dumps(fields, tables):
+    sink = pa.BufferOutputStream()
+    write_snapshot(sink, fields, tables)
+    return sink.getvalue().to_pybytes()
+
+
+# --- READ ---
+class Snapshot:
+    """An opened snapshot: fields are parsed, section and module tables are read on demand."""
+
+    def __init__(self, source):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._buffer = pa.py_buffer(source)
+        elif hasattr(source, "read"):
+            self._buffer = pa.py_buffer(source.read())
+        else:
+            self._buffer = pa.memory_map(str(source), "r").read_buffer()
+
+        if self._buffer.size < _PREFIX.size:
+            raise ValueError("Not a project snapshot (file too short)")
+        magic, version, header_length = _PREFIX.unpack(self._buffer[:_PREFIX.size].to_pybytes())
+        if magic != MAGIC:
+            raise ValueError("Not a project snapshot")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Snapshot format {version} is newer than this tool supports ({FORMAT_VERSION}); update the tool.")
+        header = json.loads(self._buffer[_PREFIX.size:_PREFIX.size + header_length].to_pybytes())
+        self.version = version
+        self.fields = {k: _decode(v) for k, v in header.get("fields", {}).items()}
+        self.sections = header.get("sections", {})
+        # Module tables (project_store.FRAME_TABLES) this tool knows; none before format 2
+        self.frames = {k: v for k, v in header.get("tables", {}).items() if k in project_store.FRAME_TABLES}
+
+    def rows(self, key):
+        info = self.sections.get(key) or self.frames.get(key)
+        return info["rows"] if info else 0
+
+    def table(self, key, columns=None):
+        """Section or module table as a typed DataFrame (only the given columns, if any); None if absent."""
+        info = self.sections.get(key) or self.frames.get(key)
+        if info is None:
+            return None
+        block = self._buffer[info["offset"]:info["offset"] + info["length"]]
+        options = None
+        if columns is not None:
+            options = ipc.IpcReadOptions(included_fields=[info["columns"].index(c) for c in columns])
+        df = ipc.open_file(pa.BufferReader(block), options=options).read_all().to_pandas()
+        if columns is not None:
+            return df
+        if key in self.frames:
+            return project_store.FRAME_TABLES[key](df)
+        return E.coerce_section_frame(df, crop_list=_categories(df))
+
+    def tables(self):
+        return {key: self.table(key) for key in list(self.sections) + list(self.frames)}
+
+
+def _categories(df):
+    # Keep the table's own crop categories (the project's country list plus any extras)
+    crop = df.get(E.COL_CROP)
+    return list(crop.cat.categories) if isinstance(getattr(crop, "dtype", None), pd.CategoricalDtype) else None
+
+
+def open_snapshot(source):
+    """Open a snapshot from a path, bytes or a binary file object."""
+    return Snapshot(source)
+
+
+def load_snapshot(source):
+    """(fields, {section_key or table name: df}) with every table read."""
+    snap = Snapshot(source)
+    return snap.fields, snap.tables()
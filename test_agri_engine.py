@@ -0,0 +1,252 @@
+# test_agri_engine.py
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import parameters
+import agri_engine
+import benchmark
+
+E = agri_engine
+
+
+# --- REFERENCE (the original per-row loop of agri.py) ---
+def baseline_calc(df, crop_data):
+    rf_tillage = {"Full tillage": 1.0, "Reduced tillage": 1.04, "No tillage": 1.10}
+    rf_input = {"Low C input": 0.92, "Medium C input": 1.0, "High C input, no manure": 1.11, "High C input, with manure": 1.44}
+    rf_residue = {"Burned": 0.9, "Exported": 0.9, "Retained": 1.1}
+    results, total = [], 0.0
+    for row in df.astype(object).where(df.notna(), None).to_dict("records"):
+        crop = row.get(E.COL_CROP)
+        area = float(row.get(E.COL_AREA) or 0)
+        if not (crop and area > 0):
+            results.append(None)
+            continue
+        defaults = crop_data.get(crop, (0.0, 0.0, 0.0))
+        t_val = rf_tillage.get(row.get(E.COL_TILLAGE), 1.0)
+        i_val = rf_input.get(row.get(E.COL_INPUT), 1.0)
+        r_val = rf_residue.get(row.get(E.COL_RESIDUE), 1.0)
+        ef_agb = float(row.get(E.COL_LOC_AGB) or 0) or defaults[0]
+        ef_bgb = float(row.get(E.COL_LOC_BGB) or 0) or defaults[1]
+        ef_soil = float(row.get(E.COL_LOC_SOIL) or 0) or defaults[2]
+        rf_t = float(row.get(E.COL_LOC_TILLAGE) or 0) or t_val
+        rf_i = float(row.get(E.COL_LOC_INPUT) or 0) or i_val
+        rf_r = float(row.get(E.COL_LOC_RESIDUE) or 0) or r_val
+        soil_imp = ef_soil * rf_t * rf_i * rf_r
+        res = area * (ef_agb + ef_bgb + soil_imp) * 3.664
+        results.append(res)
+        total += res
+    return results, total
+
+
+def mixed_section(n_rows=600, seed=1):
+    """Synthetic rows plus blanks, zero areas, unknown crops and local overrides."""
+    rng = np.random.default_rng(seed)
+    df = benchmark.synthetic_section(n_rows, seed=seed).astype({E.COL_CROP: object})
+    df.loc[rng.random(n_rows) < 0.05, E.COL_CROP] = None
+    df.loc[rng.random(n_rows) < 0.05, E.COL_CROP] = "Unknown crop"
+    df.loc[rng.random(n_rows) < 0.05, E.COL_AREA] = 0.0
+    df.loc[rng.random(n_rows) < 0.05, E.COL_AREA] = np.nan
+    for col in (E.COL_LOC_AGB, E.COL_LOC_BGB, E.COL_LOC_TILLAGE, E.COL_LOC_RESIDUE):
+        df[col] = np.where(rng.random(n_rows) < 0.1, rng.uniform(0.5, 3.0, n_rows), np.nan)
+    return df
+
+
+# --- FULL CALCULATION ---
+def test_calculate_section_matches_baseline_loop():
+    crop_data = parameters.AGRI_CROP_DATA
+    df = mixed_section()
+    expected, expected_total = baseline_calc(df, crop_data)
+
+    out, total = E.calculate_section(df, crop_data)
+
+    got = out[E.COL_RESULT].to_numpy(dtype=float)
+    for value, want in zip(got, expected):
+        if want is None:
+            assert math.isnan(value)
+        else:
+            assert value == pytest.approx(want, rel=1e-12)
+    assert total == pytest.approx(expected_total, rel=1e-12)
+
+
+def test_calculate_section_fills_defaults_of_active_rows():
+    df = benchmark.synthetic_section(50)
+    out, _ = E.calculate_section(df)
+    crop = out[E.COL_CROP].astype(object)
+    agb = crop.map({k: v[0] for k, v in parameters.AGRI_CROP_DATA.items()})
+    np.testing.assert_allclose(out[E.COL_DEF_AGB].to_numpy(dtype=float), agb.to_numpy(dtype=float), rtol=1e-6)
+    tillage = out[E.COL_TILLAGE].astype(object).map(E.RF_TILLAGE)
+    np.testing.assert_allclose(out[E.COL_DEF_TILLAGE].to_numpy(dtype=float), tillage.to_numpy(dtype=float), rtol=1e-6)
+
+
+def test_calculate_section_empty_and_inactive():
+    out, total = E.calculate_section(E.empty_section_frame())
+    assert total == 0.0 and out.empty
+    df = pd.DataFrame({E.COL_CROP: ["Hedgerow", None], E.COL_AREA: [0.0, 10.0]})
+    out, total = E.calculate_section(df)
+    assert total == 0.0
+    assert out[E.COL_RESULT].isna().all()
+
+
+def test_calculate_sections_matches_per_section_runs():
+    frames = {key: mixed_section(200, seed=i) for i, key in enumerate(E.SECTIONS)}
+    out, totals = E.calculate_sections(frames)
+    for key, df in frames.items():
+        single, total = E.calculate_section(df)
+        assert totals[key] == pytest.approx(total)
+        pd.testing.assert_frame_equal(out[key], single)
+
+
+def test_score_records_matches_calculate_section():
+    df = mixed_section(300)
+    out, _ = E.calculate_section(df)
+    records = df[E.INPUT_COLUMNS].astype(object).where(df[E.INPUT_COLUMNS].notna(), None).to_dict("records")
+    active, values = E.score_records(records)
+    expected = out[E.COL_RESULT].to_numpy(dtype=float)
+    np.testing.assert_array_equal(active, ~np.isnan(expected))
+    np.testing.assert_allclose(values[E.COL_RESULT][active], expected[active], rtol=1e-12)
+
+
+def test_coerce_section_frame_keeps_unknown_values_as_categories():
+    df = pd.DataFrame({E.COL_CROP: ["Hedgerow", "Mystery tree"], E.COL_AREA: ["5", "x"]})
+    out = E.coerce_section_frame(df)
+    assert list(out.columns) == E.AGRI_COLUMNS
+    assert "Mystery tree" in out[E.COL_CROP].cat.categories
+    assert out[E.COL_AREA].dtype == np.float64
+    assert out[E.COL_AREA].isna().tolist() == [False, True]
+
+
+# --- INCREMENTAL UPDATES ---
+def assert_matches_full_run(df, total, snapshot):
+    full, full_total = E.calculate_section(df)
+    assert total == pytest.approx(full_total, rel=1e-9)
+    np.testing.assert_allclose(
+        snapshot["result"].to_numpy(), full[E.COL_RESULT].to_numpy(dtype=float), rtol=1e-12, equal_nan=True
+    )
+
+
+def test_update_section_matches_full_recompute_after_edits():
+    df = mixed_section(400)
+    out, total, snapshot, n_changed = E.update_section(df)
+    assert n_changed == len(df)
+    assert_matches_full_run(out, total, snapshot)
+
+    # Edit some areas and options, add local values, delete rows and insert new ones
+    edited = out.copy()
+    edited.iloc[[3, 10, 50], edited.columns.get_loc(E.COL_AREA)] = [1.0, 0.0, 250.0]
+    edited.iloc[7, edited.columns.get_loc(E.COL_TILLAGE)] = "No tillage"
+    edited.iloc[20, edited.columns.get_loc(E.COL_LOC_SOIL)] = 42.0
+    edited = edited.drop(index=[5, 6, 100])
+    new_rows = out.iloc[[0, 1]].copy()
+    new_rows.index = [1000, 1001]
+    new_rows[E.COL_RESULT] = np.nan
+    edited = pd.concat([edited, new_rows])
+
+    out, total, snapshot, n_changed = E.update_section(edited, snapshot, total)
+    assert n_changed == 5 + 3 + 2
+    assert_matches_full_run(out, total, snapshot)
+
+
+def test_update_section_unchanged_table_is_not_recomputed():
+    out, total, snapshot, _ = E.update_section(mixed_section(100))
+    again, again_total, again_snapshot, n_changed = E.update_section(out, snapshot, total)
+    assert n_changed == 0
+    assert again_total == total
+    assert again_snapshot is snapshot
+
+
+def test_update_section_invalidated_row_loses_its_results():
+    out, total, snapshot, _ = E.update_section(benchmark.synthetic_section(20))
+    edited = out.copy()
+    edited.iloc[0, edited.columns.get_loc(E.COL_CROP)] = None
+    out, total, snapshot, _ = E.update_section(edited, snapshot, total)
+    assert np.isnan(out[E.COL_RESULT].iloc[0]) and np.isnan(out[E.COL_DEF_AGB].iloc[0])
+    assert_matches_full_run(out, total, snapshot)
+
+
+def test_recalculate_sections_in_chunks_matches_full_recompute():
+    frames = {key: mixed_section(250, seed=i) for i, key in enumerate(E.SECTIONS)}
+    result = E.recalculate_sections(frames, chunk_rows=60)
+    for key, df in frames.items():
+        out, total, snapshot = result[key]
+        assert_matches_full_run(out, total, snapshot)
+
+
+# --- ANNUAL PROJECTION ---
+def baseline_components(df, crop_data):
+    """Per-row (biomass, soil) tCO2e with the rules of baseline_calc."""
+    rows = df.astype(object).where(df.notna(), None).to_dict("records")
+    bio, soil = [], []
+    for row in rows:
+        crop, area = row.get(E.COL_CROP), float(row.get(E.COL_AREA) or 0)
+        if not (crop and area > 0):
+            bio.append(0.0)
+            soil.append(0.0)
+            continue
+        defaults = crop_data.get(crop, (0.0, 0.0, 0.0))
+        local = lambda col, default: float(row.get(col) or 0) or default
+        soil_imp = (local(E.COL_LOC_SOIL, defaults[2]) * local(E.COL_LOC_TILLAGE, E.RF_TILLAGE.get(row.get(E.COL_TILLAGE), 1.0))
+                    * local(E.COL_LOC_INPUT, E.RF_INPUT.get(row.get(E.COL_INPUT), 1.0))
+                    * local(E.COL_LOC_RESIDUE, E.RF_RESIDUE.get(row.get(E.COL_RESIDUE), 1.0)))
+        bio.append(area * (local(E.COL_LOC_AGB, defaults[0]) + local(E.COL_LOC_BGB, defaults[1])) * 3.664)
+        soil.append(area * soil_imp * 3.664)
+    return bio, soil
+
+
+def baseline_projection(df, impl_years, cap_years, crop_data, soil_divisor):
+    """Rows x years, one year at a time: hectares adopted in year k add their soil
+    change over years k .. k + divisor - 1."""
+    adopted = lambda y: 0.0 if y < 1 else (min(y / impl_years, 1.0) if impl_years else 1.0)
+    bio, soil = baseline_components(df, crop_data)
+    horizon = impl_years + cap_years
+    out = np.zeros((len(bio), horizon))
+    for i in range(len(bio)):
+        for year in range(1, horizon + 1):
+            soil_share = sum(adopted(k) - adopted(k - 1) for k in range(max(year - soil_divisor + 1, 1), year + 1))
+            out[i, year - 1] = bio[i] * adopted(year) + soil[i] * soil_share / soil_divisor
+    return out
+
+
+@pytest.mark.parametrize("impl_years, cap_years, soil_divisor", [(5, 10, 20), (5, 10, 3), (0, 6, 4), (4, 0, 2), (1, 1, 1)])
+def test_projection_matches_per_year_loop(impl_years, cap_years, soil_divisor):
+    crop_data = parameters.AGRI_CROP_DATA
+    df = mixed_section(150)
+    expected = baseline_projection(df, impl_years, cap_years, crop_data, soil_divisor)
+    rows = E.project_rows(df, impl_years, cap_years, crop_data, soil_divisor)
+    np.testing.assert_allclose(rows, expected, rtol=1e-12, atol=1e-9)
+
+    frames = {key: mixed_section(150, seed=i) for i, key in enumerate(E.SECTIONS)}
+    annual = E.project_sections(frames, impl_years, cap_years, crop_data, soil_divisor)
+    for key, values in annual.items():
+        reference = baseline_projection(frames[key], impl_years, cap_years, crop_data, soil_divisor).sum(axis=0)
+        np.testing.assert_allclose(values, reference, rtol=1e-9)
+
+
+def test_projection_profiles_and_horizon():
+    # Half the area in year 1, all of it from year 2; each half spreads its soil change over 2 years
+    p_bio, p_soil = E.year_profiles(2, 3, soil_divisor=2)
+    np.testing.assert_allclose(p_bio, [0.5, 1, 1, 1, 1])
+    np.testing.assert_allclose(p_soil, [0.25, 0.5, 0.25, 0, 0])
+    # No implementation years: everything is adopted in year 1
+    np.testing.assert_allclose(E.adoption_profile(0, 3), [1, 1, 1])
+    assert len(E.adoption_profile(0, 0)) == 0
+    assert E.project_rows(mixed_section(10), 0, 0).shape == (10, 0)
+    # A missing divisor uses the default
+    np.testing.assert_array_equal(E.year_profiles(3, 30, None)[1], E.year_profiles(3, 30)[1])
+
+
+def test_projection_components_go_through_the_cache(result_cache):
+    df = mixed_section(2000)
+    first = E.row_components(df)
+    assert result_cache.misses == 1
+    again = E.row_components(df)
+    assert result_cache.hits == 1
+    np.testing.assert_array_equal(again[0], first[0])
+    np.testing.assert_array_equal(again[1], first[1])
+
+    crop = df[E.COL_CROP].dropna().iloc[0]
+    changed = {**parameters.AGRI_CROP_DATA, crop: (9.0, 9.0, 9.0)}
+    E.row_components(df, changed)
+    assert result_cache.misses == 2
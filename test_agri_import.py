@@ -0,0 +1,104 @@
+# test_agri_import.py
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+import agri_engine
+import agri_import
+
+E = agri_engine
+I = agri_import
+
+
+def csv_file(text):
+    return io.BytesIO(text.encode())
+
+
+def xlsx_file(rows):
+    book = Workbook()
+    sheet = book.active
+    for row in rows:
+        sheet.append(list(row))
+    data = io.BytesIO()
+    book.save(data)
+    data.seek(0)
+    return data
+
+
+LINES = [
+    ("Crop", "Area (ha)", "Tillage", "Residue", "Local AGB", "Notes"),
+    ("Hedgerow", "10", "no tillage", "Retained", "", "first"),
+    ("Unknown tree", "5", "", "", "", ""),
+    ("Alley cropping", "lots", "Full tillage", "", "", ""),
+    ("", "", "", "", "", ""),
+    (" ", " ", "  ", "", " ", "only spaces"),
+    ("Hedgerow", "2.5", "Sideways", "Burned", "1.5", ""),
+    ("  alley CROPPING ", "7", "", "exported", "", ""),
+]
+
+
+def as_csv(lines):
+    return csv_file("\n".join(",".join(line) for line in lines) + "\n")
+
+
+@pytest.mark.parametrize("make, filename", [(as_csv, "table.csv"), (xlsx_file, "table.xlsx")])
+@pytest.mark.parametrize("chunk_rows", [1, 3, 100])
+def test_import_reports_issues_with_spreadsheet_rows(make, filename, chunk_rows):
+    df, issues, unmapped = I.import_table(make(LINES), filename, chunk_rows=chunk_rows)
+
+    assert unmapped == ["Notes"]
+    assert list(df.columns) == E.AGRI_COLUMNS
+    # Options are matched whatever their case and spacing
+    assert df[E.COL_CROP].astype(object).tolist() == ["Hedgerow", "Alley cropping"]
+    assert df[E.COL_TILLAGE].iloc[0] == "No tillage" and pd.isna(df[E.COL_TILLAGE].iloc[1])
+    assert df[E.COL_RESIDUE].astype(object).tolist() == ["Retained", "Exported"]
+    np.testing.assert_array_equal(df[E.COL_AREA].to_numpy(), [10.0, 7.0])
+    assert df[E.COL_LOC_AGB].isna().all()
+
+    # Blank and whitespace-only lines are skipped without a report
+    assert issues.sort_values("Row").values.tolist() == [
+        [3, E.COL_CROP, "Unknown tree", "Unknown value"],
+        [4, E.COL_AREA, "lots", "Not a number"],
+        [7, E.COL_TILLAGE, "Sideways", "Unknown value"],
+    ]
+
+
+def test_whitespace_only_csv_line_is_not_imported():
+    df, issues, _ = I.import_table(csv_file("Crop,Area\n , \nHedgerow,1\n,\n"), "t.csv")
+    assert len(df) == 1 and issues.empty
+
+
+def test_header_aliases_and_app_column_names():
+    headers = ["Perennial cropping system deployed", "hectares", "Input of organic materials", "Local soil carbon", "Residues"]
+    assert I.map_headers(headers) == {
+        0: E.COL_CROP, 1: E.COL_AREA, 2: E.COL_INPUT, 3: E.COL_LOC_SOIL, 4: E.COL_RESIDUE
+    }
+    # The first of two columns mapping to the same input wins; computed columns are not imported
+    assert I.map_headers(["Crop", "System", E.COL_RESULT]) == {0: E.COL_CROP}
+
+
+def test_crop_list_limits_the_accepted_crops():
+    df, issues, _ = I.import_table(csv_file("Crop,Area\nHedgerow,1\nAlley cropping,2\n"), "t.csv", crop_list=["Hedgerow"])
+    assert df[E.COL_CROP].astype(object).tolist() == ["Hedgerow"]
+    assert issues["Row"].tolist() == [3]
+
+
+@pytest.mark.parametrize("make, filename", [(as_csv, "t.csv"), (xlsx_file, "t.xlsx")])
+def test_header_only_and_empty_files(make, filename):
+    with pytest.raises(ValueError, match=I.NO_DATA_ROWS):
+        I.import_table(make([("Crop", "Area")]), filename)
+    with pytest.raises(ValueError, match="No crop column"):
+        I.import_table(make([("Area", "Tillage"), ("1", "x")]), filename)
+    with pytest.raises(ValueError, match=I.NO_DATA_ROWS):
+        I.import_table(csv_file(""), "t.csv")
+
+
+def test_progress_reaches_all_rows():
+    lines = [("Crop", "Area")] + [("Hedgerow", str(i)) for i in range(1, 26)]
+    calls = []
+    df, _, _ = I.import_table(as_csv(lines), "t.csv", chunk_rows=10, progress=lambda done, fraction: calls.append(done))
+    assert len(df) == 25
+    assert calls == [10, 20, 25]
@@ -0,0 +1,63 @@
+# test_agri_scenarios.py
+import itertools
+
+import numpy as np
+import pytest
+
+import agri_engine
+import agri_scenarios
+from test_agri_engine import mixed_section
+
+E = agri_engine
+S = agri_scenarios
+
+
+def frames(n_rows=200):
+    return {key: mixed_section(n_rows, seed=i) for i, key in enumerate(E.SECTIONS)}
+
+
+def recompute(data, tillage, c_input, residue, crops=None):
+    """Set the options on the selected rows of every table and run calculate_section."""
+    total = 0.0
+    for df in data.values():
+        df = df.astype({E.COL_TILLAGE: object, E.COL_INPUT: object, E.COL_RESIDUE: object}).copy()
+        selected = df.index if crops is None else df.index[df[E.COL_CROP].isin(crops)]
+        df.loc[selected, [E.COL_TILLAGE, E.COL_INPUT, E.COL_RESIDUE]] = [tillage, c_input, residue]
+        total += E.calculate_section(df)[1]
+    return total
+
+
+def lookup(table, tillage, c_input, residue):
+    row = table[(table["Tillage"] == tillage) & (table["Input"] == c_input) & (table["Residue"] == residue)]
+    assert len(row) == 1
+    return row["Total (tCO2e)"].iloc[0]
+
+
+def test_sweep_matches_per_option_recomputation():
+    data = frames()
+    # Local removal factors on some rows must still override the swept options
+    data["3_1"][E.COL_LOC_INPUT] = np.where(np.arange(len(data["3_1"])) % 5 == 0, 1.3, np.nan)
+    table, current = S.sweep(data)
+
+    assert len(table) == len(E.RF_TILLAGE) * len(E.RF_INPUT) * len(E.RF_RESIDUE)
+    assert current == pytest.approx(sum(E.calculate_section(df)[1] for df in data.values()), rel=1e-9)
+    for combo in itertools.product(E.RF_TILLAGE, E.RF_INPUT, E.RF_RESIDUE):
+        assert lookup(table, *combo) == pytest.approx(recompute(data, *combo), rel=1e-9)
+
+
+def test_sweep_crop_subset_and_option_subset():
+    data = frames()
+    crops = data["3_1"][E.COL_CROP].dropna().astype(object).unique()[:3].tolist()
+    options = {"Tillage": ["No tillage"], "Input": ["Low C input", "High C input, with manure"]}
+    table, _ = S.sweep(data, options=options, crops=crops)
+
+    assert len(table) == 1 * 2 * len(E.RF_RESIDUE)
+    for combo in itertools.product(options["Tillage"], options["Input"], E.RF_RESIDUE):
+        assert lookup(table, *combo) == pytest.approx(recompute(data, *combo, crops=crops), rel=1e-9)
+
+
+def test_table_is_ranked_by_total():
+    table, current = S.sweep(frames(50))
+    assert table["Rank"].tolist() == list(range(1, len(table) + 1))
+    assert table["Total (tCO2e)"].is_monotonic_decreasing
+    np.testing.assert_allclose(table["Change vs current (tCO2e)"], table["Total (tCO2e)"] - current)
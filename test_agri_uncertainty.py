@@ -0,0 +1,61 @@
+# test_agri_uncertainty.py
+import numpy as np
+import pytest
+
+import agri_engine
+import agri_uncertainty
+from test_agri_engine import mixed_section
+
+E = agri_engine
+U = agri_uncertainty
+
+
+def frames(n_rows=300):
+    return {key: mixed_section(n_rows, seed=i) for i, key in enumerate(E.SECTIONS)}
+
+
+def test_zero_spread_equals_point_estimate():
+    data = frames()
+    fixed = {name: ("normal", 0.0) for name in U.FACTOR_COLUMNS}
+    samples = U.simulate(data, draws=50, distributions=fixed)
+    for key, df in data.items():
+        _, total = E.calculate_section(df)
+        np.testing.assert_allclose(samples[key], total, rtol=1e-9)
+    expected = sum(E.calculate_section(df)[1] for df in data.values())
+    np.testing.assert_allclose(samples["total"], expected, rtol=1e-9)
+
+
+def test_small_chunks_match_one_block():
+    data = frames(200)
+    whole = U.simulate(data, draws=200, seed=7)
+    chunked = U.simulate(data, draws=200, seed=7, chunk_bytes=8 * 200 * 3)
+    for key in whole:
+        np.testing.assert_allclose(chunked[key], whole[key], rtol=1e-12)
+
+
+def test_same_seed_gives_same_draws():
+    data = frames(100)
+    first = U.simulate(data, draws=500, seed=3)
+    again = U.simulate(data, draws=500, seed=3)
+    other = U.simulate(data, draws=500, seed=4)
+    np.testing.assert_array_equal(first["total"], again["total"])
+    assert not np.array_equal(first["total"], other["total"])
+
+
+def test_mean_stays_near_point_estimate():
+    data = frames(200)
+    samples = U.simulate(data, draws=20_000, seed=1)
+    expected = sum(E.calculate_section(df)[1] for df in data.values())
+    assert samples["total"].mean() == pytest.approx(expected, rel=0.02)
+
+
+def test_unknown_distribution_is_rejected():
+    with pytest.raises(ValueError):
+        U.sample_multipliers("cauchy", 0.1, 5, np.random.default_rng(0))
+
+
+def test_percentile_table_has_one_row_per_series():
+    samples = U.simulate(frames(50), draws=100)
+    table = U.percentile_table(samples)
+    assert len(table) == len(samples)
+    assert list(table.columns[:3]) == ["Section", "Mean", "Std"]
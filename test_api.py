@@ -0,0 +1,138 @@
+# test_api.py
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+
+import numpy as np
+import pytest
+
+import agri_engine
+import api
+import parameters
+from test_agri_engine import mixed_section
+
+E = agri_engine
+
+
+@pytest.fixture
+def server():
+    # A longer batch window so that concurrent requests share batches
+    server = api.make_server(port=0, window=0.05)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, payload, path="/score"):
+    conn = HTTPConnection(*server.server_address, timeout=10)
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    conn.request("POST", path, body, {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    result = response.status, json.loads(response.read())
+    conn.close()
+    return result
+
+
+def records(n_rows=200, seed=0):
+    df = mixed_section(n_rows, seed=seed)[E.INPUT_COLUMNS]
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def test_score_matches_score_records(server):
+    rows = records()
+    status, payload = post(server, {"country": "Gabon", "rows": rows, "detail": True})
+    assert status == 200
+
+    crop_data = parameters.get_agri_params("Gabon")["agb_bgb_soil"]
+    active, values = E.score_records(rows, crop_data)
+    expected = np.where(active, values[E.COL_RESULT], np.nan)
+    got = np.array([np.nan if v is None else v for v in payload["results"]])
+    np.testing.assert_allclose(got, expected, rtol=1e-12, equal_nan=True)
+    assert payload["total"] == pytest.approx(np.nansum(expected), rel=1e-12)
+    assert [d is not None for d in payload["defaults"]] == active.tolist()
+
+
+def test_short_headers_are_accepted(server):
+    status, payload = post(server, {"rows": [{"crop": "Hedgerow", "area": 10}, {"crop": "Hedgerow", "area": 0}]})
+    assert status == 200
+    assert payload["results"][0] > 0 and payload["results"][1] is None
+
+
+def test_concurrent_requests_get_their_own_results(server):
+    bodies = [{"country": country, "rows": records(50, seed=i)} for i, country in enumerate(["Gabon", "Cameroon", None] * 4)]
+    with ThreadPoolExecutor(len(bodies)) as pool:
+        responses = list(pool.map(lambda body: post(server, body), bodies))
+    for body, (status, payload) in zip(bodies, responses):
+        crop_data = parameters.get_agri_params(body["country"])["agb_bgb_soil"]
+        active, values = E.score_records(body["rows"], crop_data)
+        assert status == 200
+        assert payload["total"] == pytest.approx(float(np.nansum(np.where(active, values[E.COL_RESULT], np.nan))))
+
+
+@pytest.mark.parametrize("payload, message", [
+    (b"{not json", "Invalid JSON"),
+    ([1, 2], "JSON object"),
+    ({"rows": {"crop": "Hedgerow"}}, "list of objects"),
+    ({"country": ["Gabon"], "rows": []}, "'country' must be a string"),
+    ({"soil_type": 3, "rows": []}, "'soil_type' must be a string")
+])
+def test_bad_requests_return_400(server, payload, message):
+    status, body = post(server, payload)
+    assert status == 400
+    assert message in body["error"]
+
+
+@pytest.mark.parametrize("row, column", [
+    ({"crop": "Hedgerow", "area": 1, "tillage": ["x"]}, "Tillage"),
+    ({"crop": 5, "area": 1}, "Perennial cropping system"),
+    ({"crop": "Hedgerow", "area": "10"}, "Area"),
+    ({"crop": "Hedgerow", "area": True}, "Area"),
+    ({"crop": "Hedgerow", "area": 1, "local agb": {"v": 1}}, "Above-ground")
+])
+def test_rows_with_bad_types_are_rejected(row, column):
+    with pytest.raises(ValueError, match=f"Row 1: '[^']*{column}"):
+        api.parse_rows([{"crop": "Hedgerow", "area": 2.5, "tillage": None}, row])
+
+
+def test_bad_request_does_not_fail_its_batch(server):
+    bad = {"country": "Gabon", "rows": [{"crop": "Hedgerow", "area": 1, "tillage": ["x"]}]}
+    bodies = [bad if i == 3 else {"country": "Gabon", "rows": records(20, seed=i)} for i in range(8)]
+    with ThreadPoolExecutor(len(bodies)) as pool:
+        responses = list(pool.map(lambda body: post(server, body), bodies))
+    for body, (status, payload) in zip(bodies, responses):
+        if body is bad:
+            assert status == 400 and "must be a string" in payload["error"]
+        else:
+            assert status == 200 and len(payload["results"]) == 20
+
+
+def test_failing_site_group_only_fails_its_requests(server, monkeypatch):
+    get_agri_params = parameters.get_agri_params
+
+    def failing(country, *args):
+        if country == "Nowhere":
+            raise RuntimeError("no parameters")
+        return get_agri_params(country, *args)
+    monkeypatch.setattr(parameters, "get_agri_params", failing)
+
+    bodies = [{"country": "Nowhere" if i % 4 == 0 else "Gabon", "rows": records(20, seed=i)} for i in range(8)]
+    with ThreadPoolExecutor(len(bodies)) as pool:
+        responses = list(pool.map(lambda body: post(server, body), bodies))
+    for body, (status, payload) in zip(bodies, responses):
+        if body["country"] == "Nowhere":
+            assert status == 500 and "no parameters" in payload["error"]
+        else:
+            assert status == 200 and len(payload["results"]) == 20
+
+
+def test_unknown_endpoint_and_metrics(server):
+    assert post(server, {}, "/nothing")[0] == 404
+    post(server, {"rows": records(10)})
+    conn = HTTPConnection(*server.server_address, timeout=10)
+    conn.request("GET", "/metrics")
+    metrics = json.loads(conn.getresponse().read())
+    conn.close()
+    assert metrics["requests"]["/score"] == 1
+    assert metrics["rows_scored"] == 10
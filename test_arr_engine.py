@@ -0,0 +1,132 @@
+# test_arr_engine.py
+import io
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import arr_engine
+import parameters
+import project_store
+import snapshot
+from agri_engine import C_TO_CO2
+
+A = arr_engine
+SYSTEM_DATA = pd.DataFrame(parameters.ARR_SYSTEM_DATA).set_index("System")
+
+
+def cohorts(n_rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        A.COL_LABEL: [f"c{i}" for i in range(n_rows)],
+        A.COL_SYSTEM: rng.choice(A.SYSTEMS + ["Unknown system"], n_rows),
+        A.COL_PLANTING_YEAR: rng.integers(-5, 25, n_rows).astype(float),
+        A.COL_AREA: rng.uniform(0, 200, n_rows),
+        A.COL_AGB_MAX: np.where(rng.random(n_rows) < 0.2, rng.uniform(50, 300, n_rows), np.nan),
+        A.COL_GROWTH_RATE: np.where(rng.random(n_rows) < 0.2, rng.uniform(0.02, 0.3, n_rows), np.nan)
+    })
+    df.loc[rng.random(n_rows) < 0.1, A.COL_PLANTING_YEAR] = np.nan
+    df.loc[rng.random(n_rows) < 0.05, A.COL_AREA] = 0.0
+    return df
+
+
+def scalar_stock(row, year, c_fraction):
+    """tC of one cohort at the end of a project year, one value at a time."""
+    system = SYSTEM_DATA.loc[row[A.COL_SYSTEM]]
+    planted = 1.0 if pd.isna(row[A.COL_PLANTING_YEAR]) else math.floor(row[A.COL_PLANTING_YEAR])
+    agb_max = system["AGB max (t d.m./ha)"] if pd.isna(row[A.COL_AGB_MAX]) else row[A.COL_AGB_MAX]
+    rate = system["Growth rate k (1/year)"] if pd.isna(row[A.COL_GROWTH_RATE]) else row[A.COL_GROWTH_RATE]
+    age = max(year - (planted - 1), 0)
+    agb = agb_max * (1 - math.exp(-rate * age)) ** system["Shape p"]
+    return agb * (1 + system["Root-to-shoot ratio"]) * c_fraction * row[A.COL_AREA]
+
+
+# --- GROWTH ---
+def test_stocks_match_scalar_growth_curve():
+    df = cohorts(100)
+    df = df[df[A.COL_SYSTEM].isin(A.SYSTEMS)].reset_index(drop=True)
+    horizon, c_fraction = 30, 0.5
+    stocks = A.carbon_stocks(A.coerce_cohort_frame(df), horizon, c_fraction)
+    assert stocks.shape == (len(df), horizon + 1)
+    for i, row in df.iterrows():
+        expected = [scalar_stock(row, year, c_fraction) for year in range(horizon + 1)]
+        np.testing.assert_allclose(stocks[i], expected, rtol=1e-12, atol=1e-12)
+
+
+def test_removals_and_annual_totals_match_scalar_loop():
+    df = cohorts()
+    horizon = 20
+    c_fraction = parameters.CARBON_FRACTION_DEFAULT
+    out, total, annual = A.calculate_cohorts(df, horizon)
+
+    expected_total = 0.0
+    for i, row in df.iterrows():
+        if row[A.COL_SYSTEM] not in A.SYSTEMS or not row[A.COL_AREA] > 0:
+            assert np.isnan(out[A.COL_RESULT].iloc[i])
+            continue
+        removal = (scalar_stock(row, horizon, c_fraction) - scalar_stock(row, 0, c_fraction)) * C_TO_CO2
+        assert out[A.COL_RESULT].iloc[i] == pytest.approx(removal, rel=1e-12, abs=1e-9)
+        expected_total += removal
+    assert total == pytest.approx(expected_total, rel=1e-12)
+
+    # Annual removals per activity add up to the total
+    assert set(annual) == set(A.ACTIVITIES)
+    assert all(len(values) == horizon for values in annual.values())
+    assert sum(values.sum() for values in annual.values()) == pytest.approx(total, rel=1e-9)
+
+
+def test_loose_system_names_and_carbon_fraction():
+    df = pd.DataFrame({A.COL_SYSTEM: [A.SYSTEMS[0].upper() + "  ", "nothing"], A.COL_AREA: [10.0, 10.0]})
+    out = A.coerce_cohort_frame(df)
+    assert out[A.COL_SYSTEM].tolist()[0] == A.SYSTEMS[0]
+    assert pd.isna(out[A.COL_SYSTEM].iloc[1])
+    assert A.carbon_fraction("0.5") == 0.5
+    for value in (None, "", "abc", 0, 1.5):
+        assert A.carbon_fraction(value) == parameters.CARBON_FRACTION_DEFAULT
+
+
+def test_empty_table_and_zero_horizon():
+    out, total, annual = A.calculate_cohorts(A.empty_cohort_frame(), 10)
+    assert out.empty and total == 0.0
+    assert all(len(values) == 10 and not values.any() for values in annual.values())
+    _, total, _ = A.calculate_cohorts(cohorts(20), 0)
+    assert total == 0.0
+
+
+# --- IMPORT ---
+def test_read_cohorts_reports_unknown_systems_and_bad_numbers():
+    csv = (
+        "Cohort,System,Year,Area (ha),Notes\n"
+        f"a,{A.SYSTEMS[0]},1,10,x\n"
+        "b,Palm oil,2,5,\n"
+        f"c,{A.SYSTEMS[1]},two,7,\n"
+        ",,,,\n"
+        " , ,  , ,\n"
+        f"d,{A.SYSTEMS[1]},3,,\n"
+    )
+    df, issues, unmapped, rows_read = A.read_cohorts(io.BytesIO(csv.encode()), "cohorts.csv", chunk_rows=2)
+    assert rows_read == 6
+    assert unmapped == ["Notes"]
+    assert df[A.COL_LABEL].tolist() == ["a", "d"]
+    assert issues[["Row", "Column", "Value", "Problem"]].values.tolist() == [
+        [3, A.COL_SYSTEM, "Palm oil", "Unknown system"],
+        [4, A.COL_PLANTING_YEAR, "two", "Not a number"]
+    ]
+
+
+def test_read_cohorts_needs_system_and_area():
+    with pytest.raises(ValueError, match="'System' and an 'Area"):
+        A.read_cohorts(io.BytesIO(b"Cohort,Year\na,1\n"), "cohorts.csv")
+
+
+# --- PERSISTENCE (project_store.FRAME_TABLES) ---
+def test_cohorts_round_trip_through_store_and_snapshot(tmp_path):
+    table = A.calculate_cohorts(cohorts(80), 15)[0]
+    store = project_store.ProjectStore(str(tmp_path / "projects.db"), pool_size=1)
+    store.save_project("p1", tables={"arr_cohorts": table})
+    loaded = store.load_project("p1")[2]["arr_cohorts"]
+    store.pool.close()
+    snap = snapshot.open_snapshot(snapshot.dumps({}, {"arr_cohorts": table})).table("arr_cohorts")
+    for restored in (loaded, snap):
+        pd.testing.assert_frame_equal(restored, table)
@@ -0,0 +1,144 @@
+# test_build_params.py
+import json
+
+import pandas as pd
+import pytest
+
+import build_params
+import parameters
+
+B = build_params
+CROP = next(iter(parameters.AGRI_CROP_DATA))
+BUILTIN = tuple(parameters.AGRI_CROP_DATA[CROP][:3])
+
+
+def row(agb, **site):
+    """One source row for CROP; site: region, country, climate, moisture, soil_type."""
+    return dict({dim: site.get(dim) for dim in B.DIMENSIONS}, crop=CROP, rank=site.pop("rank", 1), agb=agb, bgb=None, soil=None)
+
+
+def store_of(rows, tmp_path):
+    path = tmp_path / "params.json"
+    path.write_text(json.dumps(B.compile_params(B.builtin_rows() + rows)))
+    return parameters.load_param_store(str(path))
+
+
+def agb(store, *site, **named):
+    return store.crop_data(*site, **named)[CROP][0]
+
+
+# --- PRECEDENCE ---
+def test_more_specific_rows_win(tmp_path):
+    store = store_of([
+        row(1.0, climate="Tropical lowland"),
+        row(2.0, moisture="Wet"),
+        row(3.0, soil_type="Clay soils"),
+        row(4.0, region="Central Africa"),
+        row(5.0, country="Gabon"),
+    ], tmp_path)
+    assert agb(store, "Gabon", "Tropical lowland", "Wet", "Clay soils") == 5.0
+    assert agb(store, "Cameroon", "Tropical lowland", "Wet", "Clay soils") == 4.0
+    assert agb(store, "Brazil", "Tropical lowland", "Wet", "Clay soils") == 3.0
+    assert agb(store, "Brazil", "Tropical lowland", "Wet") == 2.0
+    assert agb(store, "Brazil", "Tropical lowland") == 1.0
+    assert agb(store, "Brazil") == BUILTIN[0]
+
+
+def test_later_sources_win_ties_and_missing_factors_fall_through(tmp_path):
+    store = store_of([row(1.0, country="Gabon", rank=1), row(2.0, country="Gabon", rank=2)], tmp_path)
+    table = store.crop_data("Gabon")
+    assert table[CROP][0] == 2.0
+    # The rows only gave AGB: BGB and soil keep the built-in values
+    assert tuple(table[CROP][1:]) == BUILTIN[1:]
+
+
+def test_region_without_country_uses_region_rows(tmp_path):
+    store = store_of([row(4.0, region="Central Africa"), row(6.0, region="Central Africa", moisture="Dry")], tmp_path)
+    assert agb(store, region="Central Africa") == 4.0
+    assert agb(store, moisture="Dry", region="Central Africa") == 6.0
+    # A country decides its own region; unknown regions fall back to the global table
+    assert agb(store, "Brazil", region="Central Africa") == BUILTIN[0]
+    assert agb(store, region="Atlantis") == BUILTIN[0]
+    assert store.key(region="Atlantis", climate="Nowhere") == (None,) * 5
+
+
+def test_rows_with_new_sites_extend_the_lists(tmp_path):
+    store = store_of([row(7.0, region="West Africa", country="Ghana", soil_type="Laterite")], tmp_path)
+    assert store.region_of["Ghana"] == "West Africa"
+    assert "Laterite" in store.soil_types
+    assert agb(store, "Ghana", soil_type="Laterite") == 7.0
+    assert agb(store, "Ghana") == BUILTIN[0]
+
+
+def test_source_headers_and_any_cells():
+    df = pd.DataFrame({
+        "Region": ["*", "Central Africa"], "Soil type (IPCC)": [None, "Clay soils"],
+        "Agroforestry system": [CROP, ""], "AGB (tC/ha/yr)": ["2.5", 1.0], "SOC": [None, None]
+    })
+    rows = B.source_rows(df, rank=2)
+    assert len(rows) == 1
+    assert rows[0]["region"] is None and rows[0]["agb"] == 2.5 and rows[0]["soil"] is None
+    assert B.source_rows(pd.DataFrame({"AGB": [1.0]}), rank=1) == []
+
+
+# --- BUILD ---
+def test_build_only_when_sources_change(tmp_path):
+    csv, out = tmp_path / "defaults.csv", tmp_path / "params.json"
+    pd.DataFrame({"Country": ["Gabon"], "Crop": [CROP], "AGB": [9.0]}).to_csv(csv, index=False)
+    xlsx = tmp_path / "missing.xlsx"
+
+    assert B.build(str(xlsx), str(csv), str(out)) is True
+    assert B.build(str(xlsx), str(csv), str(out)) is False
+    assert B.build(str(xlsx), str(csv), str(out), force=True) is True
+    assert agb(parameters.load_param_store(str(out)), "Gabon") == 9.0
+
+    pd.DataFrame({"Country": ["Gabon"], "Crop": [CROP], "AGB": [8.0]}).to_csv(csv, index=False)
+    assert B.build(str(xlsx), str(csv), str(out)) is True
+    store = parameters.load_param_store(str(out))
+    assert agb(store, "Gabon") == 8.0 and store.source == str(out)
+
+
+def test_workbook_sheets_outrank_the_csv(tmp_path):
+    csv, xlsx, out = tmp_path / "d.csv", tmp_path / "p.xlsx", tmp_path / "params.json"
+    pd.DataFrame({"Country": ["Gabon"], "Crop": [CROP], "AGB": [1.0]}).to_csv(csv, index=False)
+    with pd.ExcelWriter(xlsx) as writer:
+        pd.DataFrame({"Country": ["Gabon"], "Crop": [CROP], "AGB": [2.0]}).to_excel(writer, sheet_name="A", index=False)
+        pd.DataFrame({"Region": ["Southeast Asia"], "Crop": [CROP], "BGB": [3.0]}).to_excel(writer, sheet_name="B", index=False)
+    B.build(str(xlsx), str(csv), str(out))
+    store = parameters.load_param_store(str(out))
+    assert agb(store, "Gabon") == 2.0
+    assert store.crop_data("Indonesia")[CROP][1] == 3.0
+
+
+# --- LOADING ---
+def test_missing_artifact_uses_builtin_tables(tmp_path):
+    store = parameters.load_param_store(str(tmp_path / "none.json"))
+    assert store.crop_data("Gabon", "Tropical lowland") is parameters.AGRI_CROP_DATA
+    assert store.regions == parameters.REGIONS
+
+
+def test_builder_1_artifacts_still_load(tmp_path):
+    # Index keys without the region part, as the first builder wrote them
+    gabon = {CROP: [5.0, 0.0, 0.0]}
+    artifact = {
+        "builder": 1, "regions": parameters.REGIONS, "climates": parameters.CLIMATES,
+        "moistures": parameters.MOISTURES, "soil_types": parameters.SOIL_TYPES,
+        "tables": [parameters.AGRI_CROP_DATA, gabon], "index": {"||||": 0, "Gabon|||": 1, "Gabon||Wet|": 1}
+    }
+    path = tmp_path / "old.json"
+    path.write_text(json.dumps(artifact))
+    store = parameters.load_param_store(str(path))
+    assert agb(store, "Gabon", moisture="Wet") == 5.0
+    assert agb(store, region="Central Africa") == BUILTIN[0]
+    # Sites the old index lacks fall back to the global table of the same site
+    assert agb(store, "Cameroon", moisture="Wet") == BUILTIN[0]
+
+
+@pytest.fixture
+def shared_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(parameters, "_shared", store_of([row(4.0, region="Central Africa")], tmp_path))
+
+
+def test_site_params_pass_the_region(shared_store):
+    assert parameters.site_params({"gi_region": "Central Africa"})["agb_bgb_soil"][CROP][0] == 4.0
+    assert parameters.site_params({"gi_region": None})["agb_bgb_soil"][CROP][0] == BUILTIN[0]
@@ -0,0 +1,86 @@
+# test_calc_cache.py
+import os
+
+import numpy as np
+import pandas as pd
+
+import agri_engine
+import calc_cache
+import parameters
+from test_agri_engine import mixed_section
+
+E = agri_engine
+
+
+def test_cache_hit_returns_the_same_result(result_cache):
+    df = mixed_section(calc_cache.MIN_ROWS + 200)
+    first, first_total = E.calculate_section(df)
+    assert (result_cache.hits, result_cache.misses) == (0, 1)
+
+    again, again_total = E.calculate_section(df)
+    assert result_cache.hits == 1
+    assert again_total == first_total
+    pd.testing.assert_frame_equal(again, first)
+
+
+def test_small_tables_skip_the_cache(result_cache):
+    E.calculate_section(mixed_section(calc_cache.MIN_ROWS - 1))
+    assert (result_cache.hits, result_cache.misses) == (0, 0)
+
+
+def test_parameter_change_misses_and_recomputes(result_cache, monkeypatch):
+    df = mixed_section(calc_cache.MIN_ROWS)
+    crop_data = dict(parameters.AGRI_CROP_DATA)
+    _, total = E.calculate_section(df, crop_data)
+
+    crop = df[E.COL_CROP].dropna().iloc[0]
+    changed = {**crop_data, crop: tuple(v * 2 for v in crop_data[crop])}
+    assert E.parameter_token(changed) != E.parameter_token(crop_data)
+
+    out, changed_total = E.calculate_section(df, changed)
+    assert result_cache.hits == 0 and result_cache.misses == 2
+    assert changed_total != total
+    # Reference run without the cache
+    monkeypatch.setattr(calc_cache, "ENABLED", False)
+    reference, reference_total = E.calculate_section(df, changed)
+    assert changed_total == reference_total
+    pd.testing.assert_frame_equal(out, reference)
+
+
+def test_edited_rows_give_a_new_key(result_cache):
+    df = mixed_section(calc_cache.MIN_ROWS)
+    E.calculate_section(df)
+    edited = df.copy()
+    edited.iloc[0, edited.columns.get_loc(E.COL_AREA)] = 123.0
+    E.calculate_section(edited)
+    assert result_cache.hits == 0 and result_cache.misses == 2
+
+
+def test_truncated_entry_is_a_miss(result_cache):
+    key = calc_cache.key("test", "p", np.arange(5, dtype=np.uint64))
+    result_cache.put(key, np.ones((5, 3)))
+    with open(result_cache._path(key), "wb") as f:
+        f.write(b"\x93NUMPY")
+    assert result_cache.get(key) is None
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    matrix = np.ones((1000, 10))  # ~80 kB per entry
+    cache = calc_cache.ResultCache(str(tmp_path / "evict"), max_bytes=5 * matrix.nbytes)
+    keys = [calc_cache.key("test", "p", np.array([i], dtype=np.uint64)) for i in range(8)]
+    for i, key in enumerate(keys):
+        cache.put(key, matrix)
+        # Distinct mtimes, oldest first; the first entry is then used again
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+        if i == 0:
+            os.utime(cache._path(key), (2000, 2000))
+
+    assert cache.size() <= cache.max_bytes
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[-1]) is not None
+
+
+def test_disabled_cache(monkeypatch):
+    monkeypatch.setattr(calc_cache, "ENABLED", False)
+    assert calc_cache.get_cache() is None
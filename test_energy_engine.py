@@ -0,0 +1,143 @@
+# test_energy_engine.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import energy_engine
+import ledger
+import parameters
+import project_store
+import snapshot
+
+N = energy_engine
+GWP = ledger.gwp_vector()
+COOKSTOVE_EF = {
+    fuel: {gas: parameters.EF_COOKSTOVES_DATA[gas][i] for gas in ("CO2", "CH4", "NMVOCs", "CO")}
+    for i, fuel in enumerate(N.FUELS)
+}
+WEIGHT = {"CO2": GWP[ledger.GAS_INDEX["CO2"]], "CH4": GWP[ledger.GAS_INDEX["CH4"]],
+          "NMVOCs": GWP[ledger.GAS_INDEX["NMVOC"]], "CO": GWP[ledger.GAS_INDEX["CO"]]}
+
+
+def cookstoves():
+    return pd.DataFrame({
+        N.COL_LABEL: ["a", "b", "c", "d"],
+        N.COL_HOUSEHOLDS: [100, 250, np.nan, 40],
+        N.COL_FUEL: ["Wood", "Charcoal", "Wood", "Unknown fuel"],
+        N.COL_FUEL_USE: [np.nan, 3.0, 2.0, 1.0],
+        N.COL_SAVINGS: [40, 25, 50, 50],
+        N.COL_NRB: [np.nan, 60, 100, 100]
+    })
+
+
+def substitution():
+    return pd.DataFrame({
+        N.COL_LABEL: ["lpg", "electric", "none"],
+        N.COL_HOUSEHOLDS: [100, 50, 10],
+        N.COL_FUEL: ["Wood", "Charcoal", "Wood"],
+        N.COL_FUEL_USE: [2.0, np.nan, 2.0],
+        N.COL_SUBSTITUTE: ["LPG", N.ELECTRIC, None],
+        N.COL_NRB: [80, np.nan, 100]
+    })
+
+
+def stove_tco2e(fuel, fuel_kg, nrb):
+    ef = COOKSTOVE_EF[fuel]
+    return fuel_kg * sum(ef[gas] * WEIGHT[gas] * (nrb if gas == "CO2" else 1.0) for gas in ef) / 1e6
+
+
+# --- CALCULATION ---
+def test_cookstoves_match_hand_formula():
+    out, total, book = N.calculate_activity(cookstoves(), "cookstoves")
+    default_use = N.FUEL_USE_DEFAULT["Wood"]
+    expected = [
+        stove_tco2e("Wood", 100 * default_use * 1000 * 0.40, 1.0),
+        stove_tco2e("Charcoal", 250 * 3.0 * 1000 * 0.25, 0.6),
+    ]
+    np.testing.assert_allclose(out[N.COL_RESULT].iloc[:2], expected, rtol=1e-12)
+    # No households and unknown fuels are inactive
+    assert out[N.COL_RESULT].iloc[2:].isna().all()
+    assert total == pytest.approx(sum(expected), rel=1e-12)
+    assert len(book) == 4
+
+
+def test_charcoal_matches_hand_formula():
+    df = pd.DataFrame({N.COL_LABEL: ["k"], N.COL_CHARCOAL: [20.0], N.COL_KILN_REDUCTION: [30.0]})
+    out, total, _ = N.calculate_activity(df, "charcoal")
+    ef = {gas: parameters.EF_CHARCOAL_DATA[gas][0] for gas in ("CO2", "CH4")}
+    expected = 20.0 * 1000 * 0.30 * (ef["CO2"] * WEIGHT["CO2"] + ef["CH4"] * WEIGHT["CH4"]) / 1e6
+    assert total == pytest.approx(expected, rel=1e-12)
+    assert out[N.COL_RESULT].iloc[0] == pytest.approx(expected, rel=1e-12)
+
+
+def test_substitution_uses_country_grid_intensity():
+    country = "Gabon"
+    out, total, _ = N.calculate_activity(substitution(), "substitution", country)
+    n2o = GWP[ledger.GAS_INDEX["N2O"]]
+
+    def project(fuel_kg, co2_kg_mwh, ch4, n2o_g):
+        mwh = fuel_kg * N.MWH_PER_KG
+        return mwh * (co2_kg_mwh * 1000 * WEIGHT["CO2"] + ch4 * WEIGHT["CH4"] + n2o_g * n2o) / 1e6
+
+    lpg = parameters.EF_SUBSTITUTION_DATA["Fuel"].index("LPG")
+    lpg_kg = 100 * 2.0 * 1000
+    expected_lpg = stove_tco2e("Wood", lpg_kg, 0.8) - project(
+        lpg_kg, parameters.EF_SUBSTITUTION_DATA["CO2 [kg/MWh]"][lpg],
+        parameters.EF_SUBSTITUTION_DATA["CH4 [g/MWh]"][lpg], parameters.EF_SUBSTITUTION_DATA["N2O [g/MWh]"][lpg]
+    )
+    electric_kg = 50 * N.FUEL_USE_DEFAULT["Charcoal"] * 1000
+    expected_electric = stove_tco2e("Charcoal", electric_kg, 1.0) - project(electric_kg, N.grid_intensity(country), 0.0, 0.0)
+
+    np.testing.assert_allclose(out[N.COL_RESULT].iloc[:2], [expected_lpg, expected_electric], rtol=1e-12)
+    assert np.isnan(out[N.COL_RESULT].iloc[2])
+    assert total == pytest.approx(expected_lpg + expected_electric, rel=1e-12)
+
+
+def test_calculate_energy_matches_per_activity_runs():
+    frames = {"cookstoves": cookstoves(), "substitution": substitution()}
+    out, totals, ledgers = N.calculate_energy(frames, "Cameroon")
+    for activity, df in frames.items():
+        single, total, _ = N.calculate_activity(df, activity, "Cameroon")
+        pd.testing.assert_frame_equal(out[activity], single)
+        assert totals[activity] == pytest.approx(total)
+        assert ledgers[activity].total(GWP) == pytest.approx(total)
+
+
+def test_coerce_activity_frame_drops_unknown_options():
+    out = N.coerce_activity_frame(cookstoves(), "cookstoves")
+    assert list(out.columns) == N.ACTIVITY_COLUMNS["cookstoves"]
+    assert out.dtypes.to_dict() == N.activity_dtypes("cookstoves")
+    assert out[N.COL_FUEL].isna().tolist() == [False, False, False, True]
+
+
+# --- PERSISTENCE (project_store.FRAME_TABLES) ---
+def energy_tables():
+    tables = {}
+    for activity, df in {"cookstoves": cookstoves(), "substitution": substitution()}.items():
+        tables[f"energy_{activity}"] = N.calculate_activity(df, activity)[0]
+    return tables
+
+
+def assert_same_tables(loaded, tables):
+    for name, df in tables.items():
+        pd.testing.assert_frame_equal(loaded[name], df)
+        assert loaded[name].dtypes.equals(df.dtypes)
+
+
+def test_energy_tables_round_trip_through_store(tmp_path):
+    store = project_store.ProjectStore(str(tmp_path / "projects.db"), pool_size=1)
+    tables = energy_tables()
+    store.save_project("p1", "Energy", {"energy_grand_total": 1.5}, tables)
+    assert_same_tables(store.load_project("p1")[2], tables)
+
+    # An empty table removes the stored one
+    store.save_project("p1", tables={"energy_cookstoves": N.empty_activity_frame("cookstoves")})
+    loaded = store.load_project("p1")[2]
+    assert [name for name in project_store.FRAME_TABLES if name in loaded] == ["energy_substitution"]
+    store.pool.close()
+
+
+def test_energy_tables_round_trip_through_snapshot():
+    tables = energy_tables()
+    snap = snapshot.open_snapshot(snapshot.dumps({"gi_country": "Gabon"}, tables))
+    assert_same_tables(snap.tables(), tables)
@@ -0,0 +1,152 @@
+# test_export.py
+import io
+import os
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+import parameters
+import agri_engine
+import benchmark
+import batch
+import export
+
+E = agri_engine
+INFO = {
+    "gi_project_name": "Export test", "gi_user_name": "Tester", "gi_country": None,
+    "gi_impl": 5, "gi_cap": 20
+}
+SHEETS = [batch.GENERAL_INFO_SHEET, "Summary", "3.1", "3.2", "3.3"]
+
+
+@pytest.fixture
+def frames():
+    return {
+        "3_1": benchmark.synthetic_section(25, seed=1),
+        "3_2": benchmark.synthetic_section(7, seed=2),
+        "3_3": pd.DataFrame(columns=E.AGRI_COLUMNS)
+    }
+
+
+@pytest.fixture
+def crop_data():
+    return export.crop_data_for(INFO)
+
+
+def summary_for(frames, crop_data):
+    _, totals = E.calculate_sections(frames, crop_data)
+    summary = {"energy": 1.5, "arr": -2.0, "forest": 0.0, "agri_total": sum(totals.values())}
+    summary.update({f"agri_{i}": totals[key] for i, key in enumerate(E.SECTIONS, start=1)})
+    summary["grand_total"] = summary["energy"] + summary["arr"] + summary["agri_total"] + summary["forest"]
+    return summary
+
+
+def expected_section(df, crop_data):
+    return E.calculate_section(df, crop_data)[0].reindex(columns=E.AGRI_COLUMNS)
+
+
+def two_columns(sheet):
+    # Read-only sheets drop trailing blank cells, so pad each row to (label, value)
+    rows = (tuple(row) + (None, None) for row in sheet.iter_rows(values_only=True))
+    return {row[0]: row[1] for row in rows}
+
+
+def assert_same_section(actual, expected):
+    actual = actual.reset_index(drop=True)
+    expected = expected.reset_index(drop=True)
+    assert list(actual.columns) == E.AGRI_COLUMNS
+    assert len(actual) == len(expected)
+    assert actual[E.COL_CROP].tolist() == expected[E.COL_CROP].tolist()
+    for col in (E.COL_AREA, E.COL_RESULT):
+        assert actual[col].astype(float).tolist() == pytest.approx(expected[col].astype(float).tolist(), rel=1e-12)
+
+
+# --- XLSX ---
+@pytest.mark.parametrize("chunk_rows", [4, export.CHUNK_ROWS])
+def test_xlsx_sheets_headers_and_rows(tmp_path, frames, crop_data, chunk_rows):
+    summary = summary_for(frames, crop_data)
+    path = export.export_report("xlsx", INFO, summary, frames, crop_data, chunk_rows=chunk_rows, directory=tmp_path)
+
+    book = load_workbook(path, read_only=True)
+    assert book.sheetnames == SHEETS
+    for name in ("3.1", "3.2", "3.3"):
+        header = next(book[name].iter_rows(max_row=1, values_only=True))
+        assert list(header) == E.AGRI_COLUMNS
+    info = two_columns(book[batch.GENERAL_INFO_SHEET])
+    assert info["Project Name"] == "Export test" and info["Implementation (yrs)"] == 5
+    totals = two_columns(book["Summary"])
+    assert totals["Total"] == pytest.approx(summary["grand_total"])
+    book.close()
+
+    for key, name in batch.SECTION_SHEETS.items():
+        assert_same_section(pd.read_excel(path, sheet_name=name), expected_section(frames[key], crop_data))
+
+
+def test_xlsx_round_trips_through_batch(tmp_path, frames, crop_data):
+    path = export.export_report("xlsx", INFO, summary_for(frames, crop_data), frames, crop_data, directory=tmp_path)
+
+    info, read = batch.read_project(path)
+    assert info["gi_project_name"] == "Export test" and info["gi_impl"] == 5
+    for key in batch.SECTION_SHEETS:
+        assert len(read[key]) == len(frames[key])
+
+    scored = batch.score_project(path)
+    assert scored["ok"], scored["row"].get("error")
+    _, totals = E.calculate_sections(frames, parameters.site_params(info)["agb_bgb_soil"])
+    for i, key in enumerate(batch.SECTION_SHEETS, start=1):
+        assert scored["row"][f"agri_total_{i}"] == pytest.approx(totals[key], rel=1e-12)
+    assert scored["row"]["agri_grand_total"] == pytest.approx(sum(totals.values()), rel=1e-12)
+
+
+# --- CSV ---
+def test_csv_blocks_and_section_rows(tmp_path, frames, crop_data):
+    summary = summary_for(frames, crop_data)
+    path = export.export_report("csv", INFO, summary, frames, crop_data, chunk_rows=4, directory=tmp_path)
+    with open(path, encoding="utf-8") as f:
+        blocks = f.read().split("\n\n")
+    assert len(blocks) == 3
+
+    info = pd.read_csv(io.StringIO(blocks[0]), header=None)
+    assert info.iloc[0, 0] == batch.GENERAL_INFO_SHEET
+    assert info.iloc[1:, 0].tolist() == list(batch.GI_FIELDS)
+    totals = pd.read_csv(io.StringIO(blocks[1]), header=None).set_index(0)[1]
+    assert float(totals["Total"]) == pytest.approx(summary["grand_total"])
+
+    rows = pd.read_csv(io.StringIO(blocks[2]), dtype={"Section": str})
+    assert list(rows.columns) == ["Section"] + E.AGRI_COLUMNS
+    assert rows["Section"].unique().tolist() == ["3.1", "3.2"]
+    for key, name in batch.SECTION_SHEETS.items():
+        section = rows[rows["Section"] == name].drop(columns="Section")
+        assert_same_section(section, expected_section(frames[key], crop_data))
+
+
+def test_csv_without_rows_keeps_the_header(tmp_path, crop_data):
+    empty = {key: pd.DataFrame(columns=E.AGRI_COLUMNS) for key in E.SECTIONS}
+    path = export.export_report("csv", INFO, summary_for(empty, crop_data), empty, crop_data, directory=tmp_path)
+    with open(path, encoding="utf-8") as f:
+        last = f.read().rstrip("\n").split("\n")[-1]
+    assert last.split(",")[0] == "Section"
+
+
+# --- FILES ---
+def test_progress_reaches_the_row_count(tmp_path, frames, crop_data):
+    calls = []
+    export.export_report("xlsx", INFO, summary_for(frames, crop_data), frames, crop_data,
+                         chunk_rows=10, progress=lambda done, total: calls.append((done, total)), directory=tmp_path)
+    assert calls[-1] == (32, 32)
+    assert [done for done, _ in calls] == sorted(done for done, _ in calls)
+
+
+def test_unknown_format_leaves_no_file(tmp_path, frames, crop_data):
+    with pytest.raises(ValueError, match="Unknown export format"):
+        export.export_report("pdf", INFO, summary_for(frames, crop_data), frames, crop_data, directory=tmp_path)
+    assert os.listdir(tmp_path) == []
+
+
+def test_open_report_removes_the_file_on_close(tmp_path, frames, crop_data):
+    report = export.open_report("csv", INFO, summary_for(frames, crop_data), frames, crop_data, directory=tmp_path)
+    assert report.read(len(batch.GENERAL_INFO_SHEET)) == batch.GENERAL_INFO_SHEET.encode()
+    assert os.path.exists(report.path)
+    report.close()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,128 @@
+# test_forest_engine.py
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import forest_engine
+import project_store
+import snapshot
+from agri_engine import C_TO_CO2
+
+F = forest_engine
+
+
+def blocks(n_rows=200, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        F.COL_CONCESSION: rng.choice(["North", "South", " ", None], n_rows),
+        F.COL_BLOCK: [f"B{i}" for i in range(n_rows)],
+        F.COL_AREA: rng.uniform(0, 500, n_rows),
+        F.COL_ABANDONED: rng.integers(0, 20, n_rows).astype(float),
+        F.COL_LOG_LEFT: rng.uniform(0, 30, n_rows),
+        F.COL_SKID: rng.uniform(0, 5, n_rows),
+        F.COL_ROAD: rng.uniform(0, 200, n_rows)
+    })
+    df.loc[rng.random(n_rows) < 0.1, F.COL_SKID] = np.nan
+    return df
+
+
+def hand_tco2e(row):
+    value = lambda col: 0.0 if pd.isna(row[col]) else row[col]
+    area = value(F.COL_AREA)
+    tc = (value(F.COL_ABANDONED) * F.F_ABANDONED
+          + area * (value(F.COL_LOG_LEFT) * F.F_LOG_LEFT + value(F.COL_SKID) * F.F_SKID + value(F.COL_ROAD) * F.F_ROAD))
+    return tc * C_TO_CO2
+
+
+# --- CALCULATION ---
+def test_blocks_match_ril_c_formula():
+    df = blocks()
+    out, total = F.calculate_blocks(df)
+    expected = [hand_tco2e(row) for _, row in df.iterrows()]
+    np.testing.assert_allclose(out[F.COL_RESULT], expected, rtol=1e-12)
+    assert total == pytest.approx(sum(expected), rel=1e-12)
+    empty, empty_total = F.calculate_blocks(F.empty_block_frame())
+    assert empty.empty and empty_total == 0.0
+
+
+def test_summary_adds_up_per_concession():
+    df = blocks()
+    summary = F.summarize_blocks(df)
+    assert list(summary.columns) == F.SUMMARY_COLUMNS
+    # Blank concession names are grouped together
+    assert set(summary[F.COL_CONCESSION]) == {"North", "South", F.UNNAMED}
+    assert summary["Lines"].sum() == len(df)
+    assert summary[F.COL_RESULT].sum() == pytest.approx(F.calculate_blocks(df)[1], rel=1e-12)
+
+    north = df[df[F.COL_CONCESSION] == "North"]
+    row = summary.set_index(F.COL_CONCESSION).loc["North"]
+    assert row[F.COL_AREA] == pytest.approx(north[F.COL_AREA].sum())
+    assert row[F.COL_RESULT] == pytest.approx(sum(hand_tco2e(r) for _, r in north.iterrows()))
+
+
+def test_streamed_inventory_matches_one_summary():
+    df = blocks(1000, seed=4)
+    csv = df.rename(columns={F.COL_ABANDONED: "Trees abandoned", F.COL_ROAD: "Haul road"}).to_csv(index=False)
+    summary, issues, unmapped, lines = F.aggregate_inventory(io.BytesIO(csv.encode()), "inventory.csv", chunk_rows=128)
+    expected = F.summarize_blocks(df).set_index(F.COL_CONCESSION).sort_index()
+    got = summary.set_index(F.COL_CONCESSION).sort_index()
+    assert lines == len(df) and unmapped == [] and issues.empty
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False, rtol=1e-9)
+
+
+def test_inventory_reports_cells_that_are_not_numbers():
+    csv = (
+        "Concession,Block,Area,Trees abandoned,Skidding,Remarks\n"
+        "North,B1,10,2,1.5,ok\n"
+        "North,B2,ten,2,1,\n"
+        ",,,,,\n"
+        " , , ,  , ,\n"
+        "South,B3,5,many,2,\n"
+        "South,B4,4,1,,\n"
+    )
+    lines_seen = []
+    summary, issues, unmapped, lines = F.aggregate_inventory(
+        io.BytesIO(csv.encode()), "inventory.csv", chunk_rows=2, progress=lambda done, fraction: lines_seen.append(done)
+    )
+    assert unmapped == ["Remarks"]
+    assert issues.sort_values("Row").values.tolist() == [
+        [3, F.COL_AREA, "ten", "Not a number"],
+        [6, F.COL_ABANDONED, "many", "Not a number"]
+    ]
+    # Only the lines summarized are counted: blank and rejected lines are not
+    assert lines == 2 and lines_seen[-1] == 2
+    assert summary.set_index(F.COL_CONCESSION)["Lines"].to_dict() == {"North": 1, "South": 1}
+    kept = pd.DataFrame({F.COL_CONCESSION: ["North", "South"], F.COL_AREA: [10.0, 4.0],
+                         F.COL_ABANDONED: [2.0, 1.0], F.COL_SKID: [1.5, np.nan]})
+    assert summary[F.COL_RESULT].sum() == pytest.approx(F.calculate_blocks(kept)[1])
+
+
+def test_inventory_without_ril_c_columns_is_rejected():
+    with pytest.raises(ValueError, match="No RIL-C columns"):
+        F.aggregate_inventory(io.BytesIO(b"Concession,Area\nNorth,10\n"), "inventory.csv")
+
+
+# --- PERSISTENCE (project_store.FRAME_TABLES) ---
+def test_coerce_summary_round_trip():
+    summary = F.summarize_blocks(blocks())
+    saved = summary.astype(str)
+    restored = F.coerce_summary(saved)
+    pd.testing.assert_frame_equal(restored, summary, check_dtype=False, rtol=1e-12)
+    assert restored["Lines"].dtype == np.int64
+
+
+def test_forest_tables_round_trip_through_store_and_snapshot(tmp_path):
+    block_table = F.calculate_blocks(blocks(50))[0]
+    tables = {"forest_blocks": block_table, "forest_inventory": F.summarize_blocks(blocks(300, seed=2))}
+
+    store = project_store.ProjectStore(str(tmp_path / "projects.db"), pool_size=1)
+    store.save_project("p1", tables=tables)
+    loaded = store.load_project("p1")[2]
+    store.pool.close()
+    snap = snapshot.open_snapshot(snapshot.dumps({}, tables)).tables()
+
+    for restored in (loaded, snap):
+        for name, df in tables.items():
+            pd.testing.assert_frame_equal(restored[name], df)
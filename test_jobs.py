@@ -0,0 +1,161 @@
+# test_jobs.py
+import threading
+import time
+
+import pytest
+
+import agri_engine
+import benchmark
+import jobs
+import project_store
+
+
+@pytest.fixture
+def pool():
+    return jobs.JobPool(max_workers=1, max_queued=2, max_per_owner=1)
+
+
+def wait(job, timeout=5):
+    deadline = time.time() + timeout
+    while job.active and time.time() < deadline:
+        time.sleep(0.01)
+    assert not job.active
+
+
+def blocking(job, started, release):
+    started.set()
+    while not release.wait(0.01):
+        job.report(0.5, "Working")
+    return "result"
+
+
+# --- POOL ---
+def test_job_result_and_progress(pool):
+    job = pool.submit("a", "test", lambda job, x: job.report(0.3) or x * 2, 21)
+    wait(job)
+    assert (job.status, job.result, job.progress, job.message) == (jobs.DONE, 42, 1.0, "Done")
+    assert job.finished is not None and job.error is None
+
+
+def test_per_owner_limit(pool):
+    started, release = threading.Event(), threading.Event()
+    first = pool.submit("a", "test", blocking, started, release)
+    with pytest.raises(jobs.JobLimitError, match="already running"):
+        pool.submit("a", "test", blocking, started, release)
+    # Other owners are not limited by it
+    other = pool.submit("b", "test", lambda job: "b")
+    release.set()
+    wait(first)
+    wait(other)
+    # Once finished, the owner may start another job
+    again = pool.submit("a", "test", lambda job: "again")
+    wait(again)
+    assert again.result == "again"
+
+
+def test_queue_limit(pool):
+    started, release = threading.Event(), threading.Event()
+    running = pool.submit("a", "test", blocking, started, release)
+    started.wait(5)
+    queued = [pool.submit(owner, "test", lambda job: None) for owner in ("b", "c")]
+    assert [job.status for job in queued] == [jobs.QUEUED, jobs.QUEUED]
+    with pytest.raises(jobs.JobLimitError, match="busy"):
+        pool.submit("d", "test", lambda job: None)
+    assert pool.stats()[jobs.QUEUED] == 2 and pool.stats()[jobs.RUNNING] == 1
+    release.set()
+    for job in [running] + queued:
+        wait(job)
+    assert pool.stats()[jobs.DONE] == 3
+
+
+def test_cancel_before_the_job_starts(pool):
+    started, release = threading.Event(), threading.Event()
+    running = pool.submit("a", "test", blocking, started, release)
+    started.wait(5)
+    calls = []
+    queued = pool.submit("b", "test", lambda job: calls.append(1))
+    queued.cancel()
+    assert queued.message == "Cancelling..." and queued.cancel_requested
+    release.set()
+    wait(running)
+    wait(queued)
+    assert queued.status == jobs.CANCELLED and calls == []
+
+
+def test_cancel_while_running(pool):
+    started, release = threading.Event(), threading.Event()
+    job = pool.submit("a", "test", blocking, started, release)
+    started.wait(5)
+    job.cancel()
+    wait(job)
+    assert (job.status, job.message, job.result) == (jobs.CANCELLED, "Cancelled", None)
+
+
+def test_failure_is_recorded(pool):
+    def failing(job):
+        raise RuntimeError("out of memory")
+    job = pool.submit("a", "test", failing)
+    wait(job)
+    assert job.status == jobs.FAILED and job.error == "RuntimeError: out of memory"
+    assert pool.jobs("a") == [job] and pool.jobs("b") == []
+
+
+def test_finished_jobs_are_forgotten(pool, monkeypatch):
+    job = pool.submit("a", "test", lambda job: None)
+    wait(job)
+    monkeypatch.setattr(jobs, "KEEP_FINISHED", 0)
+    job.finished -= 1
+    pool.submit("b", "test", lambda job: None)
+    assert pool.get(job.id) is None
+
+
+# --- AGRICULTURE PAGE (agri.render_calculation_job -> apply_calculation) ---
+@pytest.fixture
+def agri_app(tmp_path, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+    store = project_store.ProjectStore(str(tmp_path / "projects.db"), pool_size=1)
+    monkeypatch.setitem(project_store._shared, project_store.DB_PATH, (store, project_store.Autosaver(store, delay=60)))
+    monkeypatch.setattr(jobs, "_shared", jobs.JobPool(max_workers=1))
+    at = AppTest.from_file("app.py", default_timeout=60)
+    at.session_state["current_page"] = "3 Agriculture"
+    at.session_state["df_3_1"] = benchmark.synthetic_section(50)
+    at.run()
+    yield at
+    store.pool.close()
+
+
+def run_calculation(at):
+    next(b for b in at.button if b.label == "Calculate Agriculture").click().run()
+    # A short job may already be applied in the same run; otherwise the next run applies it
+    job, = jobs.get_pool().jobs()
+    wait(job)
+    if "agri_job" in at.session_state:
+        at.run()
+    return job
+
+
+def test_page_applies_a_finished_calculation(agri_app):
+    job = run_calculation(agri_app)
+    assert job.status == jobs.DONE
+    expected = agri_engine.calculate_section(benchmark.synthetic_section(50))[1]
+    assert agri_app.session_state["agri_total_1"] == pytest.approx(expected)
+    assert any("Calculated!" in s.value for s in agri_app.success)
+
+
+def test_page_reports_a_failed_calculation(agri_app, monkeypatch):
+    def failing(*args, **kwargs):
+        raise RuntimeError("parameters missing")
+    monkeypatch.setattr(agri_engine, "recalculate_sections", failing)
+    job = run_calculation(agri_app)
+    assert job.status == jobs.FAILED
+    assert [e.value for e in agri_app.error] == ["Calculation failed: RuntimeError: parameters missing"]
+    assert "agri_job" not in agri_app.session_state
+
+
+def test_page_reports_a_cancelled_calculation(agri_app, monkeypatch):
+    def cancelled(frames, crop_data, progress=None):
+        progress(0, 1)
+        raise jobs.JobCancelled()
+    monkeypatch.setattr(agri_engine, "recalculate_sections", cancelled)
+    run_calculation(agri_app)
+    assert [i.value for i in agri_app.info] == ["Calculation cancelled."]
@@ -0,0 +1,82 @@
+# test_ledger.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import energy_engine
+import ledger
+import parameters
+from test_energy_engine import cookstoves, substitution
+
+N = energy_engine
+
+
+def energy_state(gwp_set=None):
+    """Session-state mapping after the energy page ran with the given GWP set."""
+    frames = {"cookstoves": cookstoves(), "substitution": substitution(),
+              "charcoal": pd.DataFrame({N.COL_CHARCOAL: [20.0], N.COL_KILN_REDUCTION: [30.0]})}
+    _, totals, ledgers = N.calculate_energy(frames, "Gabon", ledger.gwp_vector(gwp_set=gwp_set))
+    state = {"gwp_set": gwp_set}
+    for activity, book in ledgers.items():
+        total_key = f"energy_total_{activity}"
+        state[total_key] = totals[activity]
+        state[ledger.key(total_key)] = book
+        state.update(ledger.gas_fields(total_key, book))
+    state["energy_grand_total"] = sum(totals.values())
+    return frames, state
+
+
+@pytest.mark.parametrize("gwp_set", [s for s in parameters.GWP_SETS if s != parameters.DEFAULT_GWP_SET])
+def test_reweighting_equals_recalculation(gwp_set):
+    frames, state = energy_state()
+    state["gwp_set"] = gwp_set
+    weighted = ledger.weighted_totals(state)
+
+    _, totals, _ = N.calculate_energy(frames, "Gabon", ledger.gwp_vector(gwp_set=gwp_set))
+    for activity, total in totals.items():
+        assert weighted[f"energy_total_{activity}"] == pytest.approx(total, rel=1e-12)
+    assert weighted["energy_grand_total"] == pytest.approx(sum(totals.values()), rel=1e-12)
+
+
+def test_saved_gas_fields_are_used_without_ledgers():
+    # A reopened project has the gas_ fields but no Ledger objects
+    frames, state = energy_state()
+    saved = {k: v for k, v in state.items() if not k.startswith("ledger_")}
+    gwp = ledger.gwp_vector(gwp_set="IPCC AR6")
+    expected = ledger.weighted_totals(state, gwp)
+    assert ledger.weighted_totals(saved, gwp) == pytest.approx(expected, rel=1e-12)
+
+
+def test_totals_without_gases_are_left_out():
+    state = {"agri_total_1": 5.0, "arr_grand_total": 3.0}
+    assert ledger.weighted_totals(state) == {}
+    # A grand total adds the re-weighted activities and the plain totals of the others
+    state[ledger.key("agri_total_1")] = ledger.Ledger.co2([2.0, np.nan, 4.0])
+    state["agri_total_2"] = 1.5
+    out = ledger.weighted_totals(state)
+    assert out["agri_total_1"] == pytest.approx(6.0)
+    assert out["agri_grand_total"] == pytest.approx(7.5)
+    assert "arr_grand_total" not in out
+
+
+def test_gwp_vector_overrides_and_sets():
+    base = ledger.gwp_vector(gwp_set="IPCC AR5")
+    ch4 = ledger.GAS_INDEX["CH4"]
+    assert base[ch4] == parameters.GWP_SETS["IPCC AR5"].get("CH4", parameters.GWP_DEFAULTS.get("CH4"))
+    # Tier 2 values win over the set; blank and invalid entries fall back to it
+    assert ledger.gwp_vector({"CH4": "30.5"}, "IPCC AR5")[ch4] == 30.5
+    for value in ("", None, "abc"):
+        assert ledger.gwp_vector({"CH4": value}, "IPCC AR5")[ch4] == base[ch4]
+    assert ledger.gwp_vector()[ledger.GAS_INDEX["BC"]] == parameters.GWP_DEFAULTS.get("BC", 0.0)
+
+    state = {"gwp_set": "IPCC AR5", "gwp_N2O": 300}
+    expected = ledger.gwp_vector({"N2O": 300}, "IPCC AR5")
+    np.testing.assert_array_equal(ledger.state_gwp(state), expected)
+
+
+def test_ledger_weights_only_its_gases():
+    book = ledger.Ledger.co2([1.0, np.nan, 2.5])
+    gwp = ledger.gwp_vector({"CO2": 2})
+    np.testing.assert_array_equal(book.co2e(gwp), [2.0, np.nan, 5.0])
+    assert book.total(gwp) == 7.0
+    assert book.gas_totals() == {"CO2": 3.5}
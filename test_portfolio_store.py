@@ -0,0 +1,117 @@
+# test_portfolio_store.py
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import agri_engine
+import energy_engine
+import portfolio_store
+
+P = portfolio_store
+AGRI = ("Agriculture", agri_engine.SECTIONS["3_1"])
+STOVES = ("Energy", energy_engine.ACTIVITIES["cookstoves"])
+
+
+@pytest.fixture
+def store(tmp_path):
+    return P.PortfolioStore(str(tmp_path / "results"))
+
+
+def rows_of(n, sector_activity, seed=0):
+    values = np.random.default_rng(seed).uniform(1, 100, n)
+    sector, activity = sector_activity
+    return pd.DataFrame({"sector": sector, "activity": activity, "row": np.arange(n), "tco2e": values})
+
+
+def publish(store, project_id, country, region, parts):
+    """parts: {(sector, activity): (rows, seed)}; totals are the row sums."""
+    rows = pd.concat([rows_of(n, key, seed) for key, (n, seed) in parts.items()], ignore_index=True)
+    totals = rows.groupby(["sector", "activity"])["tco2e"].sum().to_dict()
+    store.publish(project_id, project_id.upper(), country, region, totals, rows)
+    return rows
+
+
+def sorted_rollups(df):
+    return df.sort_values(P.ROLLUP_KEYS).reset_index(drop=True)
+
+
+def assert_rollups_match_rebuild(store, tmp_path):
+    copy = tmp_path / f"rebuilt_{len(list(tmp_path.iterdir()))}"
+    shutil.copytree(store.path, copy)
+    rebuilt = P.PortfolioStore(str(copy))
+    rebuilt.rebuild_rollups()
+    pd.testing.assert_frame_equal(sorted_rollups(store.rollups), sorted_rollups(rebuilt.rollups), rtol=1e-9)
+
+
+def test_incremental_rollups_match_rebuild(store, tmp_path):
+    publish(store, "a", "Gabon", "Central Africa", {AGRI: (100, 1), STOVES: (5, 2)})
+    assert_rollups_match_rebuild(store, tmp_path)
+    publish(store, "b", "Gabon", "Central Africa", {AGRI: (50, 3)})
+    publish(store, "c", None, None, {STOVES: (7, 4)})
+    assert_rollups_match_rebuild(store, tmp_path)
+
+    # Republishing with other activities and another country moves the contribution
+    publish(store, "a", "Cameroon", "Central Africa", {STOVES: (9, 5)})
+    assert_rollups_match_rebuild(store, tmp_path)
+    gabon = store.rollups[store.rollups["country"] == "Gabon"]
+    assert gabon["projects"].tolist() == [1] and gabon["rows"].tolist() == [50]
+
+    store.remove("b")
+    assert_rollups_match_rebuild(store, tmp_path)
+    assert "Gabon" not in set(store.rollups["country"])
+    store.remove("a")
+    store.remove("c")
+    assert store.rollups.empty and store.projects.empty and store.activities.empty
+
+
+def test_publish_writes_rows_and_project_totals(store):
+    rows = publish(store, "a", "Gabon", "Central Africa", {AGRI: (20, 1), STOVES: (3, 2)})
+    saved = store.project_rows("a")
+    pd.testing.assert_frame_equal(saved, P._typed(rows, P.ROW_COLUMNS))
+    project = store.projects.set_index("project_id").loc["a"]
+    assert project["name"] == "A" and project["rows"] == 23
+    assert project["tco2e"] == pytest.approx(rows["tco2e"].sum())
+    assert store.project_count() == 1
+
+    # Blank country and region are grouped as "(not set)"
+    publish(store, "b", None, "", {AGRI: (1, 3)})
+    assert store.projects.set_index("project_id").loc["b", "country"] == P.NOT_SET
+
+    store.remove("a")
+    assert store.project_rows("a").empty
+
+
+def test_reopened_store_reads_the_saved_tables(store):
+    publish(store, "a", "Gabon", "Central Africa", {AGRI: (10, 1)})
+    publish(store, "b", "Brazil", "South America", {STOVES: (4, 2)})
+    reopened = P.PortfolioStore(store.path)
+    for name in ("projects", "activities", "rollups"):
+        pd.testing.assert_frame_equal(getattr(reopened, name), getattr(store, name))
+
+
+def test_queries_filter_the_rollups(store):
+    a = publish(store, "a", "Gabon", "Central Africa", {AGRI: (10, 1), STOVES: (4, 2)})
+    b = publish(store, "b", "Brazil", "South America", {AGRI: (30, 3)})
+    by_sector = store.totals(("sector",)).set_index("sector")["tco2e"]
+    assert by_sector["Agriculture"] == pytest.approx(a[a["sector"] == "Agriculture"]["tco2e"].sum() + b["tco2e"].sum())
+    gabon = store.totals(("country",), country=["Gabon"])
+    assert gabon["country"].tolist() == ["Gabon"] and gabon["rows"].tolist() == [14]
+    assert store.project_count(sector=["Energy"]) == 1
+    top = store.top_projects(n=1, sector=["Agriculture"])
+    assert top["project_id"].tolist() == ["b"]
+
+
+def test_project_outputs_read_the_session_tables():
+    result = energy_engine.COL_RESULT
+    state = {
+        "energy_total_cookstoves": 12.5,
+        "df_energy_cookstoves": pd.DataFrame({result: [5.0, np.nan, 7.5]}),
+        "agri_total_1": None,
+        "df_3_1": pd.DataFrame({"other": [1.0]})
+    }
+    totals, rows = P.project_outputs(state)
+    assert totals[STOVES] == 12.5 and totals[AGRI] == 0.0
+    assert rows["tco2e"].tolist() == [5.0, 7.5]
+    assert rows["row"].tolist() == [0, 1]
@@ -0,0 +1,214 @@
+# test_project_store.py
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import agri_engine
+import benchmark
+import project_store
+
+E = agri_engine
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = project_store.ProjectStore(str(tmp_path / "projects.db"), pool_size=2)
+    yield store
+    store.pool.close()
+
+
+def section_with_locals(n_rows=300, seed=0):
+    df, _ = E.calculate_section(benchmark.synthetic_section(n_rows, seed=seed))
+    df.iloc[::7, df.columns.get_loc(E.COL_LOC_AGB)] = 2.5
+    df.iloc[-1, df.columns.get_loc(E.COL_CROP)] = np.nan
+    return df
+
+
+# --- STORE ---
+def test_project_round_trip_keeps_values_and_dtypes(store):
+    tables = {"3_1": section_with_locals(), "3_2": E.empty_section_frame(), "3_3": section_with_locals(40, seed=3)}
+    fields = {"gi_project_name": "Test", "gi_date": date(2024, 5, 1), "gi_impl": np.int64(5), "agri_total_1": 12.5, "gi_country": None}
+    store.save_project("p1", "Test", fields, tables)
+
+    name, loaded_fields, loaded = store.load_project("p1")
+    assert name == "Test"
+    assert loaded_fields == {**fields, "gi_impl": 5}
+    # Defaults are not stored (the engine recomputes them); inputs and results are
+    stored = E.INPUT_COLUMNS + [E.COL_RESULT]
+    for section, df in tables.items():
+        expected = E.coerce_section_frame(df).reset_index(drop=True)
+        assert list(loaded[section].columns) == E.AGRI_COLUMNS
+        pd.testing.assert_frame_equal(loaded[section][stored], expected[stored])
+        assert loaded[section].dtypes.equals(expected.dtypes)
+
+
+def test_unknown_crops_survive_as_extra_categories(store):
+    df = pd.DataFrame({E.COL_CROP: ["Hedgerow", "Mystery tree"], E.COL_AREA: [1.0, 2.0]})
+    store.save_project("p1", tables={"3_1": E.coerce_section_frame(df)})
+    loaded = store.load_project("p1")[2]["3_1"]
+    assert loaded[E.COL_CROP].astype(object).tolist() == ["Hedgerow", "Mystery tree"]
+    assert "Mystery tree" in loaded[E.COL_CROP].cat.categories
+
+
+def test_saving_again_replaces_rows_and_keeps_other_sections(store):
+    store.save_project("p1", tables={"3_1": section_with_locals(100), "3_2": section_with_locals(50)})
+    store.save_project("p1", fields={"gi_project_name": "Renamed"}, tables={"3_1": section_with_locals(10)})
+    _, fields, tables = store.load_project("p1")
+    assert len(tables["3_1"]) == 10 and len(tables["3_2"]) == 50
+    assert fields["gi_project_name"] == "Renamed"
+
+
+def test_delete_and_missing_projects(store):
+    store.save_project("p1", "One", {"gi_impl": 1}, {"3_1": section_with_locals(5)})
+    assert [row[0] for row in store.list_projects()] == ["p1"]
+    store.delete_project("p1")
+    assert store.load_project("p1") is None
+    assert store.list_projects() == []
+
+
+# --- OWNERS ---
+def test_projects_are_listed_and_opened_by_owner_only(store):
+    assert store.claim_project("p1", "a") and store.claim_project("p2", "b")
+    store.save_project("p1", "Mine", {"gi_impl": 1})
+    store.save_project("p2", "Theirs", {"gi_impl": 2})
+
+    assert [row[0] for row in store.list_projects("a")] == ["p1"]
+    assert store.load_project("p1", owner="a")[0] == "Mine"
+    assert store.load_project("p2", owner="a") is None
+    assert not store.claim_project("p2", "a")
+    assert store.load_project("p2", owner="b")[0] == "Theirs"
+    assert {row[0] for row in store.list_projects()} == {"p1", "p2"}
+
+
+def test_ownerless_projects_are_claimed_once(store):
+    store.save_project("old", "Old", {"gi_impl": 1})
+    assert store.list_projects("a") == []
+    assert store.load_project("old", owner="a")[0] == "Old"
+    assert store.claim_project("old", "a")
+    assert not store.claim_project("old", "b")
+    assert store.load_project("old", owner="b") is None
+    assert [row[0] for row in store.list_projects("a")] == ["old"]
+
+
+def test_databases_without_owners_are_upgraded(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE projects (id TEXT PRIMARY KEY, name TEXT, updated_at REAL)")
+        conn.execute("INSERT INTO projects VALUES ('old', 'Old', 1.0)")
+    store = project_store.ProjectStore(path, pool_size=1)
+    assert store.load_project("old", owner="a")[0] == "Old"
+    assert store.claim_project("old", "a")
+    assert [row[0] for row in store.list_projects("a")] == ["old"]
+    store.pool.close()
+
+
+def open_as_owner(project_id):
+    import streamlit as st
+    import shared_state
+    import project_panel
+    shared_state.init_state()
+    if project_id:
+        st.session_state["opened"] = shared_state.open_project(project_id)
+    project_panel.render_project_panel()
+
+
+def run_as_owner(owner, project_id=None, url_project=None):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_function(open_as_owner, args=(project_id,))
+    at.query_params["owner"] = owner
+    if url_project:
+        at.query_params["project"] = url_project
+    return at.run()
+
+
+def test_sessions_see_and_open_only_their_projects(store, monkeypatch):
+    monkeypatch.setitem(project_store._shared, project_store.DB_PATH, (store, project_store.Autosaver(store, delay=60)))
+    store.claim_project("p1", "a")
+    store.save_project("p1", "Mine", {"gi_project_name": "Mine"})
+    store.claim_project("p2", "b")
+    store.save_project("p2", "Theirs", {"gi_project_name": "Theirs"})
+
+    at = run_as_owner("a")
+    assert not at.exception
+    options = at.sidebar.selectbox(key="project_open_select").options
+    assert len(options) == 1 and options[0].startswith("Mine")
+    assert at.session_state["project_owner"] == "a"
+
+    at = run_as_owner("a", "p2")
+    assert not at.session_state["opened"] and "project_id" not in at.session_state
+
+    # A link to another owner's project opens nothing and is dropped from the URL
+    at = run_as_owner("a", url_project="p2")
+    assert "project_id" not in at.session_state and "project" not in at.query_params
+
+    at = run_as_owner("b", "p2")
+    assert at.session_state["opened"] and at.session_state["gi_project_name"] == "Theirs"
+
+
+# --- AUTOSAVE ---
+def test_autosaver_merges_changes_into_one_write(store):
+    saver = project_store.Autosaver(store, delay=60)
+    saver.schedule("p1", "Name", {"gi_impl": 1})
+    saver.schedule("p1", None, {"gi_impl": 2, "gi_cap": 3}, {"3_1": section_with_locals(5)})
+    saver.flush()
+    name, fields, tables = store.load_project("p1")
+    assert name == "Name"
+    assert fields == {"gi_impl": 2, "gi_cap": 3}
+    assert len(tables["3_1"]) == 5
+
+
+class FailingStore:
+    """Fails the first save_many call, then records the payloads it is given."""
+
+    def __init__(self):
+        self.calls = 0
+        self.saved = []
+
+    def save_many(self, payloads):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("disk full")
+        self.saved.append(payloads)
+
+
+def test_failed_flush_keeps_changes_and_retries(caplog):
+    failing = FailingStore()
+    saver = project_store.Autosaver(failing, delay=60)
+    saver.schedule("p1", "Name", {"gi_impl": 1, "gi_cap": 2})
+    saver.flush()
+    assert "Autosave" in caplog.text
+    assert saver._timer is not None
+
+    # Changes made after the failure win over the payload that failed
+    saver.schedule("p1", None, {"gi_impl": 5})
+    saver.flush()
+    assert failing.saved == [{"p1": ("Name", {"gi_impl": 5, "gi_cap": 2}, {})}]
+    assert saver._timer is None
+
+
+def test_flushes_do_not_overlap():
+    active, overlaps = [0], []
+    lock = threading.Lock()
+
+    class SlowStore:
+        def save_many(self, payloads):
+            with lock:
+                active[0] += 1
+                overlaps.append(active[0])
+            threading.Event().wait(0.05)
+            with lock:
+                active[0] -= 1
+
+    saver = project_store.Autosaver(SlowStore(), delay=60)
+    threads = []
+    for i in range(4):
+        saver.schedule(f"p{i}", fields={"gi_impl": i})
+        threads.append(threading.Thread(target=saver.flush))
+        threads[-1].start()
+    for thread in threads:
+        thread.join()
+    assert max(overlaps) == 1
@@ -0,0 +1,127 @@
+# test_snapshot.py
+import json
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import agri_engine
+import project_store
+import snapshot
+from test_agri_engine import mixed_section
+
+E = agri_engine
+FIELDS = {"gi_project_name": "Snap", "gi_date": date(2025, 1, 31), "gi_impl": np.int64(4), "agri_total_1": 1.25}
+
+
+def sections():
+    tables = {}
+    for i, key in enumerate(E.SECTIONS):
+        df = E.coerce_section_frame(mixed_section(150, seed=i))
+        tables[key] = E.calculate_section(df)[0]
+    return tables
+
+
+def test_round_trip_keeps_fields_values_and_dtypes(tmp_path):
+    tables = sections()
+    path = tmp_path / f"project{snapshot.SUFFIX}"
+    snapshot.save_snapshot(path, {**FIELDS, "not_storable": object()}, tables)
+
+    fields, loaded = snapshot.load_snapshot(path)
+    assert fields == {**FIELDS, "gi_impl": 4}
+    for key, df in tables.items():
+        pd.testing.assert_frame_equal(loaded[key], df)
+        # Unknown crops stay as extra categories
+        assert list(loaded[key][E.COL_CROP].cat.categories) == list(df[E.COL_CROP].cat.categories)
+
+
+def test_bytes_and_file_objects_open_the_same(tmp_path):
+    data = snapshot.dumps(FIELDS, sections())
+    path = tmp_path / "p.cafi"
+    path.write_bytes(data)
+    with open(path, "rb") as f:
+        from_file = snapshot.open_snapshot(f)
+    from_bytes = snapshot.open_snapshot(data)
+    from_path = snapshot.open_snapshot(str(path))
+    for snap in (from_bytes, from_path):
+        assert snap.fields == from_file.fields
+        pd.testing.assert_frame_equal(snap.table("3_2"), from_file.table("3_2"))
+
+
+def test_column_subset_reads_only_those_columns():
+    tables = sections()
+    snap = snapshot.open_snapshot(snapshot.dumps({}, tables))
+    assert snap.rows("3_1") == len(tables["3_1"])
+    assert snap.rows("missing") == 0 and snap.table("missing") is None
+
+    part = snap.table("3_1", columns=[E.COL_AREA, E.COL_RESULT])
+    assert list(part.columns) == [E.COL_AREA, E.COL_RESULT]
+    np.testing.assert_array_equal(part[E.COL_AREA].to_numpy(), tables["3_1"][E.COL_AREA].to_numpy())
+
+
+def test_blocks_are_aligned():
+    snap = snapshot.open_snapshot(snapshot.dumps(FIELDS, sections()))
+    assert all(info["offset"] % snapshot.ALIGN == 0 for info in snap.sections.values())
+
+
+def format_1(data):
+    """Rewrite a sections-only snapshot as format 1 (no "tables" header entry)."""
+    prefix = snapshot._PREFIX
+    _, _, length = prefix.unpack(data[:prefix.size])
+    header = json.loads(data[prefix.size:prefix.size + length])
+    del header["tables"]
+    header["format"] = 1
+    body = json.dumps(header).encode().ljust(length)
+    return prefix.pack(snapshot.MAGIC, 1, length) + body + data[prefix.size + length:]
+
+
+def test_format_1_snapshots_still_open():
+    tables = sections()
+    snap = snapshot.open_snapshot(format_1(snapshot.dumps(FIELDS, tables)))
+    assert snap.version == 1 and snap.frames == {}
+    loaded = snap.tables()
+    assert set(loaded) == set(tables)
+    for key, df in tables.items():
+        pd.testing.assert_frame_equal(loaded[key], df)
+
+
+def test_unknown_tables_are_skipped():
+    data = snapshot.dumps({}, {"3_1": sections()["3_1"], "not_a_table": pd.DataFrame({"a": [1]})})
+    assert set(snapshot.open_snapshot(data).tables()) == {"3_1"}
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"CAFI", "too short"),
+    (b"NOTASNAP" + bytes(10), "Not a project snapshot"),
+    (snapshot._PREFIX.pack(snapshot.MAGIC, snapshot.FORMAT_VERSION + 1, 2) + b"{}", "newer")
+])
+def test_invalid_files_are_rejected(data, message):
+    with pytest.raises(ValueError, match=message):
+        snapshot.open_snapshot(data)
+
+
+# --- OPENING IN THE APP (shared_state.open_snapshot) ---
+def open_in_session(data):
+    import streamlit as st
+    import shared_state
+    shared_state.open_snapshot(data)
+    st.session_state["opened_keys"] = sorted(st.session_state.keys())
+
+
+def test_only_project_fields_are_restored(tmp_path, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+    store = project_store.ProjectStore(str(tmp_path / "projects.db"), pool_size=1)
+    monkeypatch.setitem(project_store._shared, project_store.DB_PATH, (store, project_store.Autosaver(store, delay=60)))
+    fields = {**FIELDS, "agri_job": "x", "job_owner": "someone", "project_id": "theirs", "editor_3_1": 1, "act_x": 2}
+
+    at = AppTest.from_function(open_in_session, args=(snapshot.dumps(fields, {"3_1": sections()["3_1"]}),))
+    at.run()
+    assert not at.exception
+    state = at.session_state
+    assert state["gi_project_name"] == "Snap" and state["act_x"] == 2 and state["agri_total_1"] == 1.25
+    for key in ("agri_job", "job_owner", "editor_3_1"):
+        assert key not in state["opened_keys"]
+    assert state["project_id"] != "theirs"
+    assert len(state["df_3_1"]) == 150
+    store.pool.close()